@@ -1,13 +1,18 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 import asyncio
 import logging
 from datetime import datetime
 import os
+import requests
+from typing import Dict, Optional
 from server import make_outbound_call, extract_candidate_info, PROMPT_TEMPLATE
 from schemas.call_details import InterviewRequest, InterviewResponse
 from schemas.Resume import Resume_Data
 from dotenv import load_dotenv
 from utils.info_extraction import extracting_number
+from utils.health import HealthMonitor, deepgram_check, openai_check, trieve_check
+from utils.transcripts import get_transcript_store
 # Initialize FastAPI app
 app = FastAPI()
 
@@ -21,6 +26,35 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Voice server whose /admission endpoint says whether it can take another call
+voice_server_url = os.getenv("VOICE_SERVER_URL", "http://localhost:5000")
+admission_retry_after = int(os.getenv("ADMISSION_RETRY_AFTER", "30"))
+
+health_monitor = HealthMonitor({
+    "trieve": trieve_check(),
+    "openai": openai_check(),
+    "deepgram": deepgram_check(),
+})
+
+@app.on_event("startup")
+def start_health_monitor():
+    """Refresh dependency status in the background."""
+    health_monitor.start()
+
+@app.on_event("shutdown")
+def stop_health_monitor():
+    health_monitor.stop()
+
+
+def voice_server_admission() -> Optional[Dict]:
+    """Admission status of the voice server, or None when it cannot be reached."""
+    try:
+        response = requests.get(f"{voice_server_url}/admission", timeout=2)
+        return response.json()
+    except Exception as e:
+        logger.warning(f"Could not check voice server admission: {str(e)}")
+        return None
+
 
 @app.post("/start-interview", response_model=InterviewResponse)
 async def start_interview(request: Resume_Data):
@@ -33,6 +67,20 @@ async def start_interview(request: Resume_Data):
     Returns:
         InterviewResponse with call status and details
     """
+    # Pause dialing while the voice server is shedding load
+    admission = await asyncio.to_thread(voice_server_admission)
+    if admission and not admission.get("accepting", True):
+        logger.warning(f"Voice server not accepting calls ({admission.get('reason')}), not dialing")
+        return JSONResponse(
+            InterviewResponse(
+                status="paused",
+                message="Voice server is at capacity, retry later",
+                error=admission.get("reason"),
+            ).model_dump(),
+            status_code=503,
+            headers={"Retry-After": str(admission_retry_after)},
+        )
+
     try:
         # Validate inputs
         if not request.resume_data:
@@ -86,3 +134,36 @@ async def start_interview(request: Resume_Data):
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "message": "Service is running"}
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return health_monitor.liveness()
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: cached status of Trieve, OpenAI and Deepgram."""
+    result = health_monitor.readiness()
+    return JSONResponse(result, status_code=200 if result["status"] == "ready" else 503)
+
+# Transcript queries hit SQLite, so they run in the threadpool rather than on the loop
+@app.get("/transcripts")
+def transcripts_by_candidate(candidate: str, limit: int = 50):
+    """Calls with a candidate, newest first."""
+    return {"candidate": candidate, "calls": get_transcript_store().by_candidate(candidate, limit)}
+
+@app.get("/transcripts/search")
+def search_transcripts(q: str, limit: int = 20):
+    """Full-text search over transcripts; returns the matching turns of each call."""
+    try:
+        return {"query": q, "results": get_transcript_store().search(q, limit)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {str(e)}")
+
+@app.get("/transcripts/{call_sid}")
+def transcript_for_call(call_sid: str):
+    """Full transcript and interview responses of a call."""
+    records = get_transcript_store().by_call_sid(call_sid)
+    if not records:
+        raise HTTPException(status_code=404, detail="Transcript not found")
+    return records[-1]
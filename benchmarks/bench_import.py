@@ -0,0 +1,70 @@
+"""Cold-start import time of the project modules, without secrets.
+
+Each module is imported in a fresh interpreter with an environment that has no
+credentials, from an empty working directory. The import must succeed and
+must not create files (logs, databases) there.
+
+Usage:
+    python benchmarks/bench_import.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "server",
+    "api.main",
+    "utils.storage_text_extraction",
+    "utils.info_extraction",
+    "utils.metrics",
+]
+
+SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import {module}
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def time_import(module, workdir):
+    env = {"PATH": os.environ.get("PATH", ""), "HOME": workdir}
+    result = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(root=REPO_ROOT, module=module)],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<34} {'median ms':>10} {'min ms':>8}  side effects")
+    for module in args.modules:
+        with tempfile.TemporaryDirectory() as workdir:
+            try:
+                timings = [time_import(module, workdir) for _ in range(args.repeat)]
+            except RuntimeError as e:
+                print(f"{module:<34} {'error':>10}  {e}")
+                failed = True
+                continue
+            created = sorted(os.listdir(workdir))
+            failed = failed or bool(created)
+            print(f"{module:<34} {statistics.median(timings):>10.1f} {min(timings):>8.1f}  {', '.join(created) or '-'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
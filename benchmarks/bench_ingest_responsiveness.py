@@ -0,0 +1,96 @@
+"""API responsiveness while a large ingest runs in the background.
+
+Starts the PDF processing API with uvicorn, replaces GCS/Trieve work with a
+blocking stand-in that sleeps per file, submits ingestion jobs and measures
+``/health`` latency until they finish.
+
+Usage:
+    python benchmarks/bench_ingest_responsiveness.py --files 200 --file-delay 0.05 --jobs 2
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8765
+BASE = f"http://127.0.0.1:{PORT}"
+
+
+def fake_bucket_docs(n_files, file_delay):
+    def bucket_docs(query, on_progress=None, should_cancel=None, skip=None):
+        on_progress({"event": "listed", "total": n_files})
+        result = []
+        for i in range(n_files):
+            if should_cancel():
+                break
+            time.sleep(file_delay)  # blocking, like GCS download + Trieve upload
+            result_obj = {"image": f"{query.ID}/{i}.pdf", "status": "success"}
+            result.append(result_obj)
+            on_progress({"event": "file", "result": result_obj})
+        return result
+    return bucket_docs
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--file-delay", type=float, default=0.05)
+    parser.add_argument("--jobs", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["JOBS_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.json")
+    os.environ.setdefault("OPENAI_KEY", "bench")
+    from utils import storage_text_extraction as ste
+
+    ste.jobs_db_path = os.environ["JOBS_DB_PATH"]
+    ste.bucket_docs = fake_bucket_docs(args.files, args.file_delay)
+    ste.verify_bucket_access = lambda: True
+
+    server = uvicorn.Server(uvicorn.Config(ste.app, host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    payload = {"phone_number": "+10000000000", "candidate_name": "bench", "folder_path": "resumes"}
+    started = time.perf_counter()
+    job_ids = []
+    for _ in range(args.jobs):
+        response = requests.post(f"{BASE}/process-pdfs", json=payload)
+        job_ids.append(response.json()["job_id"])
+    submit_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    while True:
+        t0 = time.perf_counter()
+        requests.get(f"{BASE}/health")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        statuses = [requests.get(f"{BASE}/jobs/{job_id}").json()["status"] for job_id in job_ids]
+        if all(status in ste.TERMINAL_STATUSES for status in statuses):
+            break
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - started
+
+    print(f"jobs: {args.jobs} x {args.files} files, finished in {elapsed:.1f}s ({statuses})")
+    print(f"submit: {submit_ms:.1f} ms for {args.jobs} jobs")
+    print(
+        f"/health during ingest: n={len(latencies)} p50={statistics.median(latencies):.2f} ms "
+        f"p99={percentile(latencies, 99):.2f} ms max={max(latencies):.2f} ms"
+    )
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Micro-benchmarks of the voice server's hot paths, offline.
+
+- twilio_frame_parse: JSON decode + base64 decode of a Twilio media event (``twilio_receiver``)
+- twilio_frame_encode: base64 encode + JSON encode of an outbound media event (``sts_receiver``)
+- inbound_rechunk: buffering 20 ms frames into agent-sized chunks, per frame (``twilio_receiver``)
+- store_skills_experience_<n>: one ``store_skills_experience`` update against a TinyDB
+  file of n candidates
+- prompt_format / config_serialize: per-session prompt and ``SettingsConfiguration`` JSON
+- extracting_number: ``utils.info_extraction.extracting_number`` with a stub OpenAI client
+
+The frame paths mirror the inline code in ``server.run_call``; the rest call
+the project functions. Each result is the median time per call over
+``--repeat`` runs. ``--save-baseline`` writes the results; ``--baseline``
+compares against them and exits 1 when a median is slower than the baseline
+by more than its threshold (``--threshold``, or ``--threshold-for name=ratio``).
+Benchmarks the baseline has no entry for are listed as missing.
+
+Usage:
+    python benchmarks/bench_micro.py --save-baseline baseline.json
+    python benchmarks/bench_micro.py --baseline baseline.json --threshold 0.2 --json results.json
+    python benchmarks/bench_micro.py --only store --sizes 1000,10000,100000
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+_scratch = tempfile.mkdtemp(prefix="bench-micro-")
+os.environ["HR_DB_PATH"] = os.path.join(_scratch, "hr_database.json")
+
+from tinydb import TinyDB  # noqa: E402
+
+import server  # noqa: E402
+from utils import info_extraction  # noqa: E402
+from utils.sessions import Session  # noqa: E402
+
+FRAME = bytes(range(256))[:160]
+BUFFER_SIZE = 20 * 160
+INTERVIEW = {
+    "skills_assessment": {"main_skills": ["python", "aws"], "skill_responses": ["5 years of python"]},
+    "availability": {"immediate_availability": False, "notice_period": "30 days"},
+    "salary_expectations": {"expected_salary": "120,000", "negotiable": True},
+}
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    """Median seconds per call, with the call count per run scaled to take ``min_time``."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - started) / number)
+    return {
+        "median_us": round(statistics.median(runs) * 1e6, 3),
+        "min_us": round(min(runs) * 1e6, 3),
+        "max_us": round(max(runs) * 1e6, 3),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def bench_frames(args, results):
+    inbound = json.dumps({
+        "event": "media",
+        "sequenceNumber": "42",
+        "streamSid": "MZ00000000000000000000000000000000",
+        "media": {"track": "inbound", "chunk": "41", "timestamp": "820", "payload": base64.b64encode(FRAME).decode("ascii")},
+    })
+
+    def parse():
+        data = json.loads(inbound)
+        if data["event"] == "media":
+            base64.b64decode(data["media"]["payload"])
+
+    outbound = FRAME * 4
+
+    def encode():
+        json.dumps({
+            "event": "media",
+            "streamSid": "MZ00000000000000000000000000000000",
+            "media": {"payload": base64.b64encode(outbound).decode("ascii")},
+        })
+
+    state = {"inbuffer": bytearray()}
+
+    def rechunk():
+        inbuffer = state["inbuffer"]
+        inbuffer.extend(FRAME)
+        while len(inbuffer) >= BUFFER_SIZE:
+            inbuffer = inbuffer[BUFFER_SIZE:]
+        state["inbuffer"] = inbuffer
+
+    results["twilio_frame_parse"] = measure(parse, args.repeat, args.min_time)
+    results["twilio_frame_encode"] = measure(encode, args.repeat, args.min_time)
+    results["inbound_rechunk"] = measure(rechunk, args.repeat, args.min_time)
+
+
+def build_candidates(path: str, size: int):
+    db = TinyDB(path)
+    db.table("candidates").insert_multiple(
+        dict(INTERVIEW, candidate_name=f"candidate {i}", timestamp=datetime.now().isoformat(), type="interview_responses")
+        for i in range(size - 1)
+    )
+    # The candidate being interviewed is the last document, the worst case for the lookup
+    db.table("candidates").insert(
+        dict(INTERVIEW, candidate_name=server.candidate_name, timestamp=datetime.now().isoformat(), type="interview_responses")
+    )
+    db.close()
+
+
+def bench_store(args, results):
+    for size in args.sizes:
+        path = os.path.join(_scratch, f"hr_database_{size}.json")
+        build_candidates(path, size)
+        os.environ["HR_DB_PATH"] = path
+        loop = asyncio.new_event_loop()
+        try:
+            def store():
+                result = loop.run_until_complete(server.store_skills_experience(INTERVIEW))
+                if result.get("status") != "success":
+                    raise RuntimeError(result)
+
+            label = f"{size // 1000}k" if size % 1000 == 0 else str(size)
+            results[f"store_skills_experience_{label}"] = measure(store, args.repeat, args.min_time)
+            results[f"store_skills_experience_{label}"]["file_mb"] = round(os.path.getsize(path) / 1e6, 2)
+        finally:
+            loop.close()
+            os.remove(path)
+            os.remove(path + ".lock")
+
+
+def bench_prompt(args, results):
+    session = Session()
+    session.direction = "inbound"
+    session.candidate = {"candidate_name": "Ayesha Khan", "skills": ["react", "node.js", "aws", "postgresql"]}
+    instructions = server.session_instructions(session)
+
+    results["prompt_format"] = measure(lambda: server.session_instructions(session), args.repeat, args.min_time)
+    results["config_serialize"] = measure(
+        lambda: json.dumps(server.build_config_message(instructions)), args.repeat, args.min_time
+    )
+
+
+class StubCompletions:
+    def create(self, **kwargs):
+        content = '{"name": "Ayesha Khan", "email": "ayesha@example.com", "phone": "+923135212897", "skills": "react, node.js"}'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def bench_extraction(args, results):
+    info_extraction._openai_client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+    resume = "**Candidate Name:** Ayesha Khan\n\nPhone: 0313-5212897\n\n" + "Built React and Node.js services. " * 80
+
+    def extract():
+        if isinstance(info_extraction.extracting_number(resume), dict):
+            raise RuntimeError("extracting_number failed")
+
+    results["extracting_number"] = measure(extract, args.repeat, args.min_time)
+
+
+BENCHMARKS = {"frames": bench_frames, "store": bench_store, "prompt": bench_prompt, "extraction": bench_extraction}
+
+
+def compare(results, baseline, default_threshold, thresholds):
+    comparison = {}
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            comparison[name] = {"baseline_us": None, "ratio": None, "threshold": None, "missing": True, "regressed": False}
+            continue
+        ratio = result["median_us"] / base["median_us"] if base["median_us"] else None
+        limit = thresholds.get(name, default_threshold)
+        comparison[name] = {
+            "baseline_us": base["median_us"],
+            "ratio": round(ratio, 3) if ratio is not None else None,
+            "threshold": limit,
+            "regressed": ratio is not None and ratio > 1 + limit,
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"Comma separated groups: {','.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Candidate counts for store_skills_experience")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per run")
+    parser.add_argument("--baseline", help="Compare with results saved by --save-baseline")
+    parser.add_argument("--save-baseline", help="Write these results as a baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--threshold-for", action="append", default=[], metavar="NAME=RATIO",
+                        help="Per-benchmark threshold, e.g. store_skills_experience_100k=0.5")
+    parser.add_argument("--json", help="Write results and the comparison to this file")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    thresholds = {name: float(ratio) for name, ratio in (item.split("=", 1) for item in args.threshold_for)}
+    groups = args.only.split(",") if args.only else list(BENCHMARKS)
+    # Output paths are relative to where the script was run; extracting_number reads its
+    # prompt relative to the repository root
+    for option in ("baseline", "save_baseline", "json"):
+        if getattr(args, option):
+            setattr(args, option, os.path.abspath(getattr(args, option)))
+    os.chdir(REPO_ROOT)
+
+    results = {}
+    try:
+        for group in groups:
+            BENCHMARKS[group](args, results)
+    finally:
+        shutil.rmtree(_scratch, ignore_errors=True)
+
+    comparison = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison = compare(results, json.load(f), args.threshold, thresholds)
+
+    print(f"{'benchmark':<32} {'median us':>12} {'min us':>12} {'calls':>8} {'baseline':>12} {'ratio':>7}")
+    for name, result in results.items():
+        base = comparison.get(name, {})
+        flag = "  REGRESSED" if base.get("regressed") else ""
+        baseline_us = "missing" if base.get("missing") else base.get("baseline_us", "-")
+        print(f"{name:<32} {result['median_us']:>12} {result['min_us']:>12} {result['number']:>8} "
+              f"{str(baseline_us):>12} {str(base.get('ratio') or '-'):>7}{flag}")
+    missing = [name for name, entry in comparison.items() if entry.get("missing")]
+    if missing:
+        print(f"No baseline for {len(missing)} benchmarks: {', '.join(missing)}")
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "comparison": comparison,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+    sys.exit(1 if any(entry["regressed"] for entry in comparison.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
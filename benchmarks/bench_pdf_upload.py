@@ -0,0 +1,116 @@
+"""Peak RSS per file for the legacy and streaming PDF upload paths.
+
+Each measurement runs in a fresh subprocess so ``ru_maxrss`` reflects a single
+file. GCS and Trieve are replaced by an in-memory blob and a sink that drains
+the request body, so no network or credentials are needed.
+
+Usage:
+    python benchmarks/bench_pdf_upload.py --sizes 1,5,20
+"""
+import argparse
+import base64
+import importlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MB = 1024 * 1024
+
+
+class FakeBlob:
+    """Minimal stand-in for ``google.cloud.storage.Blob``."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def reload(self):
+        pass
+
+    def _data(self):
+        return os.urandom(self.size)
+
+    def download_to_file(self, fileobj):
+        fileobj.write(self._data())
+
+    def open(self, mode="rb", chunk_size=None):
+        return FakeReader(self.size)
+
+
+class FakeReader(io.RawIOBase):
+    """Streams ``size`` pseudo-random bytes without materialising them."""
+
+    def __init__(self, size):
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        n = self.remaining if n < 0 else min(n, self.remaining)
+        self.remaining -= n
+        return os.urandom(n)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_legacy(blob):
+    image_bytes = io.BytesIO()
+    blob.download_to_file(image_bytes)
+    encoded_string = base64.b64encode(image_bytes.getvalue())
+    decoded_str = encoded_string.decode('utf-8')
+    body = json.dumps({"base64_file": decoded_str, "file_name": blob.name})
+    return len(body)
+
+
+def run_streaming(blob):
+    from utils import storage_text_extraction as ste
+
+    total = 0
+    with ste.download_blob_to_spool(blob, max_bytes=blob.size) as spool:
+        for part in ste.iter_upload_body(spool, {"file_name": blob.name}):
+            total += len(part)
+    return total
+
+
+def child(mode, size):
+    blob = FakeBlob("resume.pdf", size)
+    if mode == "streaming":
+        # Import outside the measured window so module cost is not attributed to the file
+        importlib.import_module("utils.storage_text_extraction")
+    baseline = peak_rss_mb()
+    body_len = {"legacy": run_legacy, "streaming": run_streaming}[mode](blob)
+    print(json.dumps({"baseline_mb": baseline, "peak_mb": peak_rss_mb(), "body_bytes": body_len}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,5,20", help="Comma separated file sizes in MB")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "BYTES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'size MB':>8} {'mode':>10} {'peak RSS MB':>12} {'per-file MB':>12}")
+    for size_mb in [float(s) for s in args.sizes.split(",")]:
+        for mode in ("legacy", "streaming"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, str(int(size_mb * MB))],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            delta = result["peak_mb"] - result["baseline_mb"]
+            print(f"{size_mb:>8.1f} {mode:>10} {result['peak_mb']:>12.1f} {delta:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
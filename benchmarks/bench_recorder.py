@@ -0,0 +1,130 @@
+"""Cost of call recording on the audio path.
+
+1. Tap cost: time spent on the calling (event loop) thread per inbound and
+   outbound chunk, with the writer thread running, and how many times faster
+   than real time the writer gets through the audio.
+2. Slow disk: every write sleeps ``--slow-disk-ms`` while frames arrive at the
+   real-time rate of ``--calls`` calls; the taps must stay cheap and audio the
+   writer cannot keep up with must be dropped and counted, not queued.
+3. End to end (``--loadtest``): runs ``benchmarks/loadtest.py`` with and
+   without ``RECORDINGS_DIR`` and compares round-trip latency.
+
+Usage:
+    python benchmarks/bench_recorder.py --frames 50000
+    python benchmarks/bench_recorder.py --loadtest --concurrency 10 --duration 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.recorder import CallRecorder, RecordingWriter  # noqa: E402
+from utils.sessions import Session  # noqa: E402
+
+FRAME = b"\x7f" * 160
+AGENT_CHUNK = b"\x80" * 3200
+
+
+class SlowDiskRecorder(CallRecorder):
+    def __init__(self, *args, delay: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay = delay
+
+    def _write(self, inbound):
+        time.sleep(self.delay)
+        super()._write(inbound)
+
+
+def tap_cost(frames: int, directory: str, slow_disk_ms: float = 0.0, limit: int = 5000, frames_per_second=None):
+    """Feed ``frames`` inbound frames, as fast as possible or paced at ``frames_per_second``."""
+    writer = RecordingWriter(limit=limit)
+    session = Session()
+    session.call_sid = f"CAbench{session.id}"
+    recorder = SlowDiskRecorder(session, directory, writer, delay=slow_disk_ms / 1000)
+    tap_seconds = 0.0
+    worst = 0.0
+    started = time.perf_counter()
+    for i in range(frames):
+        if frames_per_second:
+            delay = started + i / frames_per_second - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        tap_started = time.perf_counter()
+        recorder.inbound(FRAME)
+        # The agent sends bigger chunks, roughly one per 20 inbound frames
+        if i % 20 == 0:
+            recorder.outbound(AGENT_CHUNK)
+        tap = time.perf_counter() - tap_started
+        tap_seconds += tap
+        worst = max(worst, tap)
+    recorder.close()
+    writer.stop()
+    elapsed = time.perf_counter() - started
+    return {
+        "frames": frames,
+        "tap_us_per_frame": round(tap_seconds / frames * 1e6, 3),
+        "tap_worst_us": round(worst * 1e6, 1),
+        "audio_seconds_per_wall_second": round(frames / 50 / elapsed, 1),
+        "max_queued": limit,
+        "dropped": recorder.dropped,
+        "file_bytes": os.path.getsize(recorder.path) if recorder.path else 0,
+    }
+
+
+def run_loadtest(concurrency: int, duration: float, recordings_dir: str = ""):
+    env = dict(os.environ)
+    env.pop("RECORDINGS_DIR", None)
+    if recordings_dir:
+        env["RECORDINGS_DIR"] = recordings_dir
+    with tempfile.NamedTemporaryFile(suffix=".json") as report:
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, "benchmarks", "loadtest.py"),
+             "--concurrency", str(concurrency), "--duration", str(duration), "--json", report.name],
+            env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        with open(report.name) as f:
+            return json.load(f)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=50000, help="Inbound frames per tap run (50 per second of call)")
+    parser.add_argument("--slow-disk-ms", type=float, default=5.0, help="Delay per write in the slow disk run")
+    parser.add_argument("--calls", type=int, default=10, help="Concurrent calls simulated in the slow disk run")
+    parser.add_argument("--limit", type=int, default=500, help="Writer queue limit in the slow disk run")
+    parser.add_argument("--loadtest", action="store_true", help="Also compare latency under benchmarks/loadtest.py")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        fast = tap_cost(args.frames, directory, limit=args.frames * 2)
+        print(f"tap, local disk:  {json.dumps(fast)}")
+        # Five seconds of audio for every simulated call
+        slow = tap_cost(
+            250 * args.calls, directory, args.slow_disk_ms, args.limit, frames_per_second=50 * args.calls
+        )
+        print(f"tap, slow disk:   {json.dumps(slow)}")
+
+        if args.loadtest:
+            baseline = run_loadtest(args.concurrency, args.duration)
+            recorded = run_loadtest(args.concurrency, args.duration, directory)
+            recordings = [name for name in os.listdir(directory) if name.startswith("CAload")]
+            print(f"\n{'':<12} {'rtt p50':>8} {'rtt p99':>8} {'clear p50':>10} {'loss%':>6} {'cpu%':>6}")
+            for label, report in (("baseline", baseline), ("recording", recorded)):
+                clear = report["barge_in_clear"] or {}
+                print(
+                    f"{label:<12} {report['frame_rtt']['p50_ms']:>8} {report['frame_rtt']['p99_ms']:>8} "
+                    f"{clear.get('p50_ms', '-'):>10} {report['frame_loss_pct']:>6} {report['server_cpu_pct']:>6}"
+                )
+            print(f"recordings written: {len(recordings)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Throughput of the interview scoring pipeline against a local mock LLM.
+
+Builds a scratch candidates table with ``--records`` interviews (a share of
+them with identical answers, as repeat calls produce) and matching resumes,
+then runs ``utils.scoring.ScoringPipeline`` at each concurrency level. The
+mock answers after ``--latency-ms`` (+/- jitter) and tracks peak in-flight
+requests. A second pass after resetting the high-water mark shows the cache.
+
+Usage:
+    python benchmarks/bench_scoring.py --records 5000 --concurrency 1,8,32 --latency-ms 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+# The scoring prompt is loaded relative to the repository root
+os.chdir(REPO_ROOT)
+
+from tinydb import TinyDB  # noqa: E402
+
+from utils.jobs import normalize_name  # noqa: E402
+from utils.scoring import ScoringPipeline, ScoringState  # noqa: E402
+
+SKILLS = ["python", "django", "react", "aws", "kubernetes", "sql", "figma", "pytorch", "go", "terraform"]
+
+
+class MockLLM:
+    def __init__(self, latency: float, jitter: float = 0.25, seed: int = 7):
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def complete(self, messages):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency * (1 + self.random.uniform(-self.jitter, self.jitter)))
+            score = len(messages[1]["content"]) % 10 + 1
+            return json.dumps({
+                "score": score,
+                "skills_match": "strong" if score > 6 else "partial",
+                "recommendation": "advance" if score > 6 else "hold",
+                "summary": "Mock score.",
+            })
+        finally:
+            self.in_flight -= 1
+
+
+def build_dataset(directory: str, records: int, duplicate_share: float):
+    rng = random.Random(11)
+    db = TinyDB(os.path.join(directory, "hr_database.json"))
+    table = db.table("candidates")
+    started = datetime.now() - timedelta(days=1)
+    docs, resumes = [], []
+    unique = max(1, int(records * (1 - duplicate_share)))
+    for i in range(records):
+        # Records past ``unique`` repeat an earlier candidate's answers
+        base = i % unique
+        name = f"candidate {base}"
+        skills = SKILLS[base % len(SKILLS)]
+        docs.append({
+            "candidate_name": name,
+            "skills_assessment": {"main_skills": [skills], "skill_responses": [f"{base % 7 + 1} years with {skills}"]},
+            "availability": {"notice_period": f"{(base % 4) * 15} days"},
+            "salary_expectations": {"expected_salary": f"{80 + base % 5 * 10},000", "negotiable": base % 2 == 0},
+            "timestamp": (started + timedelta(seconds=i)).isoformat(),
+            "type": "interview_responses",
+        })
+        if i < unique and i % 3 == 0:
+            resumes.append({"name": name, "name_key": normalize_name(name), "skills": ", ".join(rng.sample(SKILLS, 3))})
+    table.insert_multiple(docs)
+    return db, resumes
+
+
+async def run_level(directory, concurrency, args):
+    db, resumes = build_dataset(directory, args.records, args.duplicate_share)
+    state = ScoringState(os.path.join(directory, "scoring_database.json"))
+    llm = MockLLM(args.latency_ms / 1000)
+    pipeline = ScoringPipeline(
+        db.table("candidates"), resumes, state, complete=llm.complete,
+        concurrency=concurrency, batch_size=args.batch_size, settle_seconds=0,
+    )
+    started = time.perf_counter()
+    stats = await pipeline.run()
+    elapsed = time.perf_counter() - started
+
+    state.set_high_water_mark("")
+    rerun = ScoringPipeline(
+        db.table("candidates"), resumes, state, complete=llm.complete,
+        concurrency=concurrency, batch_size=args.batch_size, settle_seconds=0,
+    )
+    rerun_started = time.perf_counter()
+    rerun_stats = await rerun.run()
+    rerun_elapsed = time.perf_counter() - rerun_started
+    scored = len(state.scores())
+    state.close()
+    db.close()
+    return {
+        "concurrency": concurrency,
+        "records": args.records,
+        "seconds": round(elapsed, 2),
+        "records_per_second": round(args.records / elapsed, 1),
+        "llm_calls": stats["llm_calls"],
+        "cached": stats["cached"],
+        "failed": stats["failed"],
+        "peak_in_flight": llm.peak_in_flight,
+        "rerun_seconds": round(rerun_elapsed, 2),
+        "rerun_llm_calls": rerun_stats["llm_calls"],
+        "scores_written": scored,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Mock LLM response time")
+    parser.add_argument("--duplicate-share", type=float, default=0.2, help="Share of interviews with repeated answers")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'conc':>5} {'records/s':>10} {'seconds':>8} {'llm calls':>10} {'cached':>7} {'peak':>5} {'rerun s':>8} {'rerun calls':>12}")
+    for level in [int(c) for c in args.concurrency.split(",")]:
+        with tempfile.TemporaryDirectory() as directory:
+            result = asyncio.run(run_level(directory, level, args))
+        results.append(result)
+        print(
+            f"{level:>5} {result['records_per_second']:>10} {result['seconds']:>8} {result['llm_calls']:>10} "
+            f"{result['cached']:>7} {result['peak_in_flight']:>5} {result['rerun_seconds']:>8} {result['rerun_llm_calls']:>12}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Local simulator for Twilio call-status webhooks.
+
+Starts ``server.py --serve-only`` like ``loadtest.py`` (with the fake agent)
+and plays the callbacks Twilio sends for outbound calls against its
+``/call-status`` endpoint, opening a media stream where a real call would
+have one. Each scenario checks the server's ``/calls`` and ``/admission``
+views:
+
+- answered: reservation held while ringing, released when the call is
+  answered; ring and answer times recorded
+- answered-elsewhere: ``in-progress`` releases the reservation even though
+  the stream never reaches this worker (it went to another one)
+- no-answer, busy, failed: reservation released by the final callback
+- out-of-order: a stale ``ringing`` after ``in-progress`` is ignored
+- stuck-stream: ``completed`` while the stream is still open hangs it up
+- overbooking: ringing calls count toward MAX_ACTIVE_CALLS for the dialer
+- forged: a callback without a valid ``X-Twilio-Signature`` is refused and
+  neither hangs up the call nor reserves a slot
+
+Callbacks are signed like Twilio signs them, with a scratch auth token.
+
+Exits 1 when a check fails.
+
+Usage:
+    python benchmarks/call_status_simulator.py --ring-seconds 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import websockets
+from twilio.request_validator import RequestValidator
+
+from fake_agent_server import FakeAgent
+from loadtest import start_server
+
+MAX_ACTIVE_CALLS = 3
+AUTH_TOKEN = "simulator"
+ADMIN_TOKEN = "simulator-admin"
+
+
+class Simulator:
+    def __init__(self, port: int, ring_seconds: float):
+        self.base = f"http://127.0.0.1:{port}"
+        self.validator = RequestValidator(AUTH_TOKEN)
+        self.stream_url = f"ws://127.0.0.1:{port}/twilio"
+        self.ring_seconds = ring_seconds
+        self.sequences = {}
+        self.failures = []
+
+    def _get(self, path, headers=None):
+        try:
+            request = urllib.request.Request(self.base + path, headers=headers or {})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def signature(self, path):
+        return self.validator.compute_signature(self.base + path, {})
+
+    async def callback(self, call_sid, status, sequence=None, signature=None, expect=204, **extra):
+        """Send one status callback the way Twilio does (signed GET, form-style query)."""
+        if sequence is None:
+            sequence = self.sequences.get(call_sid, -1) + 1
+        self.sequences[call_sid] = max(sequence, self.sequences.get(call_sid, -1))
+        query = urllib.parse.urlencode({
+            "CallSid": call_sid, "CallStatus": status, "SequenceNumber": sequence,
+            "To": "+923135212897", "Direction": "outbound-api", **extra,
+        })
+        path = f"/call-status?{query}"
+        headers = {"X-Twilio-Signature": self.signature(path) if signature is None else signature}
+        code, _ = await asyncio.to_thread(self._get, path, headers)
+        if code != expect:
+            self.failures.append(f"{call_sid}: callback {status} returned {code}")
+
+    async def attempt(self, call_sid):
+        _, body = await asyncio.to_thread(self._get, "/calls", {"X-Admin-Token": ADMIN_TOKEN})
+        for attempt in json.loads(body)["attempts"]:
+            if attempt["call_sid"] == call_sid:
+                return attempt
+        return None
+
+    async def admission(self):
+        _, body = await asyncio.to_thread(self._get, "/admission")
+        return json.loads(body)
+
+    def check(self, scenario, condition, message):
+        if not condition:
+            self.failures.append(f"{scenario}: {message}")
+        return condition
+
+    async def open_stream(self, call_sid):
+        ws = await websockets.connect(self.stream_url)
+        await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+        stream_sid = f"MZ{call_sid[2:]}"
+        await ws.send(json.dumps({
+            "event": "start",
+            "streamSid": stream_sid,
+            "start": {"streamSid": stream_sid, "callSid": call_sid, "tracks": ["inbound"]},
+        }))
+        await asyncio.sleep(0.3)
+        return ws, stream_sid
+
+    async def answered(self):
+        name, sid = "answered", "CAsim000001"
+        await self.callback(sid, "initiated")
+        await self.callback(sid, "ringing")
+        attempt = await self.attempt(sid)
+        self.check(name, attempt and attempt["reserved"], "no reservation while ringing")
+        await asyncio.sleep(self.ring_seconds)
+        await self.callback(sid, "in-progress")
+        attempt = await self.attempt(sid)
+        self.check(name, attempt and not attempt["reserved"], "reservation kept after answer")
+        ws, stream_sid = await self.open_stream(sid)
+        attempt = await self.attempt(sid)
+        self.check(name, attempt and attempt["stream_started"], "stream start not recorded")
+        await ws.send(json.dumps({"event": "stop", "streamSid": stream_sid}))
+        await ws.close()
+        await self.callback(sid, "completed", CallDuration="4")
+        attempt = await self.attempt(sid)
+        self.check(name, attempt and attempt["status"] == "completed", f"final status {attempt and attempt['status']}")
+        ring = attempt and attempt["ring_seconds"]
+        self.check(name, ring is not None and abs(ring - self.ring_seconds) < 0.5, f"ring time {ring}")
+        self.check(name, attempt and attempt["answer_seconds"] is not None, "no answer time")
+        return attempt
+
+    async def answered_elsewhere(self):
+        name, sid = "answered-elsewhere", "CAsim000005"
+        await self.callback(sid, "initiated")
+        await self.callback(sid, "ringing")
+        await self.callback(sid, "in-progress")
+        attempt = await self.attempt(sid)
+        self.check(name, attempt and not attempt["reserved"], "reservation kept with no stream on this worker")
+        self.check(name, attempt and not attempt["stream_started"], "stream recorded without one")
+        admission = await self.admission()
+        self.check(name, admission["reserved_calls"] == 0, f"admission still counts it: {admission}")
+        await self.callback(sid, "completed", CallDuration="30")
+        return attempt
+
+    async def unanswered(self, status):
+        sid = f"CAsim{status.replace('-', '')[:6]:0>6}"
+        await self.callback(sid, "initiated")
+        if status != "failed":
+            await self.callback(sid, "ringing")
+            await asyncio.sleep(self.ring_seconds)
+        await self.callback(sid, status)
+        attempt = await self.attempt(sid)
+        self.check(status, attempt and attempt["status"] == status, f"final status {attempt and attempt['status']}")
+        self.check(status, attempt and not attempt["reserved"], "reservation not released")
+        return attempt
+
+    async def out_of_order(self):
+        name, sid = "out-of-order", "CAsim000002"
+        await self.callback(sid, "initiated", sequence=0)
+        await self.callback(sid, "in-progress", sequence=2)
+        await self.callback(sid, "ringing", sequence=1)
+        attempt = await self.attempt(sid)
+        self.check(name, attempt and attempt["status"] == "in-progress", f"status {attempt and attempt['status']}")
+        await self.callback(sid, "completed", sequence=3)
+        return await self.attempt(sid)
+
+    async def stuck_stream(self):
+        name, sid = "stuck-stream", "CAsim000003"
+        await self.callback(sid, "initiated")
+        await self.callback(sid, "in-progress")
+        ws, _ = await self.open_stream(sid)
+        started = time.perf_counter()
+        await self.callback(sid, "completed")
+        try:
+            await asyncio.wait_for(ws.wait_closed(), timeout=5)
+            closed_after = time.perf_counter() - started
+        except asyncio.TimeoutError:
+            closed_after = None
+            await ws.close()
+        self.check(name, closed_after is not None and closed_after < 1.0, f"stream closed after {closed_after}")
+        attempt = await self.attempt(sid)
+        if attempt is not None:
+            attempt["hangup_ms"] = round(closed_after * 1000, 1) if closed_after is not None else None
+        return attempt
+
+    async def forged(self):
+        name, sid = "forged", "CAsim000004"
+        await self.callback(sid, "initiated")
+        await self.callback(sid, "in-progress")
+        ws, stream_sid = await self.open_stream(sid)
+        await self.callback(sid, "completed", signature="forged", expect=403)
+        await self.callback("CAsimforged", "initiated", signature="", expect=403)
+        await asyncio.sleep(0.5)
+        self.check(name, ws.open, "forged completed hung up the call")
+        self.check(name, await self.attempt("CAsimforged") is None, "forged initiated created an attempt")
+        if ws.open:
+            await ws.send(json.dumps({"event": "stop", "streamSid": stream_sid}))
+        await ws.close()
+        await self.callback(sid, "completed")
+        return await self.attempt(sid)
+
+    async def overbooking(self):
+        name = "overbooking"
+        sids = [f"CAsimbook{i:02d}" for i in range(MAX_ACTIVE_CALLS)]
+        for sid in sids:
+            await self.callback(sid, "initiated")
+        full = await self.admission()
+        self.check(name, not full["accepting"] and full["reserved_calls"] == MAX_ACTIVE_CALLS, f"admission while full: {full}")
+        await self.callback(sids[0], "no-answer")
+        reopened = await self.admission()
+        self.check(name, reopened["accepting"], f"admission after a no-answer: {reopened}")
+        for sid in sids[1:]:
+            await self.callback(sid, "canceled")
+        return {"call_sid": "-", "status": f"full={not full['accepting']} reopened={reopened['accepting']}",
+                "reserved": reopened["reserved_calls"]}
+
+
+async def run(args):
+    agent = FakeAgent(tool_interval=0)
+    agent_server = await agent.serve("127.0.0.1", args.agent_port)
+    workdir = tempfile.mkdtemp(prefix="callstatus-")
+    os.environ["MAX_ACTIVE_CALLS"] = str(MAX_ACTIVE_CALLS)
+    os.environ["TWILIO_AUTH_TOKEN"] = AUTH_TOKEN
+    os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+    # The URL Twilio would have signed; the simulator calls the server directly
+    os.environ["STATUS_CALLBACK_URL"] = f"http://127.0.0.1:{args.port}/call-status"
+    server = await asyncio.to_thread(start_server, args.port, args.agent_port, workdir)
+    simulator = Simulator(args.port, args.ring_seconds)
+    results = []
+    try:
+        results.append(("answered", await simulator.answered()))
+        results.append(("answered-elsewhere", await simulator.answered_elsewhere()))
+        for status in ("no-answer", "busy", "failed"):
+            results.append((status, await simulator.unanswered(status)))
+        results.append(("out-of-order", await simulator.out_of_order()))
+        results.append(("stuck-stream", await simulator.stuck_stream()))
+        results.append(("forged", await simulator.forged()))
+        results.append(("overbooking", await simulator.overbooking()))
+    finally:
+        server.terminate()
+        await asyncio.to_thread(server.wait, 30)
+        agent_server.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results, simulator.failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ring-seconds", type=float, default=1.0, help="Simulated time between ringing and the next status")
+    parser.add_argument("--port", type=int, default=5700)
+    parser.add_argument("--agent-port", type=int, default=5750)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results, failures = asyncio.run(run(args))
+    print(f"{'scenario':<18} {'status':<28} {'reserved':>8} {'ring s':>7} {'answer s':>8}")
+    for name, attempt in results:
+        attempt = attempt or {}
+        print(f"{name:<18} {str(attempt.get('status')):<28} {str(attempt.get('reserved')):>8} "
+              f"{str(attempt.get('ring_seconds', '-')):>7} {str(attempt.get('answer_seconds', '-')):>8}")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": dict(results), "failures": failures}, f, indent=2)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
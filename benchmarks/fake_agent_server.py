@@ -0,0 +1,137 @@
+"""Local stand-in for the Deepgram voice agent endpoint.
+
+Speaks enough of the agent protocol to exercise ``twilio_handler``:
+
+- waits for the ``SettingsConfiguration`` message, then sends a short greeting
+  and its ``ConversationText``
+- echoes every binary audio chunk back after ``echo_delay`` seconds
+- sends ``UserStartedSpeaking`` and a user ``ConversationText`` when an inbound
+  frame carries the barge-in flag written by ``benchmarks/loadtest.py``
+- sends an ``agent_filler`` ``FunctionCallRequest`` every ``tool_interval`` seconds
+  and times the matching ``FunctionCallResponse``
+
+Point the server at it with ``DEEPGRAM_AGENT_URL=ws://127.0.0.1:5050``.
+
+Usage:
+    python benchmarks/fake_agent_server.py --port 5050
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import websockets
+
+FRAME_SIZE = 160
+# Loadtest frames start with MAGIC, a 4-byte sequence number and a flag byte
+MAGIC = b"LT"
+BARGE_IN_FLAG = 1
+GREETING = b"\xff" * FRAME_SIZE * 25  # 0.5 s of mu-law silence
+
+
+class AgentStats:
+    """Counters collected across all sessions served by this fake agent."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.sessions_closed = 0
+        self.chunks_in = 0
+        self.tool_latencies = []
+        self.unanswered_tools = 0
+
+    def reset(self):
+        self.__init__()
+
+
+def has_barge_in_flag(chunk: bytes) -> bool:
+    for offset in range(0, len(chunk) - 6, FRAME_SIZE):
+        if chunk[offset:offset + 2] == MAGIC and chunk[offset + 6] == BARGE_IN_FLAG:
+            return True
+    return False
+
+
+class FakeAgent:
+    def __init__(self, echo_delay: float = 0.0, tool_interval: float = 5.0):
+        self.echo_delay = echo_delay
+        self.tool_interval = tool_interval
+        self.stats = AgentStats()
+
+    async def handler(self, ws, path=None):
+        self.stats.sessions += 1
+        pending_tools = {}
+        settings = json.loads(await ws.recv())
+        if settings.get("type") != "SettingsConfiguration":
+            await ws.close(code=1008, reason="expected SettingsConfiguration")
+            return
+        await ws.send(json.dumps({"type": "SettingsApplied"}))
+        await ws.send(json.dumps({"type": "ConversationText", "role": "assistant", "content": "Hello, this is a load test."}))
+        await ws.send(GREETING)
+
+        async def tool_requests():
+            while True:
+                await asyncio.sleep(self.tool_interval)
+                call_id = uuid.uuid4().hex
+                pending_tools[call_id] = time.perf_counter()
+                await ws.send(json.dumps({
+                    "type": "FunctionCallRequest",
+                    "function_name": "agent_filler",
+                    "function_call_id": call_id,
+                    "input": {"message_type": "lookup"},
+                }))
+
+        async def echo(chunk):
+            if self.echo_delay:
+                await asyncio.sleep(self.echo_delay)
+            await ws.send(chunk)
+
+        tools_task = asyncio.ensure_future(tool_requests()) if self.tool_interval > 0 else None
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    self.stats.chunks_in += 1
+                    if has_barge_in_flag(message):
+                        await ws.send(json.dumps({"type": "UserStartedSpeaking"}))
+                        await ws.send(json.dumps({"type": "ConversationText", "role": "user", "content": "Load test utterance."}))
+                    if self.echo_delay:
+                        asyncio.ensure_future(echo(message))
+                    else:
+                        await ws.send(message)
+                    continue
+                decoded = json.loads(message)
+                if decoded.get("type") == "FunctionCallResponse":
+                    sent_at = pending_tools.pop(decoded.get("function_call_id"), None)
+                    if sent_at is not None:
+                        self.stats.tool_latencies.append(time.perf_counter() - sent_at)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if tools_task:
+                tools_task.cancel()
+            self.stats.unanswered_tools += len(pending_tools)
+            self.stats.sessions_closed += 1
+
+    def serve(self, host: str, port: int):
+        return websockets.serve(self.handler, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--echo-delay", type=float, default=0.0, help="Seconds before echoing audio")
+    parser.add_argument("--tool-interval", type=float, default=5.0, help="Seconds between function calls (0 disables)")
+    args = parser.parse_args()
+
+    agent = FakeAgent(args.echo_delay, args.tool_interval)
+
+    async def serve_forever():
+        async with agent.serve(args.host, args.port):
+            print(f"Fake agent listening on ws://{args.host}:{args.port}", flush=True)
+            await asyncio.Future()
+
+    asyncio.run(serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""Offline load test for the voice server with simulated Twilio callers.
+
+Starts ``server.py --serve-only`` as a subprocess pointed at an in-process
+fake agent (``benchmarks/fake_agent_server.py``), then opens N concurrent
+``/twilio`` streams per concurrency level. Each caller sends ``connected``,
+``start``, real-time 20 ms ``media`` frames and ``stop``.
+
+Every outgoing frame is stamped with a sequence number so the echoed audio
+gives per-frame round-trip latency and frame loss; the fake agent's chunk
+count shows inbound audio that never reached it, including the partial
+buffer the server flushes at stop. Some frames carry a
+barge-in flag that makes the fake agent send ``UserStartedSpeaking``, which
+times the ``clear`` round trip. Server CPU and RSS come from /proc (Linux).
+
+With ``--memdiag`` the server runs with ``MEMDIAG=1``; after each level the
+test waits out the lingering-task grace period and reads ``/debug/memory``
+(after a gc): traced memory, tasks left running by ended calls and ended
+sessions still referenced. It exits 1 if any level leaked either.
+
+Usage:
+    python benchmarks/loadtest.py --concurrency 1,10,50 --duration 10
+    python benchmarks/loadtest.py --audio call.ulaw --json report.json
+    python benchmarks/loadtest.py --concurrency 10,10,10 --memdiag
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from fake_agent_server import BARGE_IN_FLAG, FRAME_SIZE, MAGIC, FakeAgent  # noqa: E402
+from utils.phrase_cache import linear_to_mulaw  # noqa: E402
+
+FRAME_SECONDS = 0.02
+# Grace period before the server reports a finished call's tasks as lingering
+MEMDIAG_LINGER_SECONDS = 2.0
+# twilio_receiver forwards inbound audio to the agent in chunks of this many frames
+SERVER_BUFFER_FRAMES = 20
+
+
+def synthetic_audio(seconds: float = 5.0) -> bytes:
+    """A 440 Hz tone at 8 kHz mu-law, used when no recording is given."""
+    samples = int(8000 * seconds)
+    return bytes(linear_to_mulaw(int(8000 * math.sin(2 * math.pi * 440 * i / 8000))) for i in range(samples))
+
+
+def load_audio(path: str) -> bytes:
+    """Load raw 8 kHz mu-law audio, skipping a WAV header if present."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == b"RIFF":
+        index = data.find(b"data")
+        data = data[index + 8:] if index >= 0 else data[44:]
+    return data
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 2)
+
+    return {"p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99), "max_ms": round(ordered[-1] * 1000, 2)}
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of a process from /proc."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    def rss_mb(self) -> float:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+
+class CallerResult:
+    def __init__(self):
+        self.frames_sent = 0
+        self.echoed = set()
+        self.frame_rtts = []
+        self.first_audio = None
+        self.clear_latencies = []
+        self.error = None
+
+
+async def simulated_call(url, index, audio, duration, barge_in_every, result: CallerResult):
+    """One Twilio media stream: connected, start, real-time media, stop."""
+    stream_sid = f"MZload{index:06d}"
+    sent_at = {}
+    pending_barge_in = []
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            started = time.perf_counter()
+            await ws.send(json.dumps({
+                "event": "start",
+                "streamSid": stream_sid,
+                "start": {"streamSid": stream_sid, "callSid": f"CAload{index:06d}", "tracks": ["inbound"]},
+            }))
+
+            async def receive():
+                async for message in ws:
+                    data = json.loads(message)
+                    now = time.perf_counter()
+                    if data["event"] == "media":
+                        if result.first_audio is None:
+                            result.first_audio = now - started
+                        payload = base64.b64decode(data["media"]["payload"])
+                        for offset in range(0, len(payload) - 6, FRAME_SIZE):
+                            if payload[offset:offset + 2] == MAGIC:
+                                seq = struct.unpack(">I", payload[offset + 2:offset + 6])[0]
+                                if seq in sent_at and seq not in result.echoed:
+                                    result.echoed.add(seq)
+                                    result.frame_rtts.append(now - sent_at[seq])
+                    elif data["event"] == "clear" and pending_barge_in:
+                        result.clear_latencies.append(now - pending_barge_in.pop(0))
+
+            receiver = asyncio.ensure_future(receive())
+            total_frames = int(duration / FRAME_SECONDS)
+            barge_every_frames = int(barge_in_every / FRAME_SECONDS) if barge_in_every else 0
+            for seq in range(total_frames):
+                offset = (seq * FRAME_SIZE) % max(len(audio) - FRAME_SIZE, 1)
+                flag = BARGE_IN_FLAG if barge_every_frames and seq and seq % barge_every_frames == 0 else 0
+                frame = MAGIC + struct.pack(">IB", seq, flag) + audio[offset + 7:offset + FRAME_SIZE]
+                now = time.perf_counter()
+                sent_at[seq] = now
+                if flag:
+                    pending_barge_in.append(now)
+                await ws.send(json.dumps({
+                    "event": "media",
+                    "streamSid": stream_sid,
+                    "media": {"track": "inbound", "chunk": str(seq), "payload": base64.b64encode(frame).decode("ascii")},
+                }))
+                result.frames_sent += 1
+                # Absolute schedule so send jitter does not accumulate
+                delay = started + (seq + 1) * FRAME_SECONDS - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            # Let the last full buffer make the round trip before hanging up
+            await asyncio.sleep(1.0)
+            await ws.send(json.dumps({"event": "stop", "streamSid": stream_sid}))
+            # The server flushes its partial inbound buffer to the agent on stop
+            await asyncio.sleep(0.5)
+            receiver.cancel()
+    except Exception as e:
+        result.error = str(e)
+
+
+async def run_level(url, concurrency, args, audio, agent, sampler):
+    agent.stats.reset()
+    results = [CallerResult() for _ in range(concurrency)]
+    cpu_before = sampler.cpu_seconds()
+    rss_peak = sampler.rss_mb()
+    wall_started = time.perf_counter()
+
+    async def sample_rss():
+        nonlocal rss_peak
+        while True:
+            rss_peak = max(rss_peak, sampler.rss_mb())
+            await asyncio.sleep(0.5)
+
+    rss_task = asyncio.ensure_future(sample_rss())
+
+    async def start_caller(i):
+        await asyncio.sleep(args.ramp * i / max(concurrency, 1))
+        await simulated_call(url, i, audio, args.duration, args.barge_in_every, results[i])
+
+    await asyncio.gather(*(start_caller(i) for i in range(concurrency)))
+    # The server closes each agent connection after flushing its last audio; count it all
+    deadline = time.perf_counter() + 10
+    while agent.stats.sessions_closed < agent.stats.sessions and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+    rss_task.cancel()
+    wall = time.perf_counter() - wall_started
+    cpu = sampler.cpu_seconds() - cpu_before
+
+    frames_sent = sum(r.frames_sent for r in results)
+    # Frames after the last full server buffer reach the agent only at stop, when nothing
+    # can be played back; they count toward delivery to the agent but not toward echo loss
+    frames_echoable = sum(r.frames_sent - r.frames_sent % SERVER_BUFFER_FRAMES for r in results)
+    frames_echoed = sum(len(r.echoed) for r in results)
+    chunks_expected = sum(math.ceil(r.frames_sent / SERVER_BUFFER_FRAMES) for r in results if not r.error)
+    return {
+        "concurrency": concurrency,
+        "errors": sum(1 for r in results if r.error),
+        "frames_sent": frames_sent,
+        "frame_loss_pct": round(100 * (frames_echoable - frames_echoed) / frames_echoable, 2) if frames_echoable else None,
+        # Inbound chunks that never reached the agent, including the partial one flushed at stop
+        "agent_chunks_missing": max(0, chunks_expected - agent.stats.chunks_in),
+        "frame_rtt": percentiles([rtt for r in results for rtt in r.frame_rtts]),
+        "first_audio": percentiles([r.first_audio for r in results if r.first_audio is not None]),
+        "barge_in_clear": percentiles([lat for r in results for lat in r.clear_latencies]),
+        "tool_response": percentiles(agent.stats.tool_latencies),
+        "server_cpu_pct": round(100 * cpu / wall, 1),
+        "server_rss_peak_mb": round(rss_peak, 1),
+    }
+
+
+def start_server(port, agent_port, workdir):
+    env = dict(os.environ)
+    env.setdefault("TWILIO_ACCOUNT_SID", "ACloadtest")
+    env.setdefault("TWILIO_AUTH_TOKEN", "loadtest")
+    env.setdefault("TRIEVE_API_KEY", "loadtest")
+    env.setdefault("TRIEVE_API_URL", "loadtest")
+    env.setdefault("OPENAI_KEY", "loadtest")
+    env["DEEPGRAM_AGENT_URL"] = f"ws://127.0.0.1:{agent_port}"
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "server.py"), "--serve-only", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return process
+        except Exception:
+            if process.poll() is not None:
+                raise RuntimeError("server.py exited during startup")
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server.py did not start within 30s")
+
+
+async def memory_report(port, lingering_before):
+    """Leak indicators from the server's /debug/memory once the level's calls have wound down."""
+    await asyncio.sleep(MEMDIAG_LINGER_SECONDS + 1.0)
+
+    def fetch():
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/debug/memory?gc=1&top=5&diff=1", timeout=30) as response:
+            return json.loads(response.read())
+
+    def accepting():
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/admission", timeout=5):
+                return True
+        except Exception:
+            return False
+
+    report = await asyncio.to_thread(fetch)
+    # The snapshot stalls the server's loop; let the lag window clear so the next level is admitted
+    deadline = time.perf_counter() + 15
+    while not await asyncio.to_thread(accepting) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.5)
+    lingering = report["lingering"][lingering_before:]
+    return {
+        "traced_mb": round(report["traced_kb"] / 1024, 2),
+        "traced_peak_mb": round(report["traced_peak_kb"] / 1024, 2),
+        "tasks": report["tasks"]["total"],
+        "lingering_tasks": sum(len(entry["tasks"]) for entry in lingering),
+        "lingering_names": sorted({name for entry in lingering for name in entry["tasks"]}),
+        "ended_sessions_alive": report["ended_sessions_alive"],
+        "top_growth": report["top_allocations"],
+    }, len(report["lingering"])
+
+
+def print_report(levels):
+    def fmt(stats, key="p50_ms"):
+        return f"{stats[key]:.1f}" if stats else "-"
+
+    print(f"{'calls':>6} {'err':>4} {'loss%':>6} {'lost chunks':>11} {'rtt p50':>8} {'rtt p99':>8} {'first p50':>9} "
+          f"{'clear p50':>9} {'tool p50':>8} {'cpu%':>6} {'rss MB':>7}")
+    for level in levels:
+        print(f"{level['concurrency']:>6} {level['errors']:>4} {level['frame_loss_pct'] or 0:>6.2f} {level['agent_chunks_missing']:>11} "
+              f"{fmt(level['frame_rtt']):>8} {fmt(level['frame_rtt'], 'p99_ms'):>8} {fmt(level['first_audio']):>9} "
+              f"{fmt(level['barge_in_clear']):>9} {fmt(level['tool_response']):>8} "
+              f"{level['server_cpu_pct']:>6.1f} {level['server_rss_peak_mb']:>7.1f}")
+
+    if any("memory" in level for level in levels):
+        print(f"\n{'calls':>6} {'traced MB':>10} {'peak MB':>8} {'tasks':>6} {'lingering':>9} {'sessions alive':>14}")
+        for level in levels:
+            memory = level.get("memory")
+            if memory:
+                print(f"{level['concurrency']:>6} {memory['traced_mb']:>10.2f} {memory['traced_peak_mb']:>8.2f} "
+                      f"{memory['tasks']:>6} {memory['lingering_tasks']:>9} {memory['ended_sessions_alive']:>14}"
+                      + (f"  {', '.join(memory['lingering_names'])}" if memory["lingering_names"] else ""))
+
+
+async def run(args):
+    audio = load_audio(args.audio) if args.audio else synthetic_audio()
+    agent = FakeAgent(echo_delay=args.echo_delay, tool_interval=args.tool_interval)
+    agent_server = await agent.serve("127.0.0.1", args.agent_port)
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    if args.memdiag:
+        os.environ["MEMDIAG"] = "1"
+        os.environ["MEMDIAG_LINGER_SECONDS"] = str(MEMDIAG_LINGER_SECONDS)
+    server = await asyncio.to_thread(start_server, args.port, args.agent_port, workdir)
+    sampler = ProcessSampler(server.pid)
+    url = f"ws://127.0.0.1:{args.port}/twilio"
+    levels = []
+    lingering_seen = 0
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            levels.append(await run_level(url, concurrency, args, audio, agent, sampler))
+            if args.memdiag:
+                levels[-1]["memory"], lingering_seen = await memory_report(args.port, lingering_seen)
+            print(f"finished {concurrency} concurrent calls", flush=True)
+    finally:
+        server.terminate()
+        # Keep the loop running so client sockets can finish their close handshakes
+        await asyncio.to_thread(server.wait, 30)
+        agent_server.close()
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,5,10,25", help="Comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of audio per call")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Seconds over which calls in a level start")
+    parser.add_argument("--barge-in-every", type=float, default=3.0, help="Seconds between barge-in frames (0 disables)")
+    parser.add_argument("--tool-interval", type=float, default=4.0, help="Seconds between fake function calls (0 disables)")
+    parser.add_argument("--echo-delay", type=float, default=0.0, help="Fake agent echo delay in seconds")
+    parser.add_argument("--audio", help="Raw 8 kHz mu-law file (or mu-law WAV) to stream")
+    parser.add_argument("--port", type=int, default=5600)
+    parser.add_argument("--agent-port", type=int, default=5650)
+    parser.add_argument("--memdiag", action="store_true", help="Run the server with memory diagnostics and check for leaks")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    levels = asyncio.run(run(args))
+    print_report(levels)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(levels, f, indent=2)
+    leaked = [level for level in levels if level.get("memory") and
+              (level["memory"]["lingering_tasks"] or level["memory"]["ended_sessions_alive"])]
+    sys.exit(1 if leaked else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Replay captured sessions through ``twilio_handler`` with no network.
+
+Capture sessions by running the server with ``SESSION_CAPTURE_DIR`` set (see
+``utils/session_capture.py``). The replayer feeds each capture's Twilio
+events and agent messages back through fake websockets at their recorded
+offsets, divided by ``--speed``, and times how the handler responds:
+
+- tool: agent ``FunctionCallRequest`` to the handler's ``FunctionCallResponse``
+- clear: agent ``UserStartedSpeaking`` to ``clear`` sent to Twilio
+- first_audio: Twilio ``start`` to the first media sent to Twilio (scales with --speed)
+- teardown: last Twilio event to the handler returning
+
+Budgets are in milliseconds; the exit status is 1 when any replay exceeds one.
+The interview database and transcript store point at a temporary directory.
+
+Usage:
+    python benchmarks/replay_session.py captures/*.vsr --speed 4 --max-tool-ms 250 --max-clear-ms 50
+"""
+import argparse
+import asyncio
+import atexit
+import base64
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Set before the server modules read them, so replays never touch real data
+_scratch = tempfile.mkdtemp(prefix="replay-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ["HR_DB_PATH"] = os.path.join(_scratch, "hr_database.json")
+os.environ["TRANSCRIPTS_DB_PATH"] = os.path.join(_scratch, "transcripts.db")
+os.environ.pop("RECORDINGS_DIR", None)
+os.environ.pop("SESSION_CAPTURE_DIR", None)
+
+import server  # noqa: E402
+from utils.session_capture import (  # noqa: E402
+    AGENT_CONNECTED, AGENT_IN, AGENT_IN_BINARY, AGENT_OUT, AGENT_OUT_BINARY, END,
+    TWILIO_IN, TWILIO_IN_MEDIA, TWILIO_OUT, TWILIO_OUT_MEDIA, compact_twilio, read_capture,
+)
+
+BUDGETS = ("tool", "clear", "first_audio", "teardown")
+
+
+class LatencyTracker:
+    """Derives handler latencies from a timed sequence of capture records."""
+
+    def __init__(self):
+        self.samples = {name: [] for name in BUDGETS}
+        self._pending_tools = {}
+        self._barge_in_at = None
+        self._start_at = None
+        self._last_twilio_in = None
+        self.frames_out = 0
+
+    def observe(self, kind: int, at: float, payload: bytes):
+        if kind in (AGENT_IN, AGENT_OUT, TWILIO_IN, TWILIO_OUT):
+            try:
+                message = json.loads(payload)
+            except ValueError:
+                return
+        if kind == AGENT_IN:
+            if message.get("type") == "FunctionCallRequest":
+                self._pending_tools[message.get("function_call_id")] = at
+            elif message.get("type") == "UserStartedSpeaking":
+                self._barge_in_at = at
+        elif kind == AGENT_OUT:
+            if message.get("type") == "FunctionCallResponse":
+                sent_at = self._pending_tools.pop(message.get("function_call_id"), None)
+                if sent_at is not None:
+                    self.samples["tool"].append(at - sent_at)
+        elif kind == TWILIO_OUT:
+            if message.get("event") == "clear" and self._barge_in_at is not None:
+                self.samples["clear"].append(at - self._barge_in_at)
+                self._barge_in_at = None
+        elif kind == TWILIO_OUT_MEDIA:
+            self.frames_out += 1
+            if self._start_at is not None and not self.samples["first_audio"]:
+                self.samples["first_audio"].append(at - self._start_at)
+        elif kind == TWILIO_IN:
+            self._last_twilio_in = at
+            if message.get("event") == "start":
+                self._start_at = at
+        elif kind == TWILIO_IN_MEDIA:
+            self._last_twilio_in = at
+        elif kind == END and self._last_twilio_in is not None:
+            self.samples["teardown"].append(at - self._last_twilio_in)
+
+    def summary(self):
+        result = {}
+        for name, values in self.samples.items():
+            result[name] = {
+                "count": len(values),
+                "max_ms": round(max(values) * 1000, 2) if values else None,
+                "avg_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+            }
+        result["unanswered_tools"] = len(self._pending_tools)
+        result["frames_out"] = self.frames_out
+        return result
+
+
+class ReplayClock:
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.loop = asyncio.get_running_loop()
+        self.base = self.loop.time()
+
+    def now(self) -> float:
+        return self.loop.time() - self.base
+
+    async def wait_until(self, offset: float, base: float = 0.0):
+        delay = base + offset / self.speed - self.now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FakeTwilioSocket:
+    """Plays the captured Twilio side and records what the handler sends back."""
+
+    def __init__(self, records, clock: ReplayClock, tracker: LatencyTracker, tail: float):
+        self.records = records
+        self.clock = clock
+        self.tracker = tracker
+        self.tail = tail
+        self.closed = asyncio.Event()
+
+    async def __aiter__(self):
+        stream_sid = None
+        for offset, kind, payload in self.records:
+            await self.clock.wait_until(offset)
+            if self.closed.is_set():
+                return
+            if kind == TWILIO_IN_MEDIA:
+                message = json.dumps({
+                    "event": "media",
+                    "streamSid": stream_sid,
+                    "media": {"track": "inbound", "payload": base64.b64encode(payload).decode("ascii")},
+                })
+            else:
+                message = payload.decode()
+                data = json.loads(message)
+                if data.get("event") == "start":
+                    stream_sid = data["start"]["streamSid"]
+            self.tracker.observe(kind, self.clock.now(), payload)
+            yield message
+        # Like Twilio, keep the socket open until the handler hangs up
+        try:
+            await asyncio.wait_for(self.closed.wait(), timeout=self.tail)
+        except asyncio.TimeoutError:
+            pass
+
+    async def send(self, message):
+        kind, payload = compact_twilio(message, TWILIO_OUT_MEDIA, TWILIO_OUT)
+        self.tracker.observe(kind, self.clock.now(), payload)
+
+    async def close(self, *args, **kwargs):
+        self.closed.set()
+
+
+class FakeAgentSocket:
+    """Plays the captured agent side, relative to when the handler connects."""
+
+    def __init__(self, records, clock: ReplayClock, tracker: LatencyTracker):
+        self.records = records
+        self.clock = clock
+        self.tracker = tracker
+        self.connected_at = 0.0
+
+    async def __aenter__(self):
+        self.connected_at = self.clock.now()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for offset, kind, payload in self.records:
+            await self.clock.wait_until(offset, base=self.connected_at)
+            self.tracker.observe(kind, self.clock.now(), payload)
+            yield payload if kind == AGENT_IN_BINARY else payload.decode()
+        # The agent never hangs up first; the handler ends the call
+        await asyncio.Future()
+
+    async def send(self, message):
+        if isinstance(message, (bytes, bytearray)):
+            self.tracker.observe(AGENT_OUT_BINARY, self.clock.now(), bytes(message))
+        else:
+            self.tracker.observe(AGENT_OUT, self.clock.now(), message.encode())
+
+    async def close(self, *args, **kwargs):
+        pass
+
+
+def load(path):
+    """Split a capture into Twilio and agent inbound records plus its recorded latencies."""
+    header, records = read_capture(path)
+    recorded = LatencyTracker()
+    twilio, agent = [], []
+    agent_connected = 0.0
+    trailer = {}
+    for kind, offset, payload in records:
+        recorded.observe(kind, offset, payload)
+        if kind in (TWILIO_IN, TWILIO_IN_MEDIA):
+            twilio.append((offset, kind, payload))
+        elif kind in (AGENT_IN, AGENT_IN_BINARY):
+            agent.append((offset, kind, payload))
+        elif kind == AGENT_CONNECTED:
+            agent_connected = offset
+        elif kind == END:
+            trailer = json.loads(payload)
+    agent = [(offset - agent_connected, kind, payload) for offset, kind, payload in agent]
+    duration = max([offset for offset, _, _ in twilio + agent] or [0.0])
+    return header, trailer, twilio, agent, recorded, duration
+
+
+async def replay(path: str, speed: float):
+    header, trailer, twilio_records, agent_records, recorded, duration = load(path)
+    clock = ReplayClock(speed)
+    tracker = LatencyTracker()
+    twilio_ws = FakeTwilioSocket(twilio_records, clock, tracker, tail=duration / speed + 5)
+    agent_ws = FakeAgentSocket(agent_records, clock, tracker)
+    await asyncio.wait_for(
+        server.twilio_handler(twilio_ws, sts_connector=lambda: agent_ws),
+        timeout=duration / speed + 60,
+    )
+    tracker.observe(END, clock.now(), b"")
+    return {
+        "path": path,
+        "call_sid": trailer.get("call_sid"),
+        "captured_at": header.get("started_at"),
+        "dropped_records": trailer.get("dropped_records", 0),
+        "speed": speed,
+        "replay_seconds": round(clock.now(), 2),
+        "recorded": recorded.summary(),
+        "replayed": tracker.summary(),
+    }
+
+
+def check_budgets(result, budgets):
+    failures = []
+    for name, limit in budgets.items():
+        worst = result["replayed"][name]["max_ms"]
+        if limit is not None and worst is not None and worst > limit:
+            failures.append(f"{name} {worst}ms > {limit}ms")
+    if result["replayed"]["unanswered_tools"]:
+        failures.append(f"{result['replayed']['unanswered_tools']} unanswered function calls")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Capture files (.vsr)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor")
+    for name in BUDGETS:
+        parser.add_argument(f"--max-{name.replace('_', '-')}-ms", type=float, dest=name, help=f"Budget for {name}")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    budgets = {name: getattr(args, name) for name in BUDGETS}
+
+    results = []
+    failed = False
+    print(f"{'capture':<44} {'':<9} " + " ".join(f"{name + ' max':>16}" for name in BUDGETS))
+    for path in args.paths:
+        result = asyncio.run(replay(path, args.speed))
+        result["failures"] = check_budgets(result, budgets)
+        failed = failed or bool(result["failures"])
+        results.append(result)
+        name = os.path.basename(path)[:44]
+        for label in ("recorded", "replayed"):
+            cells = " ".join(f"{str(result[label][budget]['max_ms']):>16}" for budget in BUDGETS)
+            print(f"{name:<44} {label:<9} {cells}")
+            name = ""
+        for failure in result["failures"]:
+            print(f"  FAIL {failure}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
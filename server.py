@@ -1,38 +1,56 @@
+import argparse
 import asyncio
 import base64
+import fcntl
+import http
 import json
+import signal
 import sys
+import time
 import websockets
 import ssl
-from twilio.rest import Client
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import os
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+from xml.sax.saxutils import quoteattr
 from tinydb import TinyDB, Query
 from typing import Dict, Optional, List
-import requests
 import logging
 import logging.handlers
 import traceback
-from openai import OpenAI
+from utils.admission import admission, lag_monitor
+from utils.call_status import call_attempts
+from utils.metrics import CallMetrics, REGISTRY
+from utils.memdiag import memdiag, memdiag_token
+from utils.phone_index import get_phone_index
+from utils.phrase_cache import FRAME_BYTES, clip_seconds, get_phrase_cache
+from utils.recorder import open_recorder, shutdown_writer
+from utils.session_capture import open_capture
+from utils.sessions import Session, registry
+from utils.structured_logging import CallContextFilter, JsonFormatter, current_call
+from utils.transcripts import get_transcript_store
+from utils.supervisor import Supervisor, drain_timeout, heartbeat_interval
 
 
 
 
+logger = logging.getLogger('hr_server')
+
 def setup_logging():
-    """Configure logging with both file and console handlers."""
+    """Configure logging with both file and console handlers. Safe to call more than once."""
+    if logger.handlers:
+        return logger
+
     # Create logs directory if it doesn't exist
     if not os.path.exists('logs'):
         os.makedirs('logs')
 
-    # Create logger
-    logger = logging.getLogger('hr_server')
     logger.setLevel(logging.DEBUG)
 
-    # Create formatters
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Create formatters; the file gets one JSON object per line for log_analyzer
+    file_formatter = JsonFormatter()
     console_formatter = logging.Formatter(
         '%(asctime)s - %(levelname)s - %(message)s'
     )
@@ -45,6 +63,7 @@ def setup_logging():
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_formatter)
+    file_handler.addFilter(CallContextFilter())
 
     # Console handler
     console_handler = logging.StreamHandler()
@@ -57,33 +76,87 @@ def setup_logging():
 
     return logger
 
-# Initialize logger
-logger = setup_logging()
+# Clients and settings are created on first use so that importing this module
+# (from the API, tools or benchmarks) is cheap and needs no secrets.
+_env_loaded = False
+_openai_client = None
+_twilio_client = None
 
-# Load environment variables
-load_dotenv()
-logger.info("Environment variables loaded")
-AI_client = OpenAI(api_key=os.environ.get("OPENAI_KEY"))
+def load_env():
+    """Load .env once."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+        logger.info("Environment variables loaded")
 
-# Initialize Twilio client
-account_sid = os.environ["TWILIO_ACCOUNT_SID"]
-auth_token = os.environ["TWILIO_AUTH_TOKEN"]
-client = Client(account_sid, auth_token)
-logger.info("Twilio client initialized")
+def get_env(name: str, default: Optional[str] = None) -> str:
+    """Read a setting from the environment, failing clearly if a required one is missing."""
+    load_env()
+    value = os.environ.get(name, default)
+    if value is None:
+        raise RuntimeError(f"Missing required environment variable: {name}")
+    return value
 
-# Initialize Trieve configuration
-TRIEVE_API_KEY = os.environ["TRIEVE_API_KEY"]
-TRIEVE_DATASET = os.environ["TRIEVE_API_URL"]
-logger.info("Trieve API configuration loaded")
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=get_env("OPENAI_KEY"))
+        logger.info("OpenAI client initialized")
+    return _openai_client
+
+def get_twilio_client():
+    global _twilio_client
+    if _twilio_client is None:
+        from twilio.rest import Client
+        _twilio_client = Client(get_env("TWILIO_ACCOUNT_SID"), get_env("TWILIO_AUTH_TOKEN"))
+        logger.info("Twilio client initialized")
+    return _twilio_client
+
+@contextmanager
+def open_hr_db():
+    """
+    Open the interview database under an exclusive lock for a read-modify-write.
 
-# Initialize TinyDB
-db = TinyDB('hr_database.json')
-candidates_table = db.table('candidates')
-logger.info("TinyDB initialized")
+    TinyDB rewrites the whole file on every update and keeps the next doc_id in
+    memory, so workers forked with --workers each open it fresh under the lock;
+    otherwise they lose each other's writes, reuse ids or read a half-written file.
+    """
+    path = get_env("HR_DB_PATH", "hr_database.json")
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # Closing the lock file releases the lock
+        with TinyDB(path) as db:
+            yield db
 
 # Add at the top with other global variables
 resume_data = None
 
+# Voice agent endpoint; point at benchmarks/fake_agent_server.py for offline load tests
+DEEPGRAM_AGENT_URL = "wss://agent.deepgram.com/agent"
+# Seconds a hangup waits for the last inbound audio to reach the agent
+STOP_FLUSH_TIMEOUT = 2.0
+# Slack on top of the audio still queued at Twilio when waiting for a mark
+MARK_TIMEOUT_MARGIN = 2.0
+
+# Fixed phrases; `python -m utils.phrase_cache build` pre-renders them
+FILLER_MESSAGES = {
+    "lookup": "Let me check that information for you.",
+    "processing": "I'm processing that information now.",
+    "thinking": "Let me think about that for a moment.",
+    "storing": "I'm saving that information now.",
+    "verifying": "Let me verify that information."
+}
+FILLER_DEFAULT = "One moment please."
+DISCLOSURE_MESSAGE = "This call may be monitored or recorded."
+FAREWELL_TEMPLATE = "Thank you for your time, {candidate_name}. We appreciate your interest in the {position} position. We'll be in touch soon. Have a great day!"
+# Played when the personalized farewell has no clip of its own
+GENERIC_FAREWELL = "Thank you for your time. We appreciate your interest, and we'll be in touch soon. Have a great day!"
+
+def fixed_phrases() -> List[str]:
+    return list(FILLER_MESSAGES.values()) + [FILLER_DEFAULT, DISCLOSURE_MESSAGE, GENERIC_FAREWELL]
+
 async def agent_filler(message_type: Dict) -> Dict:
     """Provide natural conversational filler while processing information."""
     # Handle both string and dict input for message_type
@@ -93,14 +166,7 @@ async def agent_filler(message_type: Dict) -> Dict:
         message_type = 'processing'
         
     logger.info(f"Using agent filler with message type: {message_type}")
-    filler_messages = {
-        "lookup": "Let me check that information for you.",
-        "processing": "I'm processing that information now.",
-        "thinking": "Let me think about that for a moment.",
-        "storing": "I'm saving that information now.",
-        "verifying": "Let me verify that information."
-    }
-    return {"message": filler_messages.get(message_type, "One moment please.")}
+    return {"message": FILLER_MESSAGES.get(message_type, FILLER_DEFAULT)}
 
 async def close_websocket_with_timeout(ws, timeout=5):
     """Close websocket with timeout to avoid hanging if no close frame is received."""
@@ -110,19 +176,9 @@ async def close_websocket_with_timeout(ws, timeout=5):
         logger.error(f"Error during websocket closure: {e}")
 
 
-async def store_skills_experience(params: Dict) -> Dict:
-    """Store the candidate's interview responses including skills assessment, availability, and salary expectations."""
-    logger.info(f"Storing interview data: {json.dumps(params, indent=2)}")
-    try:
-        # Use global candidate_name if not provided in params
-        global candidate_name
-        # Ensure the database file exists
-        if not os.path.exists('hr_database.json'):
-            with open('hr_database.json', 'w') as f:
-                json.dump({}, f)
-        
-        # Initialize database connection
-        db = TinyDB('hr_database.json')
+def save_interview_responses(candidate_name: str, params: Dict) -> int:
+    """Merge interview responses into the candidate's stored document and return its doc_id."""
+    with open_hr_db() as db:
         candidates_table = db.table('candidates')
         
         # Search for existing entry for this candidate
@@ -162,9 +218,14 @@ async def store_skills_experience(params: Dict) -> Dict:
                 "type": "interview_responses"
             })
             logger.info(f"Created new interview data with doc_id: {doc_id}")
-        
-        # Force write to disk
-        db.close()
+        return doc_id
+
+async def store_skills_experience(params: Dict) -> Dict:
+    """Store the candidate's interview responses including skills assessment, availability, and salary expectations."""
+    logger.info(f"Storing interview data: {json.dumps(params, indent=2)}")
+    try:
+        # Off the event loop: the lock may be held by another worker
+        doc_id = await asyncio.to_thread(save_interview_responses, call_candidate_name(), params)
         
         return {
             "status": "success", 
@@ -181,7 +242,7 @@ async def end_call(params: Dict, twilio_ws=None) -> Dict:
     position = params.get("position", "the position")
     logger.info(f"Ending call with candidate: {candidate_name} for position: {position}")
     try:
-        farewell_message = f"Thank you for your time, {candidate_name}. We appreciate your interest in the {position} position. We'll be in touch soon. Have a great day!"
+        farewell_message = FAREWELL_TEMPLATE.format(candidate_name=candidate_name, position=position)
         return {
             "status": "success",
             "message": farewell_message,
@@ -208,7 +269,7 @@ def sts_connect():
     logger.info("Attempting to connect to STS service")
     try:
         sts_ws = websockets.connect(
-            "wss://agent.deepgram.com/agent",
+            get_env("DEEPGRAM_AGENT_URL", DEEPGRAM_AGENT_URL),
             subprotocols=["token", "a82226c0eb2d60a51b54117a166297a32b5ce991"]
         )
         logger.info("Successfully connected to STS service")
@@ -386,7 +447,45 @@ FUNCTION_MAP = {
     "store_skills_experience": store_skills_experience,
     "end_call": end_call,
 }
-config_message = {
+
+# Set by main() once the outbound candidate's prompt is formatted
+outbound_prompt = None
+
+INBOUND_NOTE = """
+
+## Inbound call:
+- The candidate is calling back after missing our call; thank them for returning it"""
+
+UNKNOWN_CALLER_NOTE = """
+
+## Inbound call:
+- The caller's number does not match a candidate on file
+- Ask for their full name and the position they applied for before the interview questions"""
+
+def call_candidate_name() -> str:
+    """Candidate of the current call: the inbound caller's match, else the outbound candidate."""
+    session = current_call.get()
+    if session is not None and session.candidate:
+        return session.candidate["candidate_name"] or candidate_name
+    return candidate_name
+
+def session_instructions(session) -> str:
+    """Agent prompt for a session, formatted from the candidate context cached in the phone index."""
+    if session.direction != "inbound":
+        return outbound_prompt or PROMPT_TEMPLATE
+    now = datetime.now()
+    context = session.candidate or {}
+    prompt = PROMPT_TEMPLATE.format(
+        candidate_name=context.get("candidate_name") or "unknown",
+        current_date=now.strftime("%Y-%m-%d"),
+        current_time=now.strftime("%H:%M:%S"),
+        skills=json.dumps(context.get("skills", [])),
+        technologies=json.dumps(context.get("skills", [])),
+    )
+    return prompt + (INBOUND_NOTE if session.candidate else UNKNOWN_CALLER_NOTE)
+
+def build_config_message(instructions: str) -> Dict:
+    return {
             "type": "SettingsConfiguration",
             "audio": {
                 "input": {
@@ -406,28 +505,144 @@ config_message = {
                         "type": "open_ai",
                     },
                     "model": "gpt-4.1-mini",
-                    "instructions": PROMPT_TEMPLATE,
+                    "instructions": instructions,
                     "functions": FUNCTION_DEFINITIONS,
                 },
                 "speak": {"model": "aura-asteria-en"},
             },
         }
-async def twilio_handler(twilio_ws):
-    logger.info("Starting Twilio handler")
+
+async def twilio_handler(twilio_ws, sts_connector=None):
+    """Handle one Twilio media stream. ``sts_connector`` replaces sts_connect, e.g. for replays."""
+    sts_connector = sts_connector or sts_connect
     audio_queue = asyncio.Queue()
     streamsid_queue = asyncio.Queue()
+    call_metrics = CallMetrics()
+    session = Session()
+    session.queues = {"audio": audio_queue, "streamsid": streamsid_queue}
+    # Bound before the tasks are created so every record of this call carries its SIDs
+    current_call.set(session)
+    logger.info("Starting Twilio handler", extra={"event": "connect"})
+    registry.add(session)
+    memdiag.session_started(session)
+    recorder = open_recorder(session)
+    capture = open_capture(session)
+    if capture:
+        twilio_ws = capture.wrap_twilio(twilio_ws)
+        sts_connector = capture.wrap_connector(sts_connector)
+    session.websocket = twilio_ws
+    try:
+        await run_call(twilio_ws, audio_queue, streamsid_queue, call_metrics, session, recorder, sts_connector)
+    finally:
+        registry.remove(session)
+        if recorder:
+            recorder.close()
+        if capture:
+            capture.close()
+        if session.transcript or session.interview:
+            await save_transcript(session)
+        memdiag.session_ended(session)
+        # Last, so the summary is the call's final record for the log analyzer
+        call_metrics.finish()
+
+async def save_transcript(session):
+    """Persist the call's turns and interview responses to the transcript store."""
+    try:
+        transcript_id = await asyncio.to_thread(
+            get_transcript_store().append,
+            session.transcript,
+            call_sid=session.call_sid,
+            stream_sid=session.stream_sid,
+            candidate_name=call_candidate_name(),
+            started_at=datetime.fromtimestamp(session.opened_wall).isoformat(),
+            ended_at=datetime.now().isoformat(),
+            interview=session.interview,
+        )
+        logger.info(f"Saved transcript {transcript_id} with {len(session.transcript)} turns")
+    except Exception as e:
+        logger.error(f"Error saving transcript: {str(e)}")
 
-    async with sts_connect() as sts_ws:
+async def run_call(twilio_ws, audio_queue, streamsid_queue, call_metrics, session, recorder=None, sts_connector=sts_connect):
+    """Bridge one Twilio media stream to the agent until either side finishes."""
+    async with sts_connector() as sts_ws:
         logger.info("Connected to STS service")
 
+        async def send_config(start):
+            """Configure the agent once the start event says who is on the line."""
+            parameters = start.get("customParameters") or {}
+            if parameters.get("direction") == "inbound":
+                session.direction = "inbound"
+                session.caller = parameters.get("caller")
+                lookup_started = time.perf_counter()
+                session.candidate = await get_phone_index().resolve(session.caller)
+                logger.info(
+                    f"Inbound caller {'matched' if session.candidate else 'not found'} "
+                    f"in {(time.perf_counter() - lookup_started) * 1000:.3f}ms",
+                    extra={"event": "inbound_lookup", "data": {"matched": session.candidate is not None}},
+                )
+            await sts_ws.send(json.dumps(build_config_message(session_instructions(session))))
+            logger.info("Sent configuration message to STS")
+            if parameters.get("disclosure") == "stream":
+                # The TwiML left the disclosure to us; play it before the agent's greeting
+                if await play_phrase(start["streamSid"], DISCLOSURE_MESSAGE, "disclosure") is None:
+                    await sts_ws.send(json.dumps({"type": "inject", "content": DISCLOSURE_MESSAGE}))
+
+        # Twilio echoes a mark once the audio sent before it has played
+        marks: Dict[str, asyncio.Event] = {}
+        # When Twilio will have played all audio sent so far; the agent sends faster than real time
+        playout_ends = time.monotonic()
+
+        def audio_sent(audio):
+            nonlocal playout_ends
+            playout_ends = max(playout_ends, time.monotonic()) + clip_seconds(audio)
+
+        def audio_cleared():
+            nonlocal playout_ends
+            playout_ends = time.monotonic()
+
+        async def play_phrase(streamsid, text, phrase, mark=None) -> Optional[float]:
+            """Stream the cached clip of ``text`` to Twilio; its length in seconds, or None if not cached."""
+            clip = get_phrase_cache().get(text, phrase)
+            if clip is None:
+                return None
+            for offset in range(0, len(clip), FRAME_BYTES):
+                frame = clip[offset:offset + FRAME_BYTES]
+                await twilio_ws.send(json.dumps({
+                    "event": "media",
+                    "streamSid": streamsid,
+                    "media": {"payload": base64.b64encode(frame).decode("ascii")},
+                }))
+                call_metrics.frame_out()
+                if recorder:
+                    recorder.outbound(frame)
+            audio_sent(clip)
+            if mark:
+                marks[mark] = asyncio.Event()
+                await twilio_ws.send(json.dumps({"event": "mark", "streamSid": streamsid, "mark": {"name": mark}}))
+            logger.info(f"Played cached {phrase} clip ({clip_seconds(clip):.2f}s)")
+            return clip_seconds(clip)
 
-        await sts_ws.send(json.dumps(config_message))
-        logger.info("Sent configuration message to STS")
+        async def wait_for_mark(name):
+            """
+            Wait until Twilio has played up to a mark.
+
+            The mark is the signal; the timeout only guards against a lost one and covers
+            everything still queued at Twilio ahead of it, such as the end of the agent's reply.
+            """
+            timeout = max(0.0, playout_ends - time.monotonic()) + MARK_TIMEOUT_MARGIN
+            try:
+                await asyncio.wait_for(marks[name].wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"No mark {name} from Twilio after {timeout:.2f}s")
 
         async def sts_sender(sts_ws):
             logger.info("STS sender started")
             while True:
                 chunk = await audio_queue.get()
+                if chunk is None:
+                    # twilio_receiver has finished and everything it queued has been sent
+                    logger.info("STS sender finished")
+                    return
                 await sts_ws.send(chunk)
                 logger.debug("Sent audio chunk to STS")
 
@@ -441,20 +656,35 @@ async def twilio_handler(twilio_ws):
                         logger.info(f"Received string message: {message}")
                         decoded = json.loads(message)
                         if decoded['type'] == 'UserStartedSpeaking':
-                            logger.info("User started speaking")
+                            received_at = time.monotonic()
+                            logger.info("User started speaking", extra={"event": "barge_in"})
                             clear_message = {
                                 "event": "clear",
                                 "streamSid": streamsid
                             }
                             await twilio_ws.send(json.dumps(clear_message))
+                            audio_cleared()
+                            call_metrics.barge_in_cleared(received_at)
+                            if recorder:
+                                recorder.clear()
+                        elif decoded['type'] == 'ConversationText':
+                            session.add_turn(decoded.get('role'), decoded.get('content', ''))
+                            if decoded.get('role') == 'user':
+                                call_metrics.user_turn_ended()
                         elif decoded['type'] == 'FunctionCallRequest':
                             function_name = decoded.get('function_name')
                             function_call_id = decoded.get('function_call_id')
                             parameters = decoded.get('input', {})
                             
-                            logger.info(f"Function call received: {function_name}")
+                            logger.info(
+                                f"Function call received: {function_name}",
+                                extra={"event": "function_call", "data": {"function": function_name}},
+                            )
                             logger.info(f"Parameters: {parameters}")
                             
+                            tool_started = time.monotonic()
+                            # Set once the agent has the response; the outcome is recorded exactly once
+                            responded = False
                             try:
                                 func = FUNCTION_MAP.get(function_name)
                                 if not func:
@@ -464,6 +694,11 @@ async def twilio_handler(twilio_ws):
                                     result = await func(parameters, twilio_ws)
                                 else:
                                     result = await func(parameters)
+                                tool_seconds = time.monotonic() - tool_started
+                                if function_name == "agent_filler":
+                                    if await play_phrase(streamsid, result["message"], "filler") is not None:
+                                        result["played"] = True
+                                        result["instruction"] = "The caller has already heard this message; do not repeat it."
                                 
                                 if function_name == "end_call":
                                     # Extract messages
@@ -478,10 +713,22 @@ async def twilio_handler(twilio_ws):
                                         "output": json.dumps(function_response),
                                     }
                                     await sts_ws.send(json.dumps(response))
-                                    logger.info(f"Function response sent: {json.dumps(function_response)}")
+                                    responded = True
+                                    call_metrics.tool_call(function_name, tool_seconds, "success")
+                                    logger.info(
+                                        f"Function response sent: {json.dumps(function_response)}",
+                                        extra={"event": "function_response", "data": {"function": function_name}},
+                                    )
 
-                                    # Then wait for farewell sequence to complete
-                                    await wait_for_farewell_completion(sts_ws, twilio_ws, inject_message)
+                                    # Play the farewell from the clip cache and hang up when Twilio has played it;
+                                    # without a clip the agent speaks it
+                                    seconds = await play_phrase(streamsid, inject_message["content"], "farewell", mark="farewell")
+                                    if seconds is None:
+                                        seconds = await play_phrase(streamsid, GENERIC_FAREWELL, "farewell", mark="farewell")
+                                    if seconds is not None:
+                                        await wait_for_mark("farewell")
+                                    else:
+                                        await wait_for_farewell_completion(sts_ws, twilio_ws, inject_message)
 
                                     # Finally send the close message and exit
                                     logger.info("Sending ws close message")
@@ -494,17 +741,34 @@ async def twilio_handler(twilio_ws):
                                     "output": json.dumps(result)
                                 }
                                 await sts_ws.send(json.dumps(response))
-                                logger.info(f"Function response sent: {json.dumps(result)}")
+                                responded = True
+                                call_metrics.tool_call(function_name, tool_seconds, "success")
+                                logger.info(
+                                    f"Function response sent: {json.dumps(result)}",
+                                    extra={"event": "function_response", "data": {"function": function_name}},
+                                )
+                                if function_name == "store_skills_experience" and result.get("status") == "success":
+                                    # The store succeeded; a bad field only costs the transcript copy
+                                    try:
+                                        session.record_interview(parameters, result)
+                                    except Exception as e:
+                                        logger.error(f"Error recording interview responses: {str(e)}")
                                 
                             except Exception as e:
-                                logger.error(f"Error executing function: {str(e)}")
-                                result = {"error": str(e)}
-                                response = {
-                                    "type": "FunctionCallResponse",
-                                    "function_call_id": function_call_id,
-                                    "output": json.dumps(result)
-                                }
-                                await sts_ws.send(json.dumps(response))
+                                logger.error(
+                                    f"Error executing function: {str(e)}",
+                                    extra={"event": "function_error", "data": {"function": function_name}},
+                                )
+                                # A failure after the response (e.g. during the farewell) was already counted and answered
+                                if not responded:
+                                    call_metrics.tool_call(function_name, time.monotonic() - tool_started, "error")
+                                    result = {"error": str(e)}
+                                    response = {
+                                        "type": "FunctionCallResponse",
+                                        "function_call_id": function_call_id,
+                                        "output": json.dumps(result)
+                                    }
+                                    await sts_ws.send(json.dumps(response))
                         continue
 
                     logger.debug(f"Received message type: {type(message)}")
@@ -515,6 +779,10 @@ async def twilio_handler(twilio_ws):
                         "media": {"payload": base64.b64encode(raw_mulaw).decode("ascii")},
                     }
                     await twilio_ws.send(json.dumps(media_message))
+                    audio_sent(raw_mulaw)
+                    call_metrics.frame_out()
+                    if recorder:
+                        recorder.outbound(raw_mulaw)
                     logger.debug("Sent media message to Twilio")
             except Exception as e:
                 logger.error(f"Error in STS receiver: {str(e)}")
@@ -531,21 +799,34 @@ async def twilio_handler(twilio_ws):
                     try:
                         data = json.loads(message)
                         if data["event"] == "start":
-                            logger.info("Got stream ID from Twilio")
                             start = data["start"]
                             streamsid = start["streamSid"]
+                            call_metrics.started(start.get("callSid"), streamsid)
+                            session.started(start.get("callSid"), streamsid)
+                            call_attempts.stream_started(start.get("callSid"))
+                            logger.info("Got stream ID from Twilio", extra={"event": "start"})
+                            # Sent before any audio is queued, so the agent is configured first
+                            await send_config(start)
                             await streamsid_queue.put(streamsid)
                         elif data["event"] == "connected":
                             logger.info("Twilio connection established")
                             continue
+                        elif data["event"] == "mark":
+                            name = data.get("mark", {}).get("name")
+                            if name in marks:
+                                marks[name].set()
+                            continue
                         elif data["event"] == "media":
                             media = data["media"]
                             chunk = base64.b64decode(media["payload"])
                             if media["track"] == "inbound":
+                                call_metrics.frame_in()
+                                if recorder:
+                                    recorder.inbound(chunk)
                                 inbuffer.extend(chunk)
                                 logger.debug("Added chunk to buffer")
                         elif data["event"] == "stop":
-                            logger.info("Received stop event from Twilio")
+                            logger.info("Received stop event from Twilio", extra={"event": "stop"})
                             break
 
                         while len(inbuffer) >= BUFFER_SIZE:
@@ -573,15 +854,23 @@ async def twilio_handler(twilio_ws):
                         logger.debug("Processed remaining buffer")
                     except Exception as e:
                         logger.error(f"Error processing remaining buffer: {str(e)}")
+                audio_queue.put_nowait(None)
 
         logger.info("Starting async tasks")
-        await asyncio.wait(
-            [
-                asyncio.ensure_future(sts_sender(sts_ws)),
-                asyncio.ensure_future(sts_receiver(sts_ws, twilio_ws)),
-                asyncio.ensure_future(twilio_receiver(twilio_ws)),
-            ]
-        )
+        sender = asyncio.ensure_future(sts_sender(sts_ws))
+        receiver = asyncio.ensure_future(twilio_receiver(twilio_ws))
+        tasks = [sender, asyncio.ensure_future(sts_receiver(sts_ws, twilio_ws)), receiver]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if receiver in done and sender in pending:
+            # Let the sender deliver the audio flushed at stop before the agent connection goes
+            await asyncio.wait([sender], timeout=STOP_FLUSH_TIMEOUT)
+            if not sender.done():
+                logger.warning(f"Audio left at stop was not sent to STS within {STOP_FLUSH_TIMEOUT}s")
+            pending = [task for task in tasks if not task.done()]
+        # The call is over once either side finishes; don't leave the rest waiting on a dead peer
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
 
         logger.info("Closing Twilio WebSocket connection")
         await twilio_ws.close()
@@ -596,9 +885,138 @@ async def wait_for_farewell_completion(sts_ws, twilio_ws, inject_message):
     except Exception as e:
         logger.error(f"Error during farewell completion: {str(e)}")
 
+def stream_twiml(stream_url: str, parameters: Optional[Dict] = None) -> str:
+    """
+    TwiML that connects a call to the media stream, passing ``parameters`` to the start event.
+
+    With DISCLOSURE_MODE=stream the voice server plays the recording disclosure from its
+    phrase cache instead of Twilio's <Say>, which holds the stream until it finishes.
+    """
+    parameters = dict(parameters or {})
+    say = f'\n        <Say language="en">"{DISCLOSURE_MESSAGE}"</Say>'
+    if os.environ.get("DISCLOSURE_MODE", "say") == "stream":
+        parameters["disclosure"] = "stream"
+        say = ""
+    tags = "".join(
+        f'\n                <Parameter name={quoteattr(name)} value={quoteattr(value or "")} />'
+        for name, value in parameters.items()
+    )
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+    <Response>{say}
+        <Connect>
+            <Stream url={quoteattr(stream_url)}>{tags}
+            </Stream>
+        </Connect>
+    </Response>'''
+
+def inbound_twiml(query: str, request_headers) -> str:
+    """Answer for Twilio's incoming call webhook (configured as HTTP GET on the number)."""
+    caller = (parse_qs(query).get("From") or [""])[0]
+    stream_url = os.environ.get("PUBLIC_STREAM_URL") or f"wss://{request_headers.get('Host', 'localhost')}/twilio"
+    logger.info(f"Incoming call from {caller}")
+    return stream_twiml(stream_url, {"direction": "inbound", "caller": caller})
+
+def status_callback_url() -> Optional[str]:
+    """Public URL of /call-status: STATUS_CALLBACK_URL, else derived from PUBLIC_STREAM_URL."""
+    url = get_env("STATUS_CALLBACK_URL", "")
+    if url:
+        return url
+    stream_url = get_env("PUBLIC_STREAM_URL", "")
+    if stream_url:
+        parts = urlsplit(stream_url)
+        return urlunsplit(("http" if parts.scheme == "ws" else "https", parts.netloc, "/call-status", "", ""))
+    return None
+
+def valid_twilio_signature(path: str, query: str, request_headers) -> bool:
+    """Check X-Twilio-Signature of a GET webhook against the public URL Twilio requested."""
+    from twilio.request_validator import RequestValidator
+
+    signature = request_headers.get("X-Twilio-Signature")
+    if not signature:
+        return False
+    try:
+        auth_token = get_env("TWILIO_AUTH_TOKEN")
+    except RuntimeError as e:
+        logger.error(f"Cannot validate Twilio webhook: {str(e)}")
+        return False
+    # Twilio appends the parameters of a GET webhook to the configured URL
+    base = status_callback_url() or f"https://{request_headers.get('Host', 'localhost')}{path}"
+    url = f"{base}{'&' if '?' in base else '?'}{query}" if query else base
+    return RequestValidator(auth_token).validate(url, {}, signature)
+
+async def process_http_request(path, request_headers):
+    """Answer plain HTTP requests on the websocket port; None continues the handshake."""
+    path, _, query = path.partition("?")
+    if path == "/inbound":
+        body = inbound_twiml(query, request_headers).encode()
+        return http.HTTPStatus.OK, [("Content-Type", "text/xml")], body
+    if path == "/call-status":
+        # Twilio status callback (requested as GET by make_outbound_call); a forged one could hang up calls
+        if not valid_twilio_signature(path, query, request_headers):
+            logger.warning("Rejected call status callback with a missing or invalid Twilio signature")
+            return http.HTTPStatus.FORBIDDEN, [], b""
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        if params.get("CallSid") and params.get("CallStatus"):
+            sequence = params.get("SequenceNumber")
+            call_attempts.update(
+                params["CallSid"],
+                params["CallStatus"],
+                sequence=int(sequence) if sequence and sequence.isdigit() else None,
+                details={
+                    "to": params.get("To"),
+                    "duration_seconds": params.get("CallDuration"),
+                    "sip_response_code": params.get("SipResponseCode"),
+                },
+            )
+            return http.HTTPStatus.NO_CONTENT, [], b""
+        return http.HTTPStatus.BAD_REQUEST, [], b"CallSid and CallStatus are required\n"
+    if path == "/calls":
+        # Lists dialed numbers and call SIDs, so it is off unless ADMIN_TOKEN is set
+        admin_token = get_env("ADMIN_TOKEN", "")
+        if not admin_token:
+            return http.HTTPStatus.NOT_FOUND, [], b"Set ADMIN_TOKEN to enable /calls\n"
+        if request_headers.get("X-Admin-Token") != admin_token:
+            return http.HTTPStatus.FORBIDDEN, [], b""
+        body = json.dumps({
+            "sessions": [session.describe() for session in registry.sessions()],
+            "attempts": [attempt.describe() for attempt in call_attempts.attempts()],
+        })
+        return http.HTTPStatus.OK, [("Content-Type", "application/json")], body.encode()
+    if path == "/metrics":
+        admission.status()
+        body = REGISTRY.render().encode()
+        return http.HTTPStatus.OK, [("Content-Type", "text/plain; version=0.0.4")], body
+    if path == "/admission":
+        # Polled by the dialing side; 503 means pause dialing
+        result = admission.status()
+        status = http.HTTPStatus.OK if result["accepting"] else http.HTTPStatus.SERVICE_UNAVAILABLE
+        return status, [("Content-Type", "application/json")], json.dumps(result).encode()
+    if path == "/debug/memory":
+        if not memdiag.enabled:
+            return http.HTTPStatus.NOT_FOUND, [], b"Memory diagnostics are off (set MEMDIAG=1)\n"
+        if memdiag_token and request_headers.get("X-Admin-Token") != memdiag_token:
+            return http.HTTPStatus.FORBIDDEN, [], b""
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        group = params.get("group", "lineno")
+        if group not in ("lineno", "filename", "traceback"):
+            return http.HTTPStatus.BAD_REQUEST, [], b"group must be lineno, filename or traceback\n"
+        result = memdiag.report(
+            top=int(params["top"]) if params.get("top", "").isdigit() else 25,
+            group=group,
+            diff=params.get("diff") == "1",
+            collect=params.get("gc") == "1",
+        )
+        return http.HTTPStatus.OK, [("Content-Type", "application/json")], json.dumps(result).encode()
+    return None
+
 async def router(websocket, path):
     logger.info(f"Incoming connection on path: {path}")
     if path == "/twilio":
+        reason = await admission.admit()
+        if reason:
+            logger.warning(f"Rejecting new Twilio stream: {reason}")
+            await websocket.close(code=1013, reason=f"Server overloaded: {reason}")
+            return
         logger.info("Starting Twilio handler")
         await twilio_handler(websocket)
 
@@ -606,19 +1024,25 @@ async def router(websocket, path):
 
 def make_outbound_call(to_number, from_number):
     logger.info(f"Making outbound call to {to_number} from {from_number}")
-    twiml = '''<?xml version="1.0" encoding="UTF-8"?>
-    <Response>
-        <Say language="en">"This call may be monitored or recorded."</Say>
-        <Connect>
-            <Stream url="wss://d024-101-53-238-243.ngrok-free.app/twilio" />
-        </Connect>
-    </Response>'''
+    twiml = stream_twiml("wss://d024-101-53-238-243.ngrok-free.app/twilio", {"direction": "outbound"})
+    
+    callback = {}
+    status_url = status_callback_url()
+    if status_url:
+        callback = {
+            "status_callback": status_url,
+            "status_callback_method": "GET",
+            "status_callback_event": ["initiated", "ringing", "answered", "completed"],
+        }
+    else:
+        logger.warning("STATUS_CALLBACK_URL and PUBLIC_STREAM_URL are unset; call progress will not be tracked")
     
     try:
-        call = client.calls.create(
+        call = get_twilio_client().calls.create(
             twiml=twiml,
             to=to_number,
-            from_=from_number
+            from_=from_number,
+            **callback,
         )
         logger.info(f"Call created successfully with SID: {call.sid}")
         return call
@@ -630,6 +1054,8 @@ def make_outbound_call(to_number, from_number):
 # Add the extract_candidate_info function
 def extract_candidate_info(candidate_name):
     """Extract structured information about the candidate from Trieve."""
+    import requests
+
     logger.info(f"Checking Trieve database for candidate: {candidate_name}")
     url = "https://api.trieve.ai/api/chunk/search"
     payload = {
@@ -637,8 +1063,8 @@ def extract_candidate_info(candidate_name):
         "search_type": "semantic",
     }
     headers = {
-        "Authorization": TRIEVE_API_KEY,
-        "TR-Dataset": TRIEVE_DATASET,
+        "Authorization": get_env("TRIEVE_API_KEY"),
+        "TR-Dataset": get_env("TRIEVE_API_URL"),
         "X-API-Version": "V1",
         "Content-Type": "application/json"
     }
@@ -659,19 +1085,108 @@ def extract_candidate_info(candidate_name):
     }}
     """
 
-    response = AI_client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[{"role": "user", "content": prompt}],
     )
     choices = response.choices[0].message.content
     return json.loads(choices)
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="HR voice agent websocket server")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WORKERS", "1")),
+        help="Worker processes sharing the port via SO_REUSEPORT",
+    )
+    parser.add_argument(
+        "--serve-only",
+        action="store_true",
+        help="Only run the websocket server; skip candidate lookup and the outbound call",
+    )
+    return parser.parse_args(argv)
+
+async def send_heartbeats(heartbeat, stop_requested):
+    """Tell the supervisor this worker's event loop is responsive; drain if it dies."""
+    parent = os.getppid()
+    while not stop_requested.done():
+        heartbeat.value = time.time()
+        if os.getppid() != parent:
+            logger.error("Supervisor exited, draining worker")
+            stop_requested.set_result(None)
+        await asyncio.sleep(heartbeat_interval)
+
+async def drain(server):
+    """Stop accepting connections and wait for in-flight calls to finish."""
+    registry.draining = True
+    logger.info(f"Draining: waiting for {len(registry)} active calls (timeout {drain_timeout}s)")
+    server.close(close_connections=False)
+    try:
+        await asyncio.wait_for(server.wait_closed(), timeout=drain_timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Drain timed out with {len(registry)} active calls, closing them")
+        await asyncio.gather(*(ws.close(1001) for ws in list(server.websockets)), return_exceptions=True)
+    logger.info("Drain complete")
+
+async def serve_async(host, port, reuse_port=False, heartbeat=None):
+    """Serve until SIGTERM or SIGINT, then drain in-flight calls and return."""
+    loop = asyncio.get_running_loop()
+    stop_requested = loop.create_future()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: stop_requested.done() or stop_requested.set_result(None))
+    # Before any call, so every call's tasks are attributed
+    memdiag.start(loop)
+
+    server = await websockets.serve(
+        router, host, port, process_request=process_http_request, reuse_port=reuse_port
+    )
+    logger.info(f"Server {os.getpid()} listening on ws://{host}:{port}")
+    # Inbound callers are matched against this in memory
+    try:
+        await asyncio.to_thread(get_phone_index().load)
+    except Exception as e:
+        logger.error(f"Could not load phone index: {str(e)}")
+    await asyncio.to_thread(get_phrase_cache)
+    lag_monitor.start()
+    heartbeat_task = None
+    if heartbeat is not None:
+        heartbeat_task = asyncio.ensure_future(send_heartbeats(heartbeat, stop_requested))
+
+    await stop_requested
+    await drain(server)
+    lag_monitor.stop()
+    # Finish writing recordings of the drained calls
+    await asyncio.to_thread(shutdown_writer)
+    if heartbeat_task:
+        heartbeat_task.cancel()
+
+def run_worker(host, port, heartbeat=None):
+    """Entry point of a supervised worker process."""
+    asyncio.run(serve_async(host, port, reuse_port=True, heartbeat=heartbeat))
+
+def serve(host, port, workers=1):
+    """Run the websocket server, forking workers that share the port when workers > 1."""
+    if workers > 1:
+        Supervisor(run_worker, workers, args=(host, port)).run()
+    else:
+        asyncio.run(serve_async(host, port))
+
 # Modify the main function
 def main():
+    args = parse_args()
+    setup_logging()
+    load_env()
     logger.info("Starting HR Server application")
     try:
         # Declare global variables at the start of the function
-        global PROMPT_TEMPLATE
+        global outbound_prompt
+
+        if args.serve_only:
+            serve(args.host, args.port, args.workers)
+            return
         
         # Extract candidate info before making the call
         candidate_info = extract_candidate_info(candidate_name)
@@ -687,8 +1202,8 @@ def main():
         )
         print(formatted_prompt)
         
-        # # Update the global PROMPT_TEMPLATE
-        PROMPT_TEMPLATE = formatted_prompt
+        # Used for outbound sessions; inbound callers get their own
+        outbound_prompt = formatted_prompt
         
         # Make an outbound call
         call = make_outbound_call(
@@ -698,11 +1213,7 @@ def main():
         logger.info(f"Call SID: {call.sid}")
 
         # Start the WebSocket server
-        server = websockets.serve(router, "localhost", 5000)
-        logger.info("Server starting on ws://localhost:5000")
-
-        asyncio.get_event_loop().run_until_complete(server)
-        asyncio.get_event_loop().run_forever()
+        serve(args.host, args.port, args.workers)
     except Exception as e:
         logger.error(f"Error in main: {str(e)}")
         logger.debug(f"Full traceback: {traceback.format_exc()}")
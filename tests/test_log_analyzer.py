@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import log_analyzer  # noqa: E402
+from utils.log_analyzer import LogAnalyzer  # noqa: E402
+
+
+def record(session, msg, event=None, data=None, pid=100):
+    return {"ts": "2026-10-19T10:00:00.000", "level": "INFO", "pid": pid, "session": session,
+            "msg": msg, "event": event, "data": data}
+
+
+def summary(session, pid=100):
+    return record(session, "Call summary", "call_summary", {"outcome": "completed", "duration_seconds": 12.0}, pid)
+
+
+def test_records_after_call_summary_do_not_start_a_new_call():
+    analyzer = LogAnalyzer()
+    for session in (1, 2):
+        analyzer.feed(record(session, "Twilio stream started"))
+        analyzer.feed(summary(session))
+        analyzer.feed(record(session, "Saved transcript"))
+    analyzer.close()
+
+    report = analyzer.report()
+    assert report["calls"]["completed"] == 2
+    assert report["calls"]["by_outcome"] == {"completed": 2}
+    assert report["post_summary_records"] == 2
+    assert analyzer.open_calls == {}
+
+
+def test_finished_call_keys_are_bounded(monkeypatch):
+    monkeypatch.setattr(log_analyzer, "MAX_FINISHED_CALLS", 3)
+    analyzer = LogAnalyzer()
+    for session in range(10):
+        analyzer.feed(summary(session))
+    assert list(analyzer.finished_calls) == [(100, 7), (100, 8), (100, 9)]
@@ -0,0 +1,150 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+from utils.call_status import CallAttempts, call_attempts
+from utils.metrics import REGISTRY
+from utils.sessions import SessionRegistry, registry
+
+
+logger = logging.getLogger("hr_server.admission")
+
+# New calls are refused at this many live calls per worker (0 disables the limit)
+max_active_calls = int(os.getenv("MAX_ACTIVE_CALLS", "50"))
+# New calls are refused while the event loop runs this late
+max_loop_lag_ms = float(os.getenv("MAX_LOOP_LAG_MS", "150"))
+# How long a new stream may wait for capacity before it is refused
+admission_defer_seconds = float(os.getenv("ADMISSION_DEFER_SECONDS", "2"))
+loop_lag_interval = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+# Samples the reported lag is the maximum of, so one quiet tick does not reopen admission
+loop_lag_window = 5
+
+LOOP_LAG = REGISTRY.gauge("voice_event_loop_lag_seconds", "Largest event loop lag over the recent sampling window")
+LOOP_LAG_HISTOGRAM = REGISTRY.histogram("voice_event_loop_lag_sample_seconds", "Event loop lag samples")
+ACTIVE_CALLS = REGISTRY.gauge("voice_active_calls", "Live Twilio streams in this process")
+ADMISSION_OPEN = REGISTRY.gauge("voice_admission_open", "1 when new calls are being accepted")
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "voice_admission_rejections_total", "New Twilio streams refused", ("reason",)
+)
+ADMISSION_DEFERRALS = REGISTRY.counter("voice_admission_deferrals_total", "New Twilio streams made to wait for capacity")
+
+
+class LoopLagMonitor:
+    """
+    Samples event loop lag: how late a sleep of ``interval`` seconds wakes up.
+
+    Any blocking work on the loop (JSON parsing under load, a synchronous
+    client call) shows up here before it shows up as choppy audio.
+    """
+
+    def __init__(self, interval: float = loop_lag_interval, window: int = loop_lag_window):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def lag(self) -> float:
+        return max(self.samples, default=0.0)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append(lag)
+            LOOP_LAG_HISTOGRAM.observe(lag)
+            LOOP_LAG.set(self.lag)
+            ACTIVE_CALLS.set(len(registry))
+
+
+class AdmissionController:
+    """Decides whether this worker takes on another call."""
+
+    def __init__(
+        self,
+        sessions: SessionRegistry,
+        monitor: LoopLagMonitor,
+        attempts: Optional[CallAttempts] = None,
+        max_calls: int = max_active_calls,
+        max_lag_ms: float = max_loop_lag_ms,
+        defer_seconds: float = admission_defer_seconds,
+    ):
+        self.sessions = sessions
+        self.monitor = monitor
+        self.attempts = attempts
+        self.max_calls = max_calls
+        self.max_lag = max_lag_ms / 1000
+        self.defer_seconds = defer_seconds
+
+    def reserved(self) -> int:
+        return self.attempts.reserved() if self.attempts else 0
+
+    def refusal_reason(self, dialing: bool = False) -> Optional[str]:
+        """
+        Why a new call would be refused right now, or None when it would be accepted.
+
+        ``dialing`` also counts calls that were dialed but have no stream yet,
+        so the dialer does not overbook; their own streams are still admitted.
+        """
+        if self.sessions.draining:
+            return "draining"
+        calls = len(self.sessions) + (self.reserved() if dialing else 0)
+        if self.max_calls and calls >= self.max_calls:
+            return "max_active_calls"
+        if self.max_lag and self.monitor.lag > self.max_lag:
+            return "loop_lag"
+        return None
+
+    async def admit(self) -> Optional[str]:
+        """
+        Wait up to ``defer_seconds`` for capacity.
+
+        Returns None when the call may start, otherwise the refusal reason.
+        Draining is never waited out.
+        """
+        reason = self.refusal_reason()
+        if reason and reason != "draining" and self.defer_seconds > 0:
+            ADMISSION_DEFERRALS.inc()
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.defer_seconds
+            while reason and reason != "draining" and loop.time() < deadline:
+                await asyncio.sleep(0.1)
+                reason = self.refusal_reason()
+        if reason:
+            ADMISSION_REJECTIONS.inc(reason=reason)
+        ADMISSION_OPEN.set(0 if reason else 1)
+        return reason
+
+    def status(self) -> Dict:
+        """Whether the dialer may place another call."""
+        if self.attempts:
+            self.attempts.expire()
+        reason = self.refusal_reason(dialing=True)
+        ACTIVE_CALLS.set(len(self.sessions))
+        ADMISSION_OPEN.set(0 if self.refusal_reason() else 1)
+        return {
+            "accepting": reason is None,
+            "reason": reason,
+            "active_calls": len(self.sessions),
+            "reserved_calls": self.reserved(),
+            "max_active_calls": self.max_calls,
+            "loop_lag_ms": round(self.monitor.lag * 1000, 1),
+            "max_loop_lag_ms": round(self.max_lag * 1000, 1),
+            "pid": os.getpid(),
+        }
+
+
+lag_monitor = LoopLagMonitor()
+admission = AdmissionController(registry, lag_monitor, call_attempts)
@@ -0,0 +1,175 @@
+"""Outbound call progress from Twilio status callbacks.
+
+``make_outbound_call`` asks Twilio to report each call's progress to the
+voice server's ``/call-status`` endpoint. Until a call is answered (or its
+media stream starts, if that comes first) it holds a reservation, so
+``/admission`` stops the dialer before ringing calls could overbook the
+server. A call that ends without answering releases its reservation at
+once, and a ``completed`` call whose stream is somehow still open is hung
+up. Ring and answer times are recorded for tuning the dialer.
+
+Attempts are tracked per worker process; a status callback and the stream
+of the same call may land on different workers when ``--workers`` > 1.
+That is why an answered call releases its reservation without waiting for
+its stream: the stream is counted as an active call by whichever worker
+receives it.
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.metrics import REGISTRY
+from utils.sessions import SessionRegistry, registry
+
+
+logger = logging.getLogger("hr_server.call_status")
+
+# A reservation with no callback for this long is released (lost callbacks must not leak capacity)
+call_reservation_timeout = float(os.getenv("CALL_RESERVATION_TIMEOUT", "120"))
+# Finished attempts are kept this long for /calls
+call_attempt_retention = float(os.getenv("CALL_ATTEMPT_RETENTION", "600"))
+
+TERMINAL_STATUSES = {"completed", "busy", "no-answer", "failed", "canceled"}
+# Twilio's CallStatus values in lifecycle order; callbacks can arrive out of order
+STATUS_ORDER = {"queued": 0, "initiated": 1, "ringing": 2, "in-progress": 3}
+
+CALL_STATUS = REGISTRY.counter("voice_call_status_total", "Twilio call status callbacks", ("status",))
+RING_SECONDS = REGISTRY.histogram(
+    "voice_call_ring_seconds", "Ringing until answered or given up", ("outcome",),
+    buckets=(1, 2.5, 5, 10, 15, 20, 30, 45, 60, 90),
+)
+ANSWER_SECONDS = REGISTRY.histogram(
+    "voice_call_answer_seconds", "Call initiated until answered",
+    buckets=(1, 2.5, 5, 10, 15, 20, 30, 45, 60, 90),
+)
+RESERVED_CALLS = REGISTRY.gauge("voice_reserved_calls", "Dialed calls holding a slot until they are answered")
+
+
+class CallAttempt:
+    """One outbound call, from the first status callback until it ends."""
+
+    def __init__(self, call_sid: str):
+        self.call_sid = call_sid
+        self.status = "queued"
+        self.sequence = -1
+        self.reserved = True
+        self.stream_started = False
+        self.created_at = time.monotonic()
+        self.updated_at = self.created_at
+        # Monotonic times of each status, first seen
+        self.times: Dict[str, float] = {}
+        self.details: Dict[str, str] = {}
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def seconds_between(self, first: str, second: str) -> Optional[float]:
+        if first in self.times and second in self.times:
+            return round(self.times[second] - self.times[first], 3)
+        return None
+
+    def describe(self) -> Dict:
+        ring_end = "in-progress" if "in-progress" in self.times else self.status
+        return {
+            "call_sid": self.call_sid,
+            "status": self.status,
+            "reserved": self.reserved,
+            "stream_started": self.stream_started,
+            "ring_seconds": self.seconds_between("ringing", ring_end),
+            "answer_seconds": self.seconds_between("initiated", "in-progress"),
+            "age_seconds": round(time.monotonic() - self.created_at, 3),
+            **self.details,
+        }
+
+
+class CallAttempts:
+    """Outbound calls of this worker by call SID. Only touched from the event loop thread."""
+
+    def __init__(self, sessions: SessionRegistry):
+        self.sessions = sessions
+        self._attempts: "OrderedDict[str, CallAttempt]" = OrderedDict()
+
+    def update(self, call_sid: str, status: str, sequence: Optional[int] = None, details: Optional[Dict] = None) -> CallAttempt:
+        """Apply a status callback. Stale (lower sequence) and post-terminal updates are ignored."""
+        self.expire()
+        attempt = self._attempts.get(call_sid)
+        if attempt is None:
+            attempt = self._attempts[call_sid] = CallAttempt(call_sid)
+            if self.sessions.by_call_sid(call_sid) is not None:
+                # The stream got here before the first callback
+                attempt.stream_started = True
+                attempt.reserved = False
+        CALL_STATUS.inc(status=status)
+        if attempt.finished or (sequence is not None and sequence <= attempt.sequence):
+            return attempt
+        if sequence is not None:
+            attempt.sequence = sequence
+        now = time.monotonic()
+        attempt.times.setdefault(status, now)
+        attempt.updated_at = now
+        attempt.details.update({key: value for key, value in (details or {}).items() if value})
+        if STATUS_ORDER.get(status, 99) >= STATUS_ORDER.get(attempt.status, 0):
+            attempt.status = status
+
+        if status == "in-progress":
+            attempt.reserved = False
+            answered = attempt.seconds_between("initiated", "in-progress")
+            if answered is not None:
+                ANSWER_SECONDS.observe(answered)
+            ringing = attempt.seconds_between("ringing", "in-progress")
+            if ringing is not None:
+                RING_SECONDS.observe(ringing, outcome="answered")
+        elif status in TERMINAL_STATUSES:
+            self._finish(attempt)
+        RESERVED_CALLS.set(self.reserved())
+        logger.info(
+            f"Call {call_sid} is {status}",
+            extra={"event": "call_status", "data": attempt.describe()},
+        )
+        return attempt
+
+    def _finish(self, attempt: CallAttempt):
+        attempt.reserved = False
+        if "in-progress" not in attempt.times:
+            ringing = attempt.seconds_between("ringing", attempt.status)
+            if ringing is not None:
+                RING_SECONDS.observe(ringing, outcome=attempt.status)
+        session = self.sessions.by_call_sid(attempt.call_sid)
+        if session is not None:
+            # Twilio has ended the call; don't wait for the stream to notice
+            logger.warning(f"Call {attempt.call_sid} ended ({attempt.status}) with its stream still open, hanging up")
+            session.hangup()
+
+    def stream_started(self, call_sid: Optional[str]):
+        """The call's media stream is live; it now counts as an active call instead."""
+        attempt = self._attempts.get(call_sid) if call_sid else None
+        if attempt is not None:
+            attempt.stream_started = True
+            attempt.reserved = False
+            RESERVED_CALLS.set(self.reserved())
+
+    def expire(self):
+        """Release reservations whose callbacks stopped, and forget old attempts."""
+        now = time.monotonic()
+        for call_sid, attempt in list(self._attempts.items()):
+            if attempt.reserved and now - attempt.updated_at > call_reservation_timeout:
+                logger.warning(f"No status for call {call_sid} in {call_reservation_timeout:.0f}s, releasing its slot")
+                attempt.reserved = False
+            if not attempt.reserved and now - attempt.updated_at > call_attempt_retention:
+                del self._attempts[call_sid]
+        RESERVED_CALLS.set(self.reserved())
+
+    def reserved(self) -> int:
+        return sum(1 for attempt in self._attempts.values() if attempt.reserved)
+
+    def get(self, call_sid: str) -> Optional[CallAttempt]:
+        return self._attempts.get(call_sid)
+
+    def attempts(self) -> List[CallAttempt]:
+        return list(self._attempts.values())
+
+
+call_attempts = CallAttempts(registry)
@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+import requests
+from dotenv import load_dotenv
+
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+health_check_interval = float(os.getenv("HEALTH_CHECK_INTERVAL", "30"))
+health_check_timeout = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+
+
+def http_check(url: str, headers: Optional[Dict] = None) -> Callable[[], bool]:
+    """Build a reachability check: any non-5xx response counts as reachable."""
+    def check() -> bool:
+        response = requests.get(url, headers=headers or {}, timeout=health_check_timeout)
+        return response.status_code < 500
+    return check
+
+
+def trieve_check() -> Callable[[], bool]:
+    return http_check("https://api.trieve.ai/api/health")
+
+
+def openai_check() -> Callable[[], bool]:
+    return http_check(
+        "https://api.openai.com/v1/models",
+        headers={"Authorization": f"Bearer {os.getenv('OPENAI_KEY', '')}"},
+    )
+
+
+def deepgram_check() -> Callable[[], bool]:
+    return http_check(
+        "https://api.deepgram.com/v1/projects",
+        headers={"Authorization": f"Token {os.getenv('DEEPGRAM_API_KEY', '')}"},
+    )
+
+
+class HealthMonitor:
+    """
+    Refreshes dependency checks on a background thread and serves cached results.
+
+    Probes read the cache only, so they never wait on a remote call. Each check
+    is a zero-argument callable returning True when the dependency is usable;
+    exceptions count as failures.
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], bool]], interval: float = health_check_interval):
+        self.checks = checks
+        self.interval = interval
+        self.started_at = time.monotonic()
+        self._results: Dict[str, Dict] = {}
+        self._last_run: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+            self._thread.start()
+            logger.info(f"Health monitor started for {', '.join(self.checks)} every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self):
+        """Run every check once and replace the cached results."""
+        results = {}
+        for name, check in self.checks.items():
+            started = time.monotonic()
+            try:
+                ok, detail = bool(check()), ""
+            except Exception as e:
+                ok, detail = False, str(e)
+            if not ok:
+                logger.warning(f"Health check {name} failed {detail}".rstrip())
+            results[name] = {
+                "ok": ok,
+                "detail": detail,
+                "latency_ms": round((time.monotonic() - started) * 1000, 1),
+                "checked_at": datetime.now().isoformat(),
+                "_checked": time.monotonic(),
+            }
+        # Swap the whole dict so readers never see a partially updated snapshot
+        self._results = results
+        self._last_run = time.monotonic()
+
+    def seconds_since_check(self) -> Optional[float]:
+        return None if self._last_run is None else round(time.monotonic() - self._last_run, 3)
+
+    def is_healthy(self, name: str, max_age: Optional[float] = None) -> Optional[bool]:
+        """Cached status of one check, or None if it has not run or is older than max_age."""
+        result = self._results.get(name)
+        if result is None:
+            return None
+        if max_age is not None and time.monotonic() - result["_checked"] > max_age:
+            return None
+        return result["ok"]
+
+    def liveness(self) -> Dict:
+        return {
+            "status": "alive",
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "seconds_since_last_check": self.seconds_since_check(),
+        }
+
+    def readiness(self) -> Dict:
+        results = self._results
+        now = time.monotonic()
+        dependencies = {
+            name: {
+                "ok": r["ok"],
+                "detail": r["detail"],
+                "latency_ms": r["latency_ms"],
+                "checked_at": r["checked_at"],
+                "seconds_since_check": round(now - r["_checked"], 3),
+            }
+            for name, r in results.items()
+        }
+        if not results:
+            status = "starting"
+        elif all(r["ok"] for r in results.values()):
+            status = "ready"
+        else:
+            status = "not_ready"
+        return {
+            "status": status,
+            "seconds_since_last_check": self.seconds_since_check(),
+            "dependencies": dependencies,
+        }
@@ -2,27 +2,28 @@ from dotenv import load_dotenv
 import os 
 import logging
 from typing import Dict
-from openai import OpenAI
 from helper.config_file import load_config_file
 import yaml 
 import logging
 
 
-logging.basicConfig(
-    level=logging.INFO,  # Use DEBUG level to see detailed logs
-    format="%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s",    handlers=[
-        logging.StreamHandler()  # Print logs to console
-    ],
-)
-
 logger = logging.getLogger(__name__)
-load_dotenv()
-api_key = os.getenv("OPENAI_KEY")
-openai_client = OpenAI(api_key=api_key)
+_openai_client = None
+
+
+def get_openai_client():
+    """Create the OpenAI client on first use so importing this module needs no credentials."""
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        load_dotenv()
+        _openai_client = OpenAI(api_key=os.getenv("OPENAI_KEY"))
+    return _openai_client
 
 
 def extracting_number(text)->Dict:
     try:
+        openai_client = get_openai_client()
         resume_data = {"resume_data": text}
         # print(resume_data)
         prompt  = load_config_file("tools/Resume_Data.yaml")
@@ -0,0 +1,180 @@
+import uuid
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from tinydb import TinyDB, Query
+
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Key for matching candidate names across resumes and interviews."""
+    return " ".join((name or "").lower().split())
+
+
+class JobStore:
+    """Thread-safe persistent store for ingestion jobs backed by TinyDB."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = TinyDB(path)
+        self._table = self._db.table("jobs")
+        self._resumes = self._db.table("resumes")
+
+    def create(self, **fields) -> Dict:
+        """Create a queued job and return it."""
+        now = datetime.now().isoformat()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "message": "",
+            "total": None,
+            "files": [],
+            "created_at": now,
+            "updated_at": now,
+            **fields,
+        }
+        with self._lock:
+            self._table.insert(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._table.get(Query().job_id == job_id)
+        return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.now().isoformat()
+        with self._lock:
+            self._table.update(fields, Query().job_id == job_id)
+
+    def append_file(self, job_id: str, file_result: Dict):
+        """Record the result of one processed file."""
+        def transform(doc):
+            doc["files"].append(file_result)
+            doc["updated_at"] = datetime.now().isoformat()
+
+        with self._lock:
+            self._table.update(transform, Query().job_id == job_id)
+
+    def save_resume(self, resume: Dict, source: str):
+        """Store the fields extracted from a resume, replacing an earlier version of the same file."""
+        doc = {
+            "name": resume.get("name"),
+            "name_key": normalize_name(resume.get("name")),
+            "email": resume.get("email"),
+            "phone": resume.get("phone"),
+            "skills": resume.get("skills"),
+            "source": source,
+            "updated_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self._resumes.upsert(doc, Query().source == source)
+
+    def resumes(self) -> List[Dict]:
+        with self._lock:
+            return [dict(doc) for doc in self._resumes.all()]
+
+    def unfinished(self) -> List[Dict]:
+        with self._lock:
+            return [dict(job) for job in self._table.search(~Query().status.one_of(list(TERMINAL_STATUSES)))]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on a worker pool and tracks their progress in a JobStore.
+
+    ``runner(job, on_progress, should_cancel)`` does the actual work. It reports
+    ``{"event": "listed", "total": n}`` once and ``{"event": "file", "result": {...}}``
+    per file, and should return early when ``should_cancel()`` is true.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable, max_workers: int = 2):
+        self.store = store
+        self.runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._stopping = False
+
+    def submit(self, **fields) -> Dict:
+        """Create a job and queue it for execution."""
+        job = self.store.create(**fields)
+        self._enqueue(job["job_id"])
+        logger.info(f"Queued ingestion job {job['job_id']}")
+        return job
+
+    def _enqueue(self, job_id: str):
+        self._cancel_events[job_id] = threading.Event()
+        self._executor.submit(self._run, job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Request cancellation of a job. Returns the job, or None if unknown."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return job
+        event = self._cancel_events.get(job_id)
+        if event:
+            event.set()
+        if job["status"] == "queued":
+            self.store.update(job_id, status="cancelled", message="Cancelled before start")
+        logger.info(f"Cancellation requested for job {job_id}")
+        return self.store.get(job_id)
+
+    def resume_unfinished(self):
+        """Requeue jobs that were queued or running when the process stopped."""
+        for job in self.store.unfinished():
+            logger.info(f"Resuming job {job['job_id']} with {len(job['files'])} files already processed")
+            self.store.update(job["job_id"], status="queued")
+            self._enqueue(job["job_id"])
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return
+        cancel_event = self._cancel_events[job_id]
+        self.store.update(job_id, status="running", message="")
+
+        def on_progress(event: Dict):
+            if event["event"] == "listed":
+                self.store.update(job_id, total=event["total"])
+            elif event["event"] == "file":
+                self.store.append_file(job_id, event["result"])
+
+        try:
+            result = self.runner(job, on_progress, cancel_event.is_set)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self.store.update(job_id, status="failed", message=str(e))
+            return
+        finally:
+            self._cancel_events.pop(job_id, None)
+
+        if self._stopping:
+            # Leave the job as running so resume_unfinished picks it up after restart
+            logger.info(f"Job {job_id} interrupted by shutdown")
+            return
+        if cancel_event.is_set():
+            self.store.update(job_id, status="cancelled", message="Cancelled by request")
+        elif isinstance(result, dict) and result.get("status") == "error":
+            self.store.update(job_id, status="failed", message=result.get("message", ""))
+        else:
+            processed = len(self.store.get(job_id)["files"])
+            message = result.get("message", "") if isinstance(result, dict) else f"Processed {processed} files"
+            self.store.update(job_id, status="completed", message=message)
+        logger.info(f"Job {job_id} finished")
+
+    def shutdown(self):
+        """Stop workers, leaving in-flight jobs to be resumed on next start."""
+        self._stopping = True
+        for event in self._cancel_events.values():
+            event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,414 @@
+"""Per-call timelines and aggregate latency/error stats from hr_server logs.
+
+Reads the JSON-lines file log written by ``server.py`` (rotated files and
+``.gz`` copies included) in a single streaming pass. Records are grouped per
+call by worker pid and session id; a call is reported and forgotten as soon as
+its ``call_summary`` record is read, so memory depends on the number of calls
+in flight at any moment, not on the size of the logs. Records that follow a
+call's summary are counted as post-summary instead of starting a new call; the
+keys of recently finished calls are kept for that, up to a fixed number. Lines
+in the older plain text format carry no call identity and are only counted.
+
+Usage:
+    python -m utils.log_analyzer logs/hr_server.log*
+    python -m utils.log_analyzer logs/*.log* --slow 1.5 --timelines
+    python -m utils.log_analyzer logs/hr_server.log* --call CA123 --json
+"""
+import argparse
+import gzip
+import heapq
+import itertools
+import json
+import re
+import sys
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.metrics import LATENCY_BUCKETS
+
+# Bounds that keep memory constant however much log is read
+MAX_TIMELINE_EVENTS = 200
+MAX_ERROR_KINDS = 50
+MAX_FINISHED_CALLS = 10000
+
+
+class StreamingHistogram:
+    """Fixed-bucket histogram; percentiles are reported as bucket upper bounds."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def describe(self) -> Optional[Dict]:
+        if not self.count:
+            return None
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 4),
+            "p50_le": self.percentile(0.5),
+            "p95_le": self.percentile(0.95),
+            "p99_le": self.percentile(0.99),
+            "max": round(self.max, 4),
+        }
+
+
+class CallState:
+    """Records of one call seen so far."""
+
+    def __init__(self, key: Tuple):
+        self.key = key
+        self.call_sid: Optional[str] = None
+        self.stream_sid: Optional[str] = None
+        self.first_ts: Optional[str] = None
+        self.last_ts: Optional[str] = None
+        self.errors = 0
+        self.dropped_events = 0
+        self.timeline = deque(maxlen=MAX_TIMELINE_EVENTS)
+        self.summary: Optional[Dict] = None
+
+    def add(self, record: Dict, keep_timeline: bool):
+        self.call_sid = self.call_sid or record.get("call_sid")
+        self.stream_sid = self.stream_sid or record.get("stream_sid")
+        self.first_ts = self.first_ts or record.get("ts")
+        self.last_ts = record.get("ts") or self.last_ts
+        if record.get("level") in ("ERROR", "CRITICAL"):
+            self.errors += 1
+        if keep_timeline and record.get("level") != "DEBUG":
+            if len(self.timeline) == self.timeline.maxlen:
+                self.dropped_events += 1
+            self.timeline.append({
+                "ts": record.get("ts"),
+                "level": record.get("level"),
+                "event": record.get("event"),
+                "msg": record.get("msg", "")[:300],
+            })
+
+    def worst_latency(self) -> float:
+        """Largest of time to first audio and the slowest agent response."""
+        summary = self.summary or {}
+        candidates = [summary.get("time_to_first_audio_seconds") or 0.0]
+        response = summary.get("response_latency_seconds") or {}
+        candidates.append(response.get("max") or 0.0)
+        return max(candidates)
+
+    def describe(self, with_timeline: bool) -> Dict:
+        report = {
+            "call_sid": self.call_sid,
+            "stream_sid": self.stream_sid,
+            "pid": self.key[0],
+            "session": self.key[1],
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "errors": self.errors,
+            "complete": self.summary is not None,
+            "worst_latency_seconds": round(self.worst_latency(), 4),
+            "summary": self.summary,
+        }
+        if with_timeline:
+            report["timeline"] = list(self.timeline)
+            report["timeline_dropped"] = self.dropped_events
+        return report
+
+
+class LogAnalyzer:
+    """
+    Streams log records and keeps aggregate stats plus the slowest calls.
+
+    ``slow`` is a latency threshold in seconds; calls whose time to first audio
+    or slowest response exceeds it are counted, and the ``top`` slowest calls
+    overall are kept with their timelines. ``call_sid`` restricts timelines to
+    a single call.
+    """
+
+    def __init__(self, slow: Optional[float] = None, top: int = 10, call_sid: Optional[str] = None):
+        self.slow = slow
+        self.top = top
+        self.call_sid = call_sid
+        self.open_calls: Dict[Tuple, CallState] = {}
+        # Keys of calls whose summary was read, least recently seen first
+        self.finished_calls: "OrderedDict[Tuple, None]" = OrderedDict()
+        self.slowest: List[Tuple[float, int, Dict]] = []
+        self.matched_calls: List[Dict] = []
+        self._order = itertools.count()
+
+        self.lines = 0
+        self.unparsed_lines = 0
+        self.unattributed_records = 0
+        self.post_summary_records = 0
+        self.calls_completed = 0
+        self.calls_slow = 0
+        self.outcomes: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.first_ts: Optional[str] = None
+        self.last_ts: Optional[str] = None
+
+        self.durations = StreamingHistogram((5, 15, 30, 60, 120, 300, 600, 1200, 1800))
+        self.time_to_first_audio = StreamingHistogram()
+        self.response_latency = StreamingHistogram()
+        self.barge_in_clear = StreamingHistogram()
+        self.tool_calls: Dict[str, StreamingHistogram] = {}
+        self.tool_errors: Dict[str, int] = {}
+
+    def feed_line(self, line: str):
+        self.lines += 1
+        line = line.strip()
+        if not line:
+            return
+        if not line.startswith("{"):
+            # Plain-text line from before structured logging
+            self.unparsed_lines += 1
+            if " - ERROR - " in line:
+                self._count_error(line.split(" - ERROR - ", 1)[1])
+            return
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            self.unparsed_lines += 1
+            return
+        self.feed(record)
+
+    def feed(self, record: Dict):
+        ts = record.get("ts")
+        if ts:
+            self.first_ts = self.first_ts or ts
+            self.last_ts = ts
+        if record.get("level") in ("ERROR", "CRITICAL"):
+            self._count_error(record.get("msg", ""))
+
+        session = record.get("session")
+        if session is None:
+            self.unattributed_records += 1
+            return
+        key = (record.get("pid"), session)
+        if key in self.finished_calls:
+            self.finished_calls.move_to_end(key)
+            self.post_summary_records += 1
+            return
+        state = self.open_calls.get(key)
+        if state is None:
+            state = self.open_calls[key] = CallState(key)
+        state.add(record, keep_timeline=self._wants_timeline(state, record))
+        if record.get("event") == "call_summary":
+            state.summary = record.get("data") or {}
+            self._finish(self.open_calls.pop(key))
+            self.finished_calls[key] = None
+            if len(self.finished_calls) > MAX_FINISHED_CALLS:
+                self.finished_calls.popitem(last=False)
+
+    def _wants_timeline(self, state: CallState, record: Dict) -> bool:
+        if self.call_sid is None:
+            return True
+        # Before the start event the SID is unknown, so keep those records too
+        sid = state.call_sid or record.get("call_sid")
+        return sid is None or sid == self.call_sid
+
+    def _count_error(self, message: str):
+        # Group by the text before the first colon, which drops per-call details
+        kind = re.sub(r"\s+", " ", message.split(":", 1)[0])[:120]
+        if kind not in self.errors and len(self.errors) >= MAX_ERROR_KINDS:
+            kind = "(other)"
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def _finish(self, state: CallState):
+        summary = state.summary
+        if summary is not None:
+            self.calls_completed += 1
+            outcome = summary.get("outcome", "completed")
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if summary.get("duration_seconds") is not None:
+                self.durations.observe(summary["duration_seconds"])
+            if summary.get("time_to_first_audio_seconds") is not None:
+                self.time_to_first_audio.observe(summary["time_to_first_audio_seconds"])
+            for field, histogram in (
+                ("response_latency_seconds", self.response_latency),
+                ("barge_in_clear_seconds", self.barge_in_clear),
+            ):
+                stats = summary.get(field)
+                if stats:
+                    # Only per-call aggregates are logged; use the worst value of each call
+                    histogram.observe(stats["max"])
+            for tool in summary.get("tool_calls") or []:
+                name = tool.get("function", "unknown")
+                self.tool_calls.setdefault(name, StreamingHistogram()).observe(tool.get("seconds", 0.0))
+                if tool.get("status") != "success":
+                    self.tool_errors[name] = self.tool_errors.get(name, 0) + 1
+        else:
+            self.outcomes["incomplete"] = self.outcomes.get("incomplete", 0) + 1
+
+        if self.call_sid is not None:
+            if state.call_sid == self.call_sid:
+                self.matched_calls.append(state.describe(with_timeline=True))
+            return
+
+        worst = state.worst_latency()
+        if self.slow is not None and worst > self.slow:
+            self.calls_slow += 1
+        if self.top > 0:
+            entry = (worst, next(self._order), state.describe(with_timeline=True))
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, entry)
+            elif worst > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def close(self):
+        """Flush calls whose summary never appeared (crash, restart or truncated log)."""
+        for key in list(self.open_calls):
+            self._finish(self.open_calls.pop(key))
+
+    def report(self) -> Dict:
+        return {
+            "period": {"first_ts": self.first_ts, "last_ts": self.last_ts},
+            "lines": self.lines,
+            "unparsed_lines": self.unparsed_lines,
+            "unattributed_records": self.unattributed_records,
+            "post_summary_records": self.post_summary_records,
+            "calls": {
+                "completed": self.calls_completed,
+                "by_outcome": self.outcomes,
+                "slow": self.calls_slow if self.slow is not None else None,
+                "slow_threshold_seconds": self.slow,
+            },
+            "duration_seconds": self.durations.describe(),
+            "time_to_first_audio_seconds": self.time_to_first_audio.describe(),
+            "max_response_latency_seconds": self.response_latency.describe(),
+            "max_barge_in_clear_seconds": self.barge_in_clear.describe(),
+            "tool_call_seconds": {name: h.describe() for name, h in sorted(self.tool_calls.items())},
+            "tool_call_errors": self.tool_errors,
+            "errors": dict(sorted(self.errors.items(), key=lambda item: -item[1])),
+            "slowest_calls": [entry for _, _, entry in sorted(self.slowest, reverse=True)],
+            "matched_calls": self.matched_calls,
+        }
+
+
+def rotation_order(paths: Iterable[str]) -> List[str]:
+    """Oldest first: ``x.log.5`` ... ``x.log.1``, then ``x.log`` (``.gz`` suffixes ignored)."""
+
+    def key(path: str):
+        name = path[:-3] if path.endswith(".gz") else path
+        match = re.match(r"^(.*?)\.(\d+)$", name)
+        if match:
+            return match.group(1), -int(match.group(2))
+        return name, 0
+
+    return sorted(paths, key=key)
+
+
+def read_lines(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if path == "-":
+            yield from sys.stdin
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as handle:
+            yield from handle
+
+
+def format_histogram(name: str, stats: Optional[Dict]) -> str:
+    if not stats:
+        return f"  {name:<32} -"
+    return (
+        f"  {name:<32} n={stats['count']:<6} avg={stats['avg']:<8} p50<={stats['p50_le']:<6} "
+        f"p95<={stats['p95_le']:<6} p99<={stats['p99_le']:<6} max={stats['max']}"
+    )
+
+
+def print_timeline(call: Dict):
+    print(
+        f"\nCall {call['call_sid'] or '(no call SID)'} pid={call['pid']} session={call['session']} "
+        f"{call['first_ts']} -> {call['last_ts']} worst={call['worst_latency_seconds']}s errors={call['errors']}"
+        f"{'' if call['complete'] else ' INCOMPLETE'}"
+    )
+    if call.get("timeline_dropped"):
+        print(f"  ... {call['timeline_dropped']} earlier events not kept")
+    for event in call.get("timeline", []):
+        tag = f"[{event['event']}] " if event.get("event") else ""
+        print(f"  {event['ts']} {event['level']:<7} {tag}{event['msg']}")
+
+
+def print_report(report: Dict, timelines: bool):
+    period = report["period"]
+    calls = report["calls"]
+    print(f"Period: {period['first_ts']} -> {period['last_ts']}")
+    print(
+        f"Lines: {report['lines']} (plain text {report['unparsed_lines']}, "
+        f"outside a call {report['unattributed_records']}, after a call's summary {report['post_summary_records']})"
+    )
+    print(f"Calls: {calls['completed']} completed, by outcome {calls['by_outcome']}")
+    if calls["slow"] is not None:
+        print(f"Slow calls (> {calls['slow_threshold_seconds']}s): {calls['slow']}")
+    print("Latency:")
+    print(format_histogram("call duration", report["duration_seconds"]))
+    print(format_histogram("time to first audio", report["time_to_first_audio_seconds"]))
+    print(format_histogram("max response latency per call", report["max_response_latency_seconds"]))
+    print(format_histogram("max barge-in clear per call", report["max_barge_in_clear_seconds"]))
+    if report["tool_call_seconds"]:
+        print("Tool calls:")
+        for name, stats in report["tool_call_seconds"].items():
+            errors = report["tool_call_errors"].get(name, 0)
+            print(format_histogram(f"{name} (errors {errors})", stats))
+    if report["errors"]:
+        print("Errors:")
+        for kind, count in report["errors"].items():
+            print(f"  {count:>6}  {kind}")
+    if report["slowest_calls"]:
+        print("Slowest calls:")
+        for call in report["slowest_calls"]:
+            print(f"  {call['worst_latency_seconds']:>8}s  {call['call_sid'] or '(no call SID)'}  {call['first_ts']}")
+        if timelines:
+            for call in report["slowest_calls"]:
+                print_timeline(call)
+    for call in report["matched_calls"]:
+        print_timeline(call)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Log files, rotated copies and .gz files; '-' reads stdin")
+    parser.add_argument("--slow", type=float, help="Count calls whose worst latency exceeds this many seconds")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest calls to keep")
+    parser.add_argument("--call", help="Print the timeline of this call SID only")
+    parser.add_argument("--timelines", action="store_true", help="Print timelines of the slowest calls")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    analyzer = LogAnalyzer(slow=args.slow, top=args.top, call_sid=args.call)
+    for line in read_lines(rotation_order(args.paths)):
+        analyzer.feed_line(line)
+    analyzer.close()
+    report = analyzer.report()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.timelines)
+    if args.call and not report["matched_calls"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
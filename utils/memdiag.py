@@ -0,0 +1,221 @@
+"""Opt-in memory diagnostics for the voice server (``MEMDIAG=1``).
+
+When enabled:
+
+- tracemalloc runs with ``MEMDIAG_FRAMES`` frames per allocation; every
+  session records the traced memory at start and end, and every
+  ``MEMDIAG_SNAPSHOT_EVERY``-th session also takes full snapshots and keeps
+  the top allocation sites that grew while it ran
+- a task factory attributes every task to the session whose context created
+  it (including the websockets library's own tasks for the agent connection)
+- ``MEMDIAG_LINGER_SECONDS`` after a session ends, any of its tasks still
+  running are logged as lingering, with their coroutine names
+- ``GET /debug/memory`` on the websocket port returns all of the above plus
+  the process's top allocation sites (``?top=25&group=lineno|filename|traceback``,
+  ``&diff=1`` to compare with the snapshot at startup, ``&gc=1`` to collect
+  first and count ended sessions that are still referenced). Set
+  ``MEMDIAG_TOKEN`` to require it in an ``X-Admin-Token`` header.
+
+Snapshots walk every traced block and stall the event loop while they run,
+so keep this to load tests and short investigations.
+"""
+import os
+import gc
+import time
+import asyncio
+import logging
+import tracemalloc
+import weakref
+from collections import deque
+from typing import Dict, List
+
+from utils.metrics import REGISTRY
+from utils.structured_logging import current_call
+
+
+logger = logging.getLogger("hr_server.memdiag")
+
+memdiag_enabled = os.getenv("MEMDIAG", "").lower() in ("1", "true", "yes")
+memdiag_frames = int(os.getenv("MEMDIAG_FRAMES", "10"))
+memdiag_snapshot_every = int(os.getenv("MEMDIAG_SNAPSHOT_EVERY", "20"))
+memdiag_linger_seconds = float(os.getenv("MEMDIAG_LINGER_SECONDS", "5"))
+memdiag_history = int(os.getenv("MEMDIAG_HISTORY", "100"))
+memdiag_token = os.getenv("MEMDIAG_TOKEN", "")
+
+TRACED_BYTES = REGISTRY.gauge("voice_memdiag_traced_bytes", "Memory traced by tracemalloc")
+LINGERING_TASKS = REGISTRY.counter(
+    "voice_memdiag_lingering_tasks_total", "Tasks still running after their session ended"
+)
+SESSIONS_WITH_LINGERING_TASKS = REGISTRY.counter(
+    "voice_memdiag_lingering_sessions_total", "Ended sessions that left tasks running"
+)
+
+# Diagnostics' own frames; they would otherwise top every allocation listing
+_IGNORED = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def task_name(task: asyncio.Task) -> str:
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or task.get_name()
+
+
+def top_stats(snapshot, group: str = "lineno", limit: int = 25, baseline=None) -> List[Dict]:
+    """Largest allocation sites of a snapshot, or its growth over ``baseline``."""
+    snapshot = snapshot.filter_traces(_IGNORED)
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline.filter_traces(_IGNORED), group)
+    else:
+        stats = snapshot.statistics(group)
+    sites = []
+    for stat in stats[:limit]:
+        site = {
+            "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+            if group == "traceback" else str(stat.traceback[0]),
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        if baseline is not None:
+            site["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+            site["count_diff"] = stat.count_diff
+        sites.append(site)
+    return sites
+
+
+class SessionDiagnostics:
+    """What one session allocated and started. Holds the session only weakly."""
+
+    def __init__(self, session, snapshot: bool):
+        self.session_id = session.id
+        self.session = weakref.ref(session)
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self.tasks_created = 0
+        self.started = time.monotonic()
+        self.traced_start = tracemalloc.get_traced_memory()[0]
+        self.snapshot_start = tracemalloc.take_snapshot() if snapshot else None
+        self.report: Dict = {}
+
+    def live_tasks(self) -> List[asyncio.Task]:
+        return [task for task in self.tasks if not task.done()]
+
+    def queue_sizes(self) -> Dict[str, int]:
+        session = self.session()
+        return {name: queue.qsize() for name, queue in getattr(session, "queues", {}).items()} if session else {}
+
+    def describe(self) -> Dict:
+        session = self.session()
+        return {
+            "session": self.session_id,
+            "call_sid": getattr(session, "call_sid", None),
+            "age_seconds": round(time.monotonic() - self.started, 1),
+            "tasks_created": self.tasks_created,
+            "tasks_live": len(self.live_tasks()),
+            "queues": self.queue_sizes(),
+            **self.report,
+        }
+
+
+class MemoryDiagnostics:
+    def __init__(self, enabled: bool = memdiag_enabled):
+        self.enabled = enabled
+        self.baseline = None
+        self.sessions_seen = 0
+        self._live: Dict[int, SessionDiagnostics] = {}
+        self._ended: deque = deque(maxlen=memdiag_history)
+        self._ended_sessions: "weakref.WeakSet" = weakref.WeakSet()
+        self.lingering: deque = deque(maxlen=memdiag_history)
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Begin tracing and attribute new tasks to sessions. Call from the serving loop."""
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(memdiag_frames)
+        self.baseline = tracemalloc.take_snapshot()
+        loop.set_task_factory(self._task_factory)
+        logger.warning(f"Memory diagnostics enabled ({memdiag_frames} frames per allocation)")
+
+    def _task_factory(self, loop, coro, context=None):
+        if context is None:
+            task = asyncio.Task(coro, loop=loop)
+            session = current_call.get()
+        else:
+            task = asyncio.Task(coro, loop=loop, context=context)
+            session = context.get(current_call)
+        diagnostics = self._live.get(session.id) if session is not None else None
+        if diagnostics is not None:
+            diagnostics.tasks.add(task)
+            diagnostics.tasks_created += 1
+        return task
+
+    def session_started(self, session):
+        if not self.enabled:
+            return
+        self.sessions_seen += 1
+        # Sessions 1, 1 + N, 1 + 2N, ... so a short run still gets one
+        snapshot = memdiag_snapshot_every > 0 and (self.sessions_seen - 1) % memdiag_snapshot_every == 0
+        self._live[session.id] = SessionDiagnostics(session, snapshot)
+
+    def session_ended(self, session):
+        """Record the session's memory change and check for lingering tasks once the grace period passes."""
+        diagnostics = self._live.pop(session.id, None) if self.enabled else None
+        if diagnostics is None:
+            return
+        traced = tracemalloc.get_traced_memory()[0]
+        TRACED_BYTES.set(traced)
+        diagnostics.report["duration_seconds"] = round(time.monotonic() - diagnostics.started, 1)
+        # Process-wide change while the session ran; concurrent sessions contribute too
+        diagnostics.report["traced_change_kb"] = round((traced - diagnostics.traced_start) / 1024, 1)
+        diagnostics.report["queues_at_end"] = diagnostics.queue_sizes()
+        if diagnostics.snapshot_start is not None:
+            diagnostics.report["top_growth"] = top_stats(
+                tracemalloc.take_snapshot(), limit=10, baseline=diagnostics.snapshot_start
+            )
+            diagnostics.snapshot_start = None
+        self._ended.append(diagnostics)
+        self._ended_sessions.add(session)
+        asyncio.get_running_loop().call_later(memdiag_linger_seconds, self._check_lingering, diagnostics)
+
+    def _check_lingering(self, diagnostics: SessionDiagnostics):
+        tasks = diagnostics.live_tasks()
+        diagnostics.report["tasks_lingering"] = len(tasks)
+        if not tasks:
+            return
+        names = sorted(task_name(task) for task in tasks)
+        LINGERING_TASKS.inc(len(tasks))
+        SESSIONS_WITH_LINGERING_TASKS.inc()
+        entry = {"session": diagnostics.session_id, "seconds_after_end": memdiag_linger_seconds, "tasks": names}
+        self.lingering.append(entry)
+        logger.warning(
+            f"Session {diagnostics.session_id} left {len(tasks)} tasks running after it ended: {', '.join(names)}",
+            extra={"event": "lingering_tasks", "data": entry},
+        )
+
+    def report(self, top: int = 25, group: str = "lineno", diff: bool = False, collect: bool = False) -> Dict:
+        if collect:
+            gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        TRACED_BYTES.set(current)
+        attributed = sum(len(d.live_tasks()) for d in self._live.values())
+        snapshot = tracemalloc.take_snapshot()
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "traced_peak_kb": round(peak / 1024, 1),
+            "tasks": {"total": len(asyncio.all_tasks()), "in_sessions": attributed},
+            "gc_counts": gc.get_count(),
+            "sessions_seen": self.sessions_seen,
+            # Ended sessions something still refers to; meaningful after gc=1
+            "ended_sessions_alive": len(self._ended_sessions),
+            "live_sessions": [d.describe() for d in self._live.values()],
+            "ended_sessions": [d.describe() for d in self._ended],
+            "lingering": list(self.lingering),
+            "top_allocations": top_stats(snapshot, group, top, self.baseline if diff else None),
+        }
+
+
+memdiag = MemoryDiagnostics()
@@ -0,0 +1,276 @@
+import os
+import time
+import json
+import logging
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger("hr_server.metrics")
+
+# Per-call series are kept for this many finished calls, then dropped
+metrics_max_calls = int(os.getenv("METRICS_MAX_CALLS", "200"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    """Base class for a named metric family with a fixed set of label names."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def remove(self, **labels):
+        """Drop every series whose labels match the given subset."""
+        with self._lock:
+            for key in list(self._series):
+                if all(key[self.labelnames.index(k)] == str(v) for k, v in labels.items() if k in self.labelnames):
+                    del self._series[key]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(list(zip(self.labelnames, key)), value))
+        return lines
+
+    def _render_series(self, labels, value) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {value}"]
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def _render_series(self, labels, series) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', bound)])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {series['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {series['sum']}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def remove_series(self, **labels):
+        for metric in self._metrics.values():
+            if set(labels) & set(metric.labelnames):
+                metric.remove(**labels)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CALLS_TOTAL = REGISTRY.counter("voice_calls_total", "Calls handled by this process", ("outcome",))
+TIME_TO_FIRST_AUDIO = REGISTRY.histogram(
+    "voice_time_to_first_audio_seconds", "Twilio start event to first agent audio sent to Twilio", ("call",)
+)
+BARGE_IN_CLEAR = REGISTRY.histogram(
+    "voice_barge_in_clear_seconds", "UserStartedSpeaking received to clear sent to Twilio", ("call",)
+)
+RESPONSE_LATENCY = REGISTRY.histogram(
+    "voice_response_latency_seconds", "End of user speech to first agent reply audio", ("call",)
+)
+TOOL_CALL_DURATION = REGISTRY.histogram(
+    "voice_tool_call_seconds", "Duration of agent function calls", ("call", "function", "status")
+)
+FRAMES = REGISTRY.counter("voice_frames_total", "Audio frames relayed", ("call", "direction"))
+
+
+class CallMetrics:
+    """
+    Latency and throughput bookkeeping for a single call.
+
+    Timestamps use ``time.monotonic``. The call label is the Twilio call SID,
+    falling back to the stream SID, and is only known after the start event.
+    """
+
+    _finished_calls = deque()
+
+    def __init__(self):
+        self.call_id = "pending"
+        self.call_sid: Optional[str] = None
+        self.stream_sid: Optional[str] = None
+        self.connected_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self.user_turn_ended_at: Optional[float] = None
+        self.frames_in = 0
+        self.frames_out = 0
+        self.barge_ins: List[float] = []
+        self.response_latencies: List[float] = []
+        self.tool_calls: List[Dict] = []
+
+    def started(self, call_sid: Optional[str], stream_sid: Optional[str]):
+        self.call_sid = call_sid
+        self.stream_sid = stream_sid
+        self.call_id = call_sid or stream_sid or "unknown"
+        self.started_at = time.monotonic()
+
+    def frame_in(self):
+        self.frames_in += 1
+        FRAMES.inc(call=self.call_id, direction="in")
+
+    def frame_out(self):
+        now = time.monotonic()
+        self.frames_out += 1
+        FRAMES.inc(call=self.call_id, direction="out")
+        if self.first_audio_at is None and self.started_at is not None:
+            self.first_audio_at = now
+            TIME_TO_FIRST_AUDIO.observe(now - self.started_at, call=self.call_id)
+        if self.user_turn_ended_at is not None:
+            latency = now - self.user_turn_ended_at
+            self.user_turn_ended_at = None
+            self.response_latencies.append(latency)
+            RESPONSE_LATENCY.observe(latency, call=self.call_id)
+
+    def user_turn_ended(self):
+        self.user_turn_ended_at = time.monotonic()
+
+    def barge_in_cleared(self, received_at: float):
+        duration = time.monotonic() - received_at
+        self.barge_ins.append(duration)
+        # The agent's reply to the interrupted turn should not count as a response
+        self.user_turn_ended_at = None
+        BARGE_IN_CLEAR.observe(duration, call=self.call_id)
+
+    def tool_call(self, function_name: str, duration: float, status: str):
+        self.tool_calls.append({"function": function_name, "seconds": round(duration, 4), "status": status})
+        TOOL_CALL_DURATION.observe(duration, call=self.call_id, function=function_name, status=status)
+
+    def summary(self) -> Dict:
+        now = time.monotonic()
+        duration = now - (self.started_at or self.connected_at)
+
+        def stats(values):
+            if not values:
+                return None
+            ordered = sorted(values)
+            return {
+                "count": len(ordered),
+                "avg": round(sum(ordered) / len(ordered), 4),
+                "p50": round(ordered[len(ordered) // 2], 4),
+                "max": round(ordered[-1], 4),
+            }
+
+        return {
+            "call_sid": self.call_sid,
+            "stream_sid": self.stream_sid,
+            "duration_seconds": round(duration, 3),
+            "time_to_first_audio_seconds": (
+                round(self.first_audio_at - self.started_at, 4) if self.first_audio_at and self.started_at else None
+            ),
+            "barge_in_clear_seconds": stats(self.barge_ins),
+            "response_latency_seconds": stats(self.response_latencies),
+            "tool_calls": self.tool_calls,
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "frames_in_per_second": round(self.frames_in / duration, 2) if duration > 0 else 0,
+            "frames_out_per_second": round(self.frames_out / duration, 2) if duration > 0 else 0,
+        }
+
+    def finish(self, outcome: str = "completed") -> Dict:
+        """Log the per-call summary and schedule the call's series for eviction."""
+        summary = self.summary()
+        CALLS_TOTAL.inc(outcome=outcome)
+        logger.info(
+            f"Call summary: {json.dumps(summary)}",
+            extra={"event": "call_summary", "data": dict(summary, outcome=outcome)},
+        )
+        finished = CallMetrics._finished_calls
+        finished.append(self.call_id)
+        while len(finished) > metrics_max_calls:
+            REGISTRY.remove_series(call=finished.popleft())
+        return summary
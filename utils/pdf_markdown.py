@@ -0,0 +1,138 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+markdown_cache_dir = os.getenv("MARKDOWN_CACHE_DIR", "cache/markdown")
+pdf_workers = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+pdf_convert_timeout = float(os.getenv("PDF_CONVERT_TIMEOUT", "60"))
+# Pages with fewer extractable characters than this are treated as scanned
+min_page_text_chars = int(os.getenv("MIN_PAGE_TEXT_CHARS", "20"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the shared conversion pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        # spawn avoids forking the threads of the API worker that owns the pool
+        _pool = ProcessPoolExecutor(
+            max_workers=pdf_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Started PDF conversion pool with {pdf_workers} workers")
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the conversion pool if it was started."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def convert_pdf(path: str) -> Dict:
+    """Convert a PDF to markdown, flagging scanned or image-only pages. Runs in a worker process."""
+    import pymupdf
+    import pymupdf4llm
+
+    with pymupdf.open(path) as doc:
+        scanned_pages = [
+            page.number for page in doc
+            if len(page.get_text().strip()) < min_page_text_chars
+        ]
+        text_pages = [n for n in range(doc.page_count) if n not in scanned_pages]
+        markdown = pymupdf4llm.to_markdown(doc, pages=text_pages, show_progress=False) if text_pages else ""
+        return {
+            "markdown": markdown,
+            "page_count": doc.page_count,
+            "scanned_pages": scanned_pages,
+        }
+
+
+def hash_file(fileobj, chunk_size: int = 64 * 1024) -> str:
+    """Return the sha256 hex digest of a file object and rewind it."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def _cache_path(content_hash: str) -> str:
+    return os.path.join(markdown_cache_dir, f"{content_hash}.json")
+
+
+def read_cached_conversion(content_hash: str) -> Optional[Dict]:
+    """Return the cached conversion (as from convert_pdf) for a content hash, if present."""
+    try:
+        with open(_cache_path(content_hash), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.error(f"Unreadable markdown cache entry {content_hash[:12]}: {str(e)}")
+        return None
+
+
+def write_cached_conversion(content_hash: str, result: Dict):
+    """Atomically store a conversion under its content hash."""
+    os.makedirs(markdown_cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=markdown_cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, _cache_path(content_hash))
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def markdown_for_pdf(fileobj) -> Dict:
+    """
+    Get markdown for a PDF file object, converting locally when possible.
+
+    Returns a dict with the content hash, the markdown of the text pages, and
+    ``needs_ocr`` set when any page is scanned and must go through remote OCR;
+    the markdown then covers only part of the document. Conversions are cached
+    with their scanned pages, so neither kind is converted twice.
+    """
+    content_hash = hash_file(fileobj)
+    cached = read_cached_conversion(content_hash)
+    if cached is not None:
+        logger.info(f"Markdown cache hit for {content_hash[:12]}")
+        return {
+            "hash": content_hash,
+            "markdown": cached["markdown"],
+            "needs_ocr": bool(cached["scanned_pages"]),
+            "cached": True,
+        }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "document.pdf")
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+        fileobj.seek(0)
+        future = get_pool().submit(convert_pdf, path)
+        result = future.result(timeout=pdf_convert_timeout)
+
+    needs_ocr = bool(result["scanned_pages"])
+    if needs_ocr:
+        logger.info(
+            f"{len(result['scanned_pages'])} of {result['page_count']} pages need OCR for {content_hash[:12]}"
+        )
+    write_cached_conversion(content_hash, result)
+    return {"hash": content_hash, "markdown": result["markdown"], "needs_ocr": needs_ocr, "cached": False}
@@ -0,0 +1,154 @@
+"""In-memory index of candidates by phone number, for inbound callbacks.
+
+Built from the resumes saved by PDF ingestion (the ``resumes`` table of
+``jobs_database.json``). Numbers are normalized with the rules of
+``tools/Resume_Data.yaml`` so the caller ID Twilio reports and the number
+extracted from a resume meet on the same E.164 key. Each entry carries the
+context the interview prompt needs, so a callback is personalized with a
+dict lookup instead of a remote search.
+
+The voice server loads the index at startup and reloads it when the ingest
+process rewrites the file.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from tinydb import TinyDB
+from tinydb.storages import JSONStorage
+
+from utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("hr_server.phone_index")
+
+jobs_db_path = os.getenv("JOBS_DB_PATH", "jobs_database.json")
+
+INDEX_SIZE = REGISTRY.gauge("voice_phone_index_entries", "Candidates in the phone number index")
+LOOKUPS = REGISTRY.counter("voice_phone_index_lookups_total", "Inbound caller lookups", ("result",))
+
+
+def normalize_phone(raw: Optional[str]) -> Optional[str]:
+    """
+    E.164 form of a phone number, or None if it has too few digits.
+
+    As in the resume extraction prompt, a number starting with "03" and no
+    country code is taken to be Pakistani and gets "+92".
+    """
+    if not raw:
+        return None
+    text = str(raw).strip()
+    digits = re.sub(r"\D", "", text)
+    if not text.startswith("+"):
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("03"):
+            digits = "92" + digits[1:]
+    # "+92 (0)313..." keeps the trunk zero after the country code
+    if digits.startswith("920"):
+        digits = "92" + digits[3:]
+    if len(digits) < 8 or len(digits) > 15:
+        return None
+    return "+" + digits
+
+
+def candidate_context(resume: Dict) -> Dict:
+    """Prompt context for a candidate, derived once when the index is built."""
+    skills = resume.get("skills") or []
+    # The extraction prompt asks for a comma separated string, but the model sometimes returns a list
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    skills = [str(skill).strip() for skill in skills if str(skill).strip()]
+    return {
+        "candidate_name": (resume.get("name") or "").strip(),
+        "email": resume.get("email"),
+        "skills": skills,
+        "source": resume.get("source"),
+        "updated_at": resume.get("updated_at") or "",
+    }
+
+
+class PhoneIndex:
+    """Phone number to candidate context. Lookups never touch the disk."""
+
+    def __init__(self, path: str = jobs_db_path):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._mtime: Optional[float] = None
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def load(self):
+        """Rebuild the index from the resumes table."""
+        mtime = self._file_mtime()
+        entries: Dict[str, Dict] = {}
+        if mtime is not None:
+            started = time.perf_counter()
+            db = TinyDB(self.path, storage=JSONStorage, access_mode="r")
+            try:
+                resumes = db.table("resumes").all()
+            finally:
+                db.close()
+            for resume in resumes:
+                try:
+                    self._insert(entries, resume)
+                except Exception as e:
+                    # One malformed resume must not leave every caller unmatched
+                    logger.error(f"Skipping malformed resume {getattr(resume, 'doc_id', None)} in phone index: {str(e)}")
+            logger.info(
+                f"Phone index loaded {len(entries)} candidates from {len(resumes)} resumes "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+        self._entries = entries
+        self._mtime = mtime
+        INDEX_SIZE.set(len(entries))
+
+    @staticmethod
+    def _insert(entries: Dict[str, Dict], resume: Dict):
+        phone = normalize_phone(resume.get("phone"))
+        if not phone:
+            return
+        context = candidate_context(resume)
+        # The most recently ingested resume wins when a number appears twice
+        existing = entries.get(phone)
+        if existing is None or existing["updated_at"] <= context["updated_at"]:
+            entries[phone] = context
+
+    def lookup(self, phone: Optional[str]) -> Optional[Dict]:
+        key = normalize_phone(phone)
+        entry = self._entries.get(key) if key else None
+        LOOKUPS.inc(result="matched" if entry else "unmatched")
+        return entry
+
+    def changed(self) -> bool:
+        return self._file_mtime() != self._mtime
+
+    async def resolve(self, phone: Optional[str]) -> Optional[Dict]:
+        """Look up a caller, first reloading off the event loop if ingest rewrote the file."""
+        if self.changed():
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                logger.error(f"Could not reload phone index: {str(e)}")
+        return self.lookup(phone)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_phone_index: Optional[PhoneIndex] = None
+
+
+def get_phone_index() -> PhoneIndex:
+    """Return the process-wide phone index, creating it (unloaded) on first use."""
+    global _phone_index
+    if _phone_index is None:
+        _phone_index = PhoneIndex()
+    return _phone_index
@@ -0,0 +1,232 @@
+"""Pre-rendered audio for the agent's fixed phrases.
+
+Filler messages, the recording disclosure and the generic farewell never
+change, so they are synthesized once, offline, as 8 kHz mu-law clips and
+streamed straight to Twilio instead of going through the agent's TTS. The
+exact length of each clip is known, so teardown after the farewell no
+longer has to guess.
+
+Clips live in ``PHRASE_CACHE_DIR`` as raw ``<key>.ulaw`` files next to an
+``index.json`` manifest. Build them with a TTS source:
+
+Usage:
+    python -m utils.phrase_cache build                   # Deepgram Aura (DEEPGRAM_API_KEY)
+    python -m utils.phrase_cache build --tts tone        # local stand-in, no network
+    python -m utils.phrase_cache build --phrase "Thank you for your time, Sara. ..."
+    python -m utils.phrase_cache list
+"""
+import os
+import json
+import math
+import hashlib
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("hr_server.phrases")
+
+phrase_cache_dir = os.getenv("PHRASE_CACHE_DIR", "cache/phrases")
+phrase_tts = os.getenv("PHRASE_TTS", "deepgram")
+phrase_voice = os.getenv("PHRASE_VOICE", "aura-asteria-en")
+
+SAMPLE_RATE = 8000
+# Clips are sent to Twilio in 20 ms media frames, like the inbound audio
+FRAME_BYTES = 160
+
+PLAYS = REGISTRY.counter("voice_phrase_clips_total", "Fixed phrases requested from the clip cache", ("phrase", "result"))
+
+Synthesizer = Callable[[str], bytes]
+
+
+def phrase_key(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:20]
+
+
+def linear_to_mulaw(sample: int) -> int:
+    """G.711 mu-law encoding of one 16-bit PCM sample."""
+    sign = 0x80 if sample < 0 else 0
+    magnitude = min(abs(sample), 32635) + 0x84
+    exponent = 7
+    mask = 0x4000
+    while exponent > 0 and not magnitude & mask:
+        exponent -= 1
+        mask >>= 1
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+class DeepgramTTS:
+    """Deepgram Aura over REST, asked for raw 8 kHz mu-law like the agent's own output."""
+
+    url = "https://api.deepgram.com/v1/speak"
+
+    def __init__(self, voice: str = phrase_voice, timeout: float = 30):
+        load_dotenv()
+        self.voice = voice
+        self.timeout = timeout
+        self.api_key = os.getenv("DEEPGRAM_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("Missing required environment variable: DEEPGRAM_API_KEY")
+
+    def __call__(self, text: str) -> bytes:
+        import requests
+
+        response = requests.post(
+            self.url,
+            params={"model": self.voice, "encoding": "mulaw", "sample_rate": SAMPLE_RATE, "container": "none"},
+            headers={"Authorization": f"Token {self.api_key}", "Content-Type": "application/json"},
+            json={"text": text},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.content
+
+
+class ToneTTS:
+    """
+    Local stand-in with no network: a short tone per word, paced like speech.
+
+    Durations track the text's length, which is all offline runs and timing
+    checks need.
+    """
+
+    voice = "tone"
+
+    def __init__(self, frequency: int = 400, seconds_per_char: float = 0.06):
+        period = SAMPLE_RATE // frequency
+        self._cycle = bytes(
+            linear_to_mulaw(int(6000 * math.sin(2 * math.pi * i / period))) for i in range(period)
+        )
+        self.seconds_per_char = seconds_per_char
+
+    def __call__(self, text: str) -> bytes:
+        audio = bytearray()
+        gap = b"\xff" * int(SAMPLE_RATE * 0.05)
+        for word in text.split():
+            samples = int(SAMPLE_RATE * self.seconds_per_char * (len(word) + 1))
+            audio.extend((self._cycle * (samples // len(self._cycle) + 1))[:samples])
+            audio.extend(gap)
+        return bytes(audio)
+
+
+TTS_SOURCES = {"deepgram": DeepgramTTS, "tone": ToneTTS}
+
+
+class PhraseCache:
+    """Clips by phrase text, held in memory once loaded."""
+
+    def __init__(self, directory: str = phrase_cache_dir):
+        self.directory = directory
+        self._clips: Dict[str, bytes] = {}
+        self.manifest: Dict[str, Dict] = {}
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def load(self):
+        """Read the manifest and every clip it lists; a missing cache is empty."""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        except ValueError as e:
+            logger.error(f"Unreadable phrase cache manifest {self.manifest_path}: {str(e)}")
+            manifest = {}
+        clips = {}
+        for key in manifest:
+            try:
+                with open(os.path.join(self.directory, f"{key}.ulaw"), "rb") as f:
+                    clips[key] = f.read()
+            except OSError as e:
+                logger.error(f"Missing phrase clip {key}: {str(e)}")
+        self.manifest = manifest
+        self._clips = clips
+        if clips:
+            logger.info(f"Loaded {len(clips)} phrase clips from {self.directory}")
+
+    def get(self, text: str, phrase: str = "other") -> Optional[bytes]:
+        clip = self._clips.get(phrase_key(text))
+        PLAYS.inc(phrase=phrase, result="hit" if clip is not None else "miss")
+        return clip
+
+    def build(self, phrases: Iterable[str], synthesize: Synthesizer, voice: str, force: bool = False) -> List[Dict]:
+        """Synthesize phrases missing from the cache (or all with ``force``) and rewrite the manifest."""
+        os.makedirs(self.directory, exist_ok=True)
+        built = []
+        for text in dict.fromkeys(phrases):
+            key = phrase_key(text)
+            entry = self.manifest.get(key)
+            if entry and entry.get("voice") == voice and not force:
+                continue
+            audio = synthesize(text)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, os.path.join(self.directory, f"{key}.ulaw"))
+            entry = {
+                "text": text,
+                "voice": voice,
+                "seconds": round(len(audio) / SAMPLE_RATE, 3),
+                "built_at": datetime.now().isoformat(),
+            }
+            self.manifest[key] = entry
+            self._clips[key] = audio
+            built.append(entry)
+            logger.info(f"Built phrase clip {key} ({entry['seconds']}s): {text}")
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        return built
+
+
+def clip_seconds(clip: bytes) -> float:
+    return len(clip) / SAMPLE_RATE
+
+
+_phrase_cache: Optional[PhraseCache] = None
+
+
+def get_phrase_cache() -> PhraseCache:
+    """Return the process-wide phrase cache, loading it on first use."""
+    global _phrase_cache
+    if _phrase_cache is None:
+        _phrase_cache = PhraseCache()
+        _phrase_cache.load()
+    return _phrase_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build", "list"])
+    parser.add_argument("--dir", default=phrase_cache_dir, help="Cache directory")
+    parser.add_argument("--tts", choices=sorted(TTS_SOURCES), default=phrase_tts)
+    parser.add_argument("--voice", default=phrase_voice, help="Deepgram Aura voice")
+    parser.add_argument("--phrase", action="append", default=[], help="Extra phrase to render (repeatable)")
+    parser.add_argument("--force", action="store_true", help="Re-render phrases already in the cache")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    cache = PhraseCache(args.dir)
+    cache.load()
+    if args.command == "build":
+        # The phrases are defined next to the functions that speak them
+        from server import fixed_phrases
+
+        synthesize = DeepgramTTS(args.voice) if args.tts == "deepgram" else ToneTTS()
+        built = cache.build(fixed_phrases() + args.phrase, synthesize, getattr(synthesize, "voice", args.tts), args.force)
+        print(f"Built {len(built)} clips, {len(cache.manifest)} in {args.dir}")
+    else:
+        for key, entry in sorted(cache.manifest.items(), key=lambda item: item[1]["text"]):
+            print(f"{key}  {entry['seconds']:>6.2f}s  {entry['voice']:<16} {entry['text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import os
+import time
+import struct
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("hr_server.recorder")
+
+# Directory for call recordings; recording is off when unset
+recordings_dir = os.getenv("RECORDINGS_DIR", "")
+# Chunks waiting for the writer thread, across all calls, before new ones are dropped
+recording_queue_limit = int(os.getenv("RECORDING_QUEUE_LIMIT", "5000"))
+writer_poll_interval = 0.02
+
+SAMPLE_RATE = 8000
+CHANNELS = 2
+WAVE_FORMAT_MULAW = 7
+MULAW_SILENCE = b"\xff"
+
+RECORDING_DROPPED = REGISTRY.counter(
+    "voice_recording_dropped_chunks_total",
+    "Audio chunks left out of recordings because the writer queue was full",
+    ("direction",),
+)
+
+
+def wav_header(data_bytes: int) -> bytes:
+    """RIFF header for 8 kHz, 8-bit stereo mu-law audio with ``data_bytes`` of samples."""
+    fmt = struct.pack(
+        "<HHIIHHH", WAVE_FORMAT_MULAW, CHANNELS, SAMPLE_RATE, SAMPLE_RATE * CHANNELS, CHANNELS, 8, 0
+    )
+    return b"".join([
+        b"RIFF", struct.pack("<I", 4 + (8 + len(fmt)) + 12 + 8 + data_bytes), b"WAVE",
+        b"fmt ", struct.pack("<I", len(fmt)), fmt,
+        # Non-PCM formats carry a fact chunk with the number of sample frames
+        b"fact", struct.pack("<II", 4, data_bytes // CHANNELS),
+        b"data", struct.pack("<I", data_bytes),
+    ])
+
+
+class RecordingWriter:
+    """
+    One background thread that writes the recordings of every call in the process.
+
+    The event loop hands chunks over by appending to a deque, which needs no lock
+    and never blocks; the thread polls it. When ``limit`` chunks are waiting
+    (a slow disk), new audio is dropped and counted instead of queued.
+    """
+
+    def __init__(self, limit: int = recording_queue_limit):
+        self.limit = limit
+        self.queue = deque()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="call-recorder", daemon=True)
+        self._thread.start()
+
+    def put(self, recorder, kind: str, chunk: Optional[bytes] = None) -> bool:
+        # Control messages are never dropped, so headers always get patched
+        if chunk is not None and len(self.queue) >= self.limit:
+            return False
+        self.queue.append((recorder, kind, chunk))
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                recorder, kind, chunk = self.queue.popleft()
+            except IndexError:
+                if self._stopping:
+                    return
+                time.sleep(writer_poll_interval)
+                continue
+            try:
+                recorder.handle(kind, chunk)
+            except Exception as e:
+                recorder.failed = True
+                logger.error(f"Error writing recording {recorder.path}: {str(e)}")
+
+    def stop(self, timeout: float = 30):
+        """Write out everything queued, then stop the thread."""
+        self._stopping = True
+        self._thread.join(timeout)
+
+
+_writer: Optional[RecordingWriter] = None
+
+
+def get_writer() -> RecordingWriter:
+    global _writer
+    if _writer is None:
+        _writer = RecordingWriter()
+    return _writer
+
+
+def shutdown_writer():
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+class CallRecorder:
+    """
+    Records one call as a stereo mu-law WAV: caller on the left, agent on the right.
+
+    ``inbound``, ``outbound``, ``clear`` and ``close`` only queue work and are
+    called from the event loop; everything else runs on the writer thread.
+    Agent audio arrives faster than real time and Twilio plays it out behind
+    the caller's audio, so it is buffered and paced against inbound frames,
+    and discarded on ``clear`` the way Twilio discards it on barge-in.
+    """
+
+    def __init__(self, session, directory: str, writer: RecordingWriter):
+        self.session = session
+        self.directory = directory
+        self.writer = writer
+        self.dropped = {"in": 0, "out": 0}
+        self.path: Optional[str] = None
+        self.failed = False
+        # Writer thread state
+        self._file = None
+        self._pending_out = bytearray()
+        self._data_bytes = 0
+
+    def inbound(self, chunk: bytes):
+        self._put("in", chunk)
+
+    def outbound(self, chunk: bytes):
+        self._put("out", chunk)
+
+    def clear(self):
+        self.writer.put(self, "clear")
+
+    def close(self):
+        self.writer.put(self, "close")
+
+    def _put(self, kind: str, chunk: bytes):
+        if not self.writer.put(self, kind, chunk):
+            self.dropped[kind] += 1
+            RECORDING_DROPPED.inc(direction=kind)
+
+    def handle(self, kind: str, chunk: Optional[bytes]):
+        if kind == "close":
+            self._finish()
+        elif self.failed:
+            return
+        elif kind == "in":
+            self._write(chunk)
+        elif kind == "out":
+            self._pending_out.extend(chunk)
+        elif kind == "clear":
+            self._pending_out.clear()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        name = self.session.call_sid or f"session-{os.getpid()}-{self.session.id}"
+        self.path = os.path.join(self.directory, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.wav")
+        self._file = open(self.path, "wb")
+        self._file.write(wav_header(0))
+
+    def _write(self, inbound: bytes):
+        if self._file is None:
+            self._open()
+        size = len(inbound)
+        agent = self._pending_out[:size]
+        del self._pending_out[:size]
+        if len(agent) < size:
+            agent.extend(MULAW_SILENCE * (size - len(agent)))
+        frames = bytearray(size * CHANNELS)
+        frames[0::2] = inbound
+        frames[1::2] = agent
+        self._file.write(frames)
+        self._data_bytes += len(frames)
+
+    def _finish(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._file.write(wav_header(self._data_bytes))
+        self._file.close()
+        self._file = None
+        logger.info(
+            f"Recording saved to {self.path}: {self._data_bytes / (SAMPLE_RATE * CHANNELS):.1f}s, "
+            f"dropped chunks {self.dropped}"
+        )
+
+
+def open_recorder(session) -> Optional[CallRecorder]:
+    """A recorder for the session, or None when RECORDINGS_DIR is not set."""
+    if not recordings_dir:
+        return None
+    return CallRecorder(session, recordings_dir, get_writer())
@@ -0,0 +1,277 @@
+"""Batch scoring of completed interviews.
+
+Reads ``interview_responses`` documents from the candidates table that changed
+since the last run (a high-water mark on their timestamp), builds a scoring
+prompt from the stored skills, availability and salary answers plus the skills
+on the candidate's resume, and scores them with bounded concurrency. Results
+are cached by a hash of the prompt, so unchanged interviews are never sent
+twice, and saved once per batch to the ``scores`` table of the scoring
+database, keyed by the interview's doc_id. The candidates file is only read:
+the live server rewrites it in place, so a second writer could lose its
+updates.
+
+Usage:
+    python -m utils.scoring
+    python -m utils.scoring --concurrency 16 --limit 500
+"""
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from tinydb import TinyDB, Query
+from tinydb.table import Document
+
+from helper.config_file import load_config_file
+from utils.jobs import JobStore, normalize_name
+
+
+logger = logging.getLogger(__name__)
+
+scoring_model = os.getenv("SCORING_MODEL", "gpt-4.1-mini")
+scoring_concurrency = int(os.getenv("SCORING_CONCURRENCY", "8"))
+scoring_batch_size = int(os.getenv("SCORING_BATCH_SIZE", "200"))
+# Interviews updated more recently than this may still be in progress
+scoring_settle_seconds = float(os.getenv("SCORING_SETTLE_SECONDS", "300"))
+scoring_db_path = os.getenv("SCORING_DB_PATH", "scoring_database.json")
+hr_db_path = os.getenv("HR_DB_PATH", "hr_database.json")
+jobs_db_path = os.getenv("JOBS_DB_PATH", "jobs_database.json")
+scoring_prompt_path = "tools/Scoring.yaml"
+
+Completion = Callable[[List[Dict]], Awaitable[str]]
+
+_async_openai_client = None
+
+
+def get_async_openai_client():
+    """Create the async OpenAI client on first use."""
+    global _async_openai_client
+    if _async_openai_client is None:
+        from openai import AsyncOpenAI
+        load_dotenv()
+        _async_openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_KEY"))
+    return _async_openai_client
+
+
+async def openai_complete(messages: List[Dict]) -> str:
+    response = await get_async_openai_client().chat.completions.create(
+        model=scoring_model,
+        messages=messages,
+        temperature=0.2,
+    )
+    return response.choices[0].message.content
+
+
+def build_messages(interview: Dict, resume: Optional[Dict], prompt: Dict) -> List[Dict]:
+    """Chat messages scoring one interview."""
+    fields = {
+        "candidate_name": (interview.get("candidate_name") or "").strip() or "unknown",
+        "resume_skills": (resume or {}).get("skills") or "not available",
+        "skills_assessment": json.dumps(interview.get("skills_assessment") or {}, sort_keys=True),
+        "availability": json.dumps(interview.get("availability") or {}, sort_keys=True),
+        "salary_expectations": json.dumps(interview.get("salary_expectations") or {}, sort_keys=True),
+    }
+    return [
+        {"role": "system", "content": prompt["system_message"]},
+        {"role": "user", "content": prompt["user_message"].format(**fields)},
+    ]
+
+
+def content_hash(messages: List[Dict]) -> str:
+    payload = json.dumps({"model": scoring_model, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_score(raw: str) -> Dict:
+    """Parse the model's JSON answer, tolerating code fences."""
+    text = raw.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("{"):] if "{" in text else text
+    result = json.loads(text)
+    if not isinstance(result, dict) or "score" not in result:
+        raise ValueError("Scoring response has no score")
+    return result
+
+
+class ScoringState:
+    """High-water mark, score cache and scores, kept in their own TinyDB file."""
+
+    def __init__(self, path: str = scoring_db_path):
+        self._db = TinyDB(path)
+        self._state = self._db.table("state")
+        self._cache = self._db.table("cache")
+        self._scores = self._db.table("scores")
+
+    def high_water_mark(self) -> str:
+        doc = self._state.get(Query().key == "high_water_mark")
+        return doc["value"] if doc else ""
+
+    def set_high_water_mark(self, value: str):
+        self._state.upsert({"key": "high_water_mark", "value": value}, Query().key == "high_water_mark")
+
+    def load_cache(self) -> Dict[str, Dict]:
+        return {doc["hash"]: doc["score"] for doc in self._cache.all()}
+
+    def add_to_cache(self, entries: Dict[str, Dict]):
+        if entries:
+            self._cache.insert_multiple({"hash": h, "score": score} for h, score in entries.items())
+
+    def save_scores(self, scores: Dict[int, Dict]):
+        """Store scores by candidates-table doc_id, replacing earlier scores of the same interviews."""
+        if not scores:
+            return
+        stored = {doc.doc_id for doc in self._scores.all()}
+        rescored = [doc_id for doc_id in scores if doc_id in stored]
+        if rescored:
+            self._scores.remove(doc_ids=rescored)
+        self._scores.insert_multiple(Document(score, doc_id=doc_id) for doc_id, score in scores.items())
+
+    def scores(self) -> Dict[int, Dict]:
+        return {doc.doc_id: dict(doc) for doc in self._scores.all()}
+
+    def close(self):
+        self._db.close()
+
+
+class ScoringPipeline:
+    """
+    Scores interviews in timestamp order, ``batch_size`` at a time.
+
+    ``complete(messages)`` returns the model's text; it defaults to OpenAI and
+    is replaced by a mock in benchmarks. The high-water mark only moves past
+    interviews that were scored, so failures are retried on the next run.
+    """
+
+    def __init__(
+        self,
+        candidates_table,
+        resumes: List[Dict],
+        state: ScoringState,
+        complete: Completion = openai_complete,
+        concurrency: int = scoring_concurrency,
+        batch_size: int = scoring_batch_size,
+        settle_seconds: float = scoring_settle_seconds,
+    ):
+        self.candidates = candidates_table
+        self.resumes = {resume["name_key"]: resume for resume in resumes if resume.get("name_key")}
+        self.state = state
+        self.complete = complete
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self.prompt = load_config_file(scoring_prompt_path)["prompt"]
+        self.cache = state.load_cache()
+        # Requests in progress by prompt hash, so identical interviews share one call
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {"scored": 0, "cached": 0, "failed": 0, "llm_calls": 0}
+
+    def pending(self) -> List:
+        """Interviews changed since the high-water mark that have settled."""
+        since = self.state.high_water_mark()
+        until = (datetime.now() - timedelta(seconds=self.settle_seconds)).isoformat()
+        Candidate = Query()
+        docs = self.candidates.search(
+            (Candidate.type == "interview_responses")
+            & Candidate.timestamp.test(lambda ts: since < (ts or "") <= until)
+        )
+        return sorted(docs, key=lambda doc: doc["timestamp"])
+
+    async def _score(self, doc, semaphore: asyncio.Semaphore, new_cache: Dict[str, Dict]) -> Optional[Dict]:
+        resume = self.resumes.get(normalize_name(doc.get("candidate_name")))
+        messages = build_messages(doc, resume, self.prompt)
+        digest = content_hash(messages)
+        score = self.cache.get(digest)
+        if score is None and digest in self._in_flight:
+            score = await self._in_flight[digest]
+            if score is None:
+                self.stats["failed"] += 1
+                return None
+        if score is not None:
+            self.stats["cached"] += 1
+        else:
+            future = self._in_flight[digest] = asyncio.get_running_loop().create_future()
+            try:
+                async with semaphore:
+                    self.stats["llm_calls"] += 1
+                    score = parse_score(await self.complete(messages))
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Scoring failed for doc_id {doc.doc_id}: {str(e)}")
+                return None
+            finally:
+                future.set_result(score)
+                del self._in_flight[digest]
+            self.cache[digest] = score
+            new_cache[digest] = score
+        self.stats["scored"] += 1
+        return {
+            "score": score,
+            "score_hash": digest,
+            "scored_at": datetime.now().isoformat(),
+            "resume_matched": resume is not None,
+        }
+
+    async def run(self, limit: Optional[int] = None) -> Dict:
+        docs = self.pending()
+        if limit is not None:
+            docs = docs[:limit]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for start in range(0, len(docs), self.batch_size):
+            batch = docs[start:start + self.batch_size]
+            new_cache: Dict[str, Dict] = {}
+            results = await asyncio.gather(*(self._score(doc, semaphore, new_cache) for doc in batch))
+            self.state.save_scores({doc.doc_id: result for doc, result in zip(batch, results) if result})
+            self.state.add_to_cache(new_cache)
+
+            # Advance up to the first failure so it is retried next time
+            mark = None
+            for doc, result in zip(batch, results):
+                if result is None:
+                    break
+                mark = doc["timestamp"]
+            if mark:
+                self.state.set_high_water_mark(mark)
+            if any(result is None for result in results):
+                logger.warning("Stopping at the first failed interview; it will be retried on the next run")
+                break
+            logger.info(f"Scored {start + len(batch)}/{len(docs)} interviews")
+        return dict(self.stats, pending=len(docs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, help="Score at most this many interviews")
+    parser.add_argument("--concurrency", type=int, default=scoring_concurrency)
+    parser.add_argument("--batch-size", type=int, default=scoring_batch_size)
+    parser.add_argument("--settle-seconds", type=float, default=scoring_settle_seconds)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # Read-only: the voice server owns this file
+    db = TinyDB(hr_db_path, access_mode="r")
+    jobs = JobStore(jobs_db_path)
+    state = ScoringState()
+    try:
+        pipeline = ScoringPipeline(
+            db.table("candidates"),
+            jobs.resumes(),
+            state,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            settle_seconds=args.settle_seconds,
+        )
+        print(json.dumps(asyncio.run(pipeline.run(args.limit)), indent=2))
+    finally:
+        state.close()
+        jobs.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Capture of a call's full message stream for offline replay.
+
+With ``SESSION_CAPTURE_DIR`` set, ``twilio_handler`` wraps both websockets and
+appends every message, in both directions, to a ``.vsr`` file through the
+recording writer thread. ``benchmarks/replay_session.py`` replays the files.
+
+File layout (little endian)::
+
+    b"VSR1" | uint32 header length | JSON header
+    record*: uint8 kind | uint64 offset in microseconds | uint32 length | payload
+
+Offsets are from the start of the handler. Twilio media events, the bulk of
+a call, are stored as raw mu-law payloads and rebuilt on replay; everything
+else is stored as sent. The last record is ``END`` with a JSON trailer.
+"""
+import os
+import json
+import time
+import base64
+import struct
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+from utils.recorder import get_writer
+
+
+logger = logging.getLogger("hr_server.capture")
+
+# Directory for session captures; capture is off when unset
+session_capture_dir = os.getenv("SESSION_CAPTURE_DIR", "")
+
+MAGIC = b"VSR1"
+RECORD = struct.Struct("<BQI")
+
+# Record kinds
+TWILIO_IN = 1
+TWILIO_IN_MEDIA = 2
+TWILIO_OUT = 3
+TWILIO_OUT_MEDIA = 4
+AGENT_IN = 5
+AGENT_IN_BINARY = 6
+AGENT_OUT = 7
+AGENT_OUT_BINARY = 8
+TWILIO_CLOSED = 9
+AGENT_CONNECTED = 10
+END = 255
+
+
+def compact_twilio(message: str, media_kind: int, text_kind: int) -> Tuple[int, bytes]:
+    """Store media events as their decoded payload, other events as JSON text."""
+    try:
+        data = json.loads(message)
+    except (TypeError, ValueError):
+        return text_kind, message.encode() if isinstance(message, str) else message
+    if data.get("event") == "media" and "payload" in data.get("media", {}):
+        return media_kind, base64.b64decode(data["media"]["payload"])
+    return text_kind, message.encode()
+
+
+class CapturedSocket:
+    """Websocket proxy that records what passes through it."""
+
+    def __init__(self, ws, capture: "SessionCapture", side: str):
+        self._ws = ws
+        self._capture = capture
+        self._side = side
+
+    def __getattr__(self, name):
+        return getattr(self._ws, name)
+
+    def _record_in(self, message):
+        if self._side == "twilio":
+            self._capture.record(*compact_twilio(message, TWILIO_IN_MEDIA, TWILIO_IN))
+        elif isinstance(message, bytes):
+            self._capture.record(AGENT_IN_BINARY, message)
+        else:
+            self._capture.record(AGENT_IN, message.encode())
+
+    def _record_out(self, message):
+        if self._side == "twilio":
+            self._capture.record(*compact_twilio(message, TWILIO_OUT_MEDIA, TWILIO_OUT))
+        elif isinstance(message, (bytes, bytearray)):
+            self._capture.record(AGENT_OUT_BINARY, bytes(message))
+        else:
+            self._capture.record(AGENT_OUT, message.encode())
+
+    async def __aiter__(self):
+        async for message in self._ws:
+            self._record_in(message)
+            yield message
+
+    async def recv(self):
+        message = await self._ws.recv()
+        self._record_in(message)
+        return message
+
+    async def send(self, message):
+        self._record_out(message)
+        await self._ws.send(message)
+
+    async def close(self, *args, **kwargs):
+        if self._side == "twilio":
+            self._capture.record(TWILIO_CLOSED, b"")
+        await self._ws.close(*args, **kwargs)
+
+
+class _CapturedConnection:
+    def __init__(self, connection, capture: "SessionCapture"):
+        self._connection = connection
+        self._capture = capture
+
+    async def __aenter__(self):
+        ws = await self._connection.__aenter__()
+        self._capture.record(AGENT_CONNECTED, b"")
+        return CapturedSocket(ws, self._capture, "agent")
+
+    async def __aexit__(self, *exc):
+        return await self._connection.__aexit__(*exc)
+
+
+class SessionCapture:
+    """
+    Capture of one session. ``record`` runs on the event loop and only queues
+    a packed record; the file is written by the recording writer thread.
+    """
+
+    def __init__(self, session, directory: str, writer=None):
+        self.session = session
+        self.directory = directory
+        self.writer = writer or get_writer()
+        self.started = time.monotonic()
+        self.started_wall = datetime.now().isoformat()
+        self.dropped = 0
+        self.path: Optional[str] = None
+        self.failed = False
+        self._file = None
+
+    def wrap_twilio(self, twilio_ws) -> CapturedSocket:
+        return CapturedSocket(twilio_ws, self, "twilio")
+
+    def wrap_connector(self, connector):
+        return lambda: _CapturedConnection(connector(), self)
+
+    def record(self, kind: int, payload: bytes):
+        offset = int((time.monotonic() - self.started) * 1_000_000)
+        if not self.writer.put(self, "record", RECORD.pack(kind, offset, len(payload)) + payload):
+            self.dropped += 1
+
+    def close(self):
+        self.writer.put(self, "close")
+
+    def handle(self, kind: str, chunk: Optional[bytes]):
+        """Writer thread side."""
+        if kind == "close":
+            self._finish()
+        elif not self.failed:
+            if self._file is None:
+                self._open()
+            self._file.write(chunk)
+
+    def _header(self) -> bytes:
+        header = json.dumps({"version": 1, "started_at": self.started_wall, "pid": os.getpid()}).encode()
+        return MAGIC + struct.pack("<I", len(header)) + header
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(
+            self.directory, f"session-{os.getpid()}-{self.session.id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.vsr"
+        )
+        self._file = open(self.path, "wb")
+        self._file.write(self._header())
+
+    def _finish(self):
+        if self._file is None:
+            return
+        trailer = json.dumps({
+            "call_sid": self.session.call_sid,
+            "stream_sid": self.session.stream_sid,
+            "dropped_records": self.dropped,
+        }).encode()
+        offset = int((time.monotonic() - self.started) * 1_000_000)
+        self._file.write(RECORD.pack(END, offset, len(trailer)) + trailer)
+        self._file.close()
+        self._file = None
+        # The call SID is only known after the first records, so name the file at the end
+        if self.session.call_sid:
+            final_path = os.path.join(self.directory, f"{self.session.call_sid}-{os.path.basename(self.path)[8:]}")
+            os.replace(self.path, final_path)
+            self.path = final_path
+        logger.info(f"Session capture saved to {self.path}, dropped records {self.dropped}")
+
+
+def open_capture(session) -> Optional[SessionCapture]:
+    """A capture for the session, or None when SESSION_CAPTURE_DIR is not set."""
+    if not session_capture_dir:
+        return None
+    return SessionCapture(session, session_capture_dir)
+
+
+def read_capture(path: str) -> Tuple[Dict, Iterator[Tuple[int, float, bytes]]]:
+    """Header of a capture file and an iterator of (kind, offset seconds, payload)."""
+    handle = open(path, "rb")
+    if handle.read(4) != MAGIC:
+        handle.close()
+        raise ValueError(f"{path} is not a session capture")
+    (length,) = struct.unpack("<I", handle.read(4))
+    header = json.loads(handle.read(length))
+
+    def records():
+        with handle:
+            while True:
+                head = handle.read(RECORD.size)
+                if len(head) < RECORD.size:
+                    return
+                kind, offset, length = RECORD.unpack(head)
+                yield kind, offset / 1_000_000, handle.read(length)
+
+    return header, records()
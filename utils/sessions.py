@@ -0,0 +1,95 @@
+import time
+import asyncio
+import itertools
+import logging
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger("hr_server.sessions")
+
+
+class Session:
+    """State for one live Twilio media stream handled by this process."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(Session._ids)
+        self.call_sid: Optional[str] = None
+        self.stream_sid: Optional[str] = None
+        self.opened_at = time.monotonic()
+        self.opened_wall = time.time()
+        # Conversation turns and interview responses, persisted at hangup
+        self.transcript: List[Dict] = []
+        self.interview: Optional[Dict] = None
+        # Set from the start event: caller ID of inbound calls and the candidate it matched
+        self.direction = "outbound"
+        self.caller: Optional[str] = None
+        self.candidate: Optional[Dict] = None
+        # The Twilio websocket, so the call can be ended from outside its tasks
+        self.websocket = None
+        # Per-call queues by name, for diagnostics
+        self.queues: Dict[str, asyncio.Queue] = {}
+
+    def started(self, call_sid: Optional[str], stream_sid: Optional[str]):
+        self.call_sid = call_sid
+        self.stream_sid = stream_sid
+
+    def hangup(self):
+        """Close the Twilio stream; the call's tasks wind down as on a normal hangup."""
+        if self.websocket is not None:
+            asyncio.ensure_future(self.websocket.close())
+
+    def add_turn(self, role: Optional[str], content: str):
+        self.transcript.append({
+            "role": role or "unknown",
+            "content": content,
+            "offset_seconds": round(time.monotonic() - self.opened_at, 2),
+        })
+
+    def record_interview(self, params: Dict, result: Dict):
+        """Merge the responses passed to store_skills_experience, like the stored document."""
+        if self.interview is None:
+            self.interview = {"skills_assessment": {}, "availability": {}, "salary_expectations": {}}
+        for field in ("skills_assessment", "availability", "salary_expectations"):
+            self.interview[field].update(params.get(field) or {})
+        if result.get("doc_id") is not None:
+            self.interview["doc_id"] = result["doc_id"]
+
+    def describe(self) -> Dict:
+        return {
+            "id": self.id,
+            "call_sid": self.call_sid,
+            "stream_sid": self.stream_sid,
+            "direction": self.direction,
+            "age_seconds": round(time.monotonic() - self.opened_at, 3),
+        }
+
+
+class SessionRegistry:
+    """Live sessions of this worker. Only touched from the event loop thread."""
+
+    def __init__(self):
+        self._sessions: Dict[int, Session] = {}
+        self.draining = False
+
+    def add(self, session: Session):
+        self._sessions[session.id] = session
+
+    def remove(self, session: Session):
+        self._sessions.pop(session.id, None)
+
+    def by_call_sid(self, call_sid: str) -> Optional[Session]:
+        for session in self._sessions.values():
+            if session.call_sid == call_sid:
+                return session
+        return None
+
+    def sessions(self) -> List[Session]:
+        return list(self._sessions.values())
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+registry = SessionRegistry()
@@ -1,20 +1,21 @@
-from google.cloud import storage as gcs_storage
 from dotenv import load_dotenv
 import os 
-import trieve_py_client
-from trieve_py_client.models.upload_file_req_payload import UploadFileReqPayload
-from trieve_py_client.models.upload_file_response_body import UploadFileResponseBody
-from trieve_py_client.rest import ApiException
-from pprint import pprint
 import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 import io
+import json
 import base64
+import tempfile
+import asyncio
 import requests
 from pydantic import BaseModel, Field
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from utils.info_extraction import extracting_number
+from utils.pdf_markdown import markdown_for_pdf, shutdown_pool
+from utils.jobs import JobManager, JobStore, TERMINAL_STATUSES
+from utils.health import HealthMonitor, health_check_interval, openai_check, trieve_check
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -38,6 +39,18 @@ class ProcessResponse(BaseModel):
     status: str = Field(..., description="Status of the processing")
     message: str = Field(..., description="Message describing the result")
     processed_files: Optional[List[Dict]] = Field(default=None, description="List of processed files")
+    job_id: Optional[str] = Field(default=None, description="ID of the background ingestion job")
+
+class JobStatusResponse(BaseModel):
+    """Schema for ingestion job status."""
+    job_id: str = Field(..., description="ID of the ingestion job")
+    status: str = Field(..., description="queued, running, completed, failed or cancelled")
+    message: str = Field(default="", description="Final or error message")
+    total: Optional[int] = Field(default=None, description="Number of files found in the folder")
+    processed: int = Field(default=0, description="Number of files processed so far")
+    processed_files: List[Dict] = Field(default_factory=list, description="Per-file results so far")
+    created_at: str
+    updated_at: str
 
 logging.basicConfig(
     level=logging.INFO,
@@ -55,12 +68,97 @@ config_file = os.getenv("CONFIG_FILE", "fir-47b23-firebase-adminsdk-j70zf-cfe3ad
 bucket_name = os.getenv("BUCKET", "fir-47b23.appspot.com")
 trieve_api_key = os.getenv("TRIEVE_API_KEY")
 trieve_dataset = os.getenv("TRIEVE_API_URL")
+trieve_host = "https://api.trieve.ai"
+
+# Streaming upload limits (bytes)
+max_pdf_bytes = int(os.getenv("MAX_PDF_BYTES", str(20 * 1024 * 1024)))
+spool_max_memory = int(os.getenv("SPOOL_MAX_MEMORY", str(1024 * 1024)))
+local_pdf_conversion = os.getenv("LOCAL_PDF_CONVERSION", "true").lower() == "true"
+# Must be a multiple of 3 so independently encoded base64 chunks concatenate cleanly
+stream_chunk_size = 3 * 64 * 1024
+
+# Background ingestion jobs
+jobs_db_path = os.getenv("JOBS_DB_PATH", "jobs_database.json")
+ingest_workers = int(os.getenv("INGEST_WORKERS", "2"))
+job_events_poll_interval = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", "0.5"))
+
+
+class FileTooLargeError(Exception):
+    """Raised when a blob exceeds the configured per-file size cap."""
+
+
+def download_blob_to_spool(blob, max_bytes: int = max_pdf_bytes) -> tempfile.SpooledTemporaryFile:
+    """Stream a blob into a spooled temp file, enforcing the per-file size cap."""
+    blob.reload()
+    if blob.size is not None and blob.size > max_bytes:
+        raise FileTooLargeError(f"{blob.name} is {blob.size} bytes, limit is {max_bytes}")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_memory)
+    total = 0
+    try:
+        with blob.open("rb", chunk_size=stream_chunk_size) as reader:
+            while True:
+                chunk = reader.read(stream_chunk_size)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise FileTooLargeError(f"{blob.name} exceeded {max_bytes} bytes while downloading")
+                spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iter_base64_chunks(fileobj, chunk_size: int = stream_chunk_size) -> Iterator[bytes]:
+    """Yield the base64 encoding of a file object one chunk at a time."""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield base64.b64encode(chunk)
+
+
+def iter_upload_body(fileobj, fields: Dict) -> Iterator[bytes]:
+    """Yield a Trieve upload JSON body with the base64 file streamed into it."""
+    rest = json.dumps(fields).encode("utf-8")
+    yield b'{"base64_file": "'
+    yield from iter_base64_chunks(fileobj)
+    yield b'"' if rest == b"{}" else b'", ' + rest[1:-1]
+    yield b"}"
+
+
+def upload_file_streaming(fileobj, fields: Dict) -> requests.Response:
+    """Upload a file to Trieve without holding the encoded payload in memory."""
+    headers = {
+        "Authorization": f"Bearer {trieve_api_key}",
+        "TR-Dataset": trieve_dataset,
+        "Content-Type": "application/json",
+    }
+    response = requests.post(
+        f"{trieve_host}/api/file",
+        data=iter_upload_body(fileobj, fields),
+        headers=headers,
+    )
+    response.raise_for_status()
+    return response
+
+_gcs_client = None
+
+def get_bucket():
+    """Return the configured bucket, creating the GCS client on first use."""
+    global _gcs_client
+    if _gcs_client is None:
+        from google.cloud import storage as gcs_storage
+        _gcs_client = gcs_storage.Client.from_service_account_json(config_file)
+    return _gcs_client.bucket(bucket_name)
 
 def verify_bucket_access():
     """Verify that we can access the bucket."""
     try:
-        gcs_client = gcs_storage.Client.from_service_account_json(config_file)
-        bucket = gcs_client.bucket(bucket_name)
+        bucket = get_bucket()
         
         if not bucket.exists():
             logger.error(f"Bucket {bucket_name} does not exist")
@@ -73,21 +171,41 @@ def verify_bucket_access():
         logger.error(f"Failed to verify bucket access: {str(e)}")
         return False
 
-def bucket_docs(query: PDF_ID):
-    """Process documents in the specified folder."""
+health_monitor = HealthMonitor({
+    "gcs": verify_bucket_access,
+    "trieve": trieve_check(),
+    "openai": openai_check(),
+})
+
+def bucket_docs(
+    query: PDF_ID,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    skip: Optional[set] = None,
+):
+    """
+    Process documents in the specified folder.
+
+    Args:
+        query: Folder to process
+        on_progress: Called with {"event": "listed", "total": n} and then
+            {"event": "file", "result": {...}} after each file
+        should_cancel: Checked before each file; processing stops when it returns True
+        skip: Blob names that were already processed and should not be redone
+    """
     try:
         if not query.ID:
             return {"status": "error", "message": "No folder path provided"}
 
-        if not verify_bucket_access():
+        # Trust only a recent success; a cached failure may be stale, so check again
+        if not health_monitor.is_healthy("gcs", max_age=2 * health_check_interval) and not verify_bucket_access():
             return {"status": "error", "message": f"Cannot access bucket: {bucket_name}"}
 
         prefix = query.ID.lstrip('/').replace('\\', '/')
         logger.info(f"Searching for files with prefix: {prefix}")
         
         try:
-            gcs_client = gcs_storage.Client.from_service_account_json(config_file)
-            bucket = gcs_client.bucket(bucket_name)
+            bucket = get_bucket()
         except Exception as e:
             logger.error(f"Failed to initialize GCS client: {str(e)}")
             return {"status": "error", "message": f"GCS initialization failed: {str(e)}"}
@@ -96,15 +214,20 @@ def bucket_docs(query: PDF_ID):
             blobs = bucket.list_blobs(prefix=prefix)
             result = []
             
-            blob_list = list(blobs)
+            blob_list = [blob for blob in blobs if not blob.name.endswith('/')]
             if not blob_list:
                 logger.warning(f"No files found in path: {prefix}")
                 return {"status": "warning", "message": f"No files found in path: {prefix}"}
+            if on_progress:
+                on_progress({"event": "listed", "total": len(blob_list)})
 
             for blob in blob_list:
-                if blob.name.endswith('/'):
+                if should_cancel and should_cancel():
+                    logger.info(f"Processing of {prefix} cancelled")
+                    break
+                if skip and blob.name in skip:
                     continue
-                    
+
                 logger.info(f"Processing file: {blob.name}")
                 sub_query = PDF_ID(ID=blob.name)
                 
@@ -116,7 +239,9 @@ def bucket_docs(query: PDF_ID):
                     logger.error(f"Error processing {blob.name}: {str(e)}")
                     result_obj = {"image": blob.name, "status": "error", "message": str(e)}
                     result.append(result_obj)
-            
+                if on_progress:
+                    on_progress({"event": "file", "result": result_obj})
+
             return result
 
         except Exception as e:
@@ -130,112 +255,237 @@ def bucket_docs(query: PDF_ID):
 def pdf_extraction(pdf_id) -> Dict:
     """Process individual PDF file and upload to Trieve."""
     try:
-        gcs_client = gcs_storage.Client.from_service_account_json(config_file)
-        bucket = gcs_client.bucket(bucket_name)
+        bucket = get_bucket()
         blob = bucket.blob(pdf_id.ID)
 
         if not blob.exists():
             logger.error(f"File not found: {pdf_id.ID}")
             return {"status": "error", "message": f"File not found: {pdf_id.ID}"}
 
-        image_bytes = io.BytesIO()
-        blob.download_to_file(image_bytes)
-        image_bytes.seek(0)
+        try:
+            pdf_file = download_blob_to_spool(blob)
+        except FileTooLargeError as e:
+            logger.error(f"Skipping oversized file: {str(e)}")
+            return {"status": "error", "message": str(e)}
         logger.info(f"Doc {pdf_id.ID} is being processed")
 
-        try:
-            encoded_string = base64.b64encode(image_bytes.getvalue())
-            decoded_str = encoded_string.decode('utf-8')
-        except Exception as e:
-            logger.error(f"Error encoding file: {str(e)}")
-            return {"status": "error", "message": f"File encoding failed: {str(e)}"}
+        with pdf_file:
+            conversion = None
+            if local_pdf_conversion:
+                try:
+                    conversion = markdown_for_pdf(pdf_file)
+                except Exception as e:
+                    logger.error(f"Local conversion failed for {pdf_id.ID}, using remote OCR: {str(e)}")
 
-        configuration = trieve_py_client.Configuration(
-            host="https://api.trieve.ai"
-        )
-        configuration.api_key['ApiKey'] = trieve_api_key
-        configuration.api_key_prefix['ApiKey'] = 'Bearer'
+            resume_data = None
+            if conversion and conversion["needs_ocr"]:
+                # The markdown lacks the scanned pages, which may hold the name or phone number
+                logger.info(f"Not extracting resume data from {pdf_id.ID}: some pages need OCR")
+            elif conversion and conversion["markdown"].strip():
+                resume_data = parse_resume_data(extracting_number(conversion["markdown"]))
 
-        try:
-            with trieve_py_client.ApiClient(configuration) as api_client:
-                api_instance = trieve_py_client.FileApi(api_client)
-                
-                upload_file_req_payload = trieve_py_client.UploadFileReqPayload(
-                    base64_file=decoded_str,
-                    file_name=f"{pdf_id.ID}.pdf",
-                    link="https://example.com",
-                    tag_set=["resume", "pdf"],
-                    time_stamp=datetime.now().isoformat(),
-                    target_splits_per_chunk=1,
-                    metadata={
-                        "source": "gcs",
-                        "bucket": bucket_name
-                    },
-                    pdf2md_options={
-                        "use_pdf2md_ocr": True
-                    }
-                )
-
-                api_response = api_instance.upload_file_handler(trieve_dataset, upload_file_req_payload)
+            fields = {
+                "file_name": f"{pdf_id.ID}.pdf",
+                "link": "https://example.com",
+                "tag_set": ["resume", "pdf"],
+                "time_stamp": datetime.now().isoformat(),
+                "target_splits_per_chunk": 1,
+                "metadata": {
+                    "source": "gcs",
+                    "bucket": bucket_name
+                },
+                "pdf2md_options": {
+                    "use_pdf2md_ocr": True
+                }
+            }
+
+            try:
+                if conversion and not conversion["needs_ocr"]:
+                    # Text PDF: upload the local markdown and skip the remote OCR round trip
+                    fields["file_name"] = f"{pdf_id.ID}.md"
+                    fields["tag_set"] = ["resume", "markdown"]
+                    fields["metadata"]["content_hash"] = conversion["hash"]
+                    del fields["pdf2md_options"]
+                    upload_file_streaming(io.BytesIO(conversion["markdown"].encode("utf-8")), fields)
+                else:
+                    upload_file_streaming(pdf_file, fields)
                 logger.info(f"Successfully uploaded file to Trieve: {pdf_id.ID}")
-                return {"status": "success", "message": "File processed successfully"}
+                return {
+                    "status": "success",
+                    "message": "File processed successfully",
+                    "ocr": not conversion or conversion["needs_ocr"],
+                    "resume_data": resume_data,
+                }
 
-        except Exception as e:
-            logger.error(f"Trieve upload failed: {str(e)}")
-            return {"status": "error", "message": f"Trieve upload failed: {str(e)}"}
+            except Exception as e:
+                logger.error(f"Trieve upload failed: {str(e)}")
+                return {"status": "error", "message": f"Trieve upload failed: {str(e)}"}
 
     except Exception as e:
         logger.error(f"PDF extraction failed: {str(e)}")
         return {"status": "error", "message": str(e)}
 
-@app.post("/process-pdfs", response_model=ProcessResponse)
+def parse_resume_data(raw) -> Optional[Dict]:
+    """Parse the JSON returned by extracting_number, tolerating code fences and errors."""
+    if isinstance(raw, dict):
+        logger.error(f"Resume extraction failed: {raw.get('message')}")
+        return None
+    text = raw.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("{"):] if "{" in text else text
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        logger.error(f"Could not parse extracted resume data: {str(e)}")
+        return None
+
+_job_manager: Optional[JobManager] = None
+
+def get_job_manager() -> JobManager:
+    """Return the ingestion job manager, creating it on first use."""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(JobStore(jobs_db_path), run_ingest_job, max_workers=ingest_workers)
+    return _job_manager
+
+def run_ingest_job(job: Dict, on_progress: Callable, should_cancel: Callable):
+    """Job runner: process a folder, skipping files finished before a restart."""
+    skip = {f["image"] for f in job["files"]}
+    store = get_job_manager().store
+
+    def record_progress(event: Dict):
+        result = event.get("result") or {}
+        if event.get("event") == "file" and result.get("resume_data"):
+            # Keep extracted resume fields for candidate scoring
+            try:
+                store.save_resume(result["resume_data"], result["image"])
+            except Exception as e:
+                logger.error(f"Could not save resume data for {result['image']}: {str(e)}")
+        on_progress(event)
+
+    return bucket_docs(
+        PDF_ID(ID=job["folder_path"]),
+        on_progress=record_progress,
+        should_cancel=should_cancel,
+        skip=skip,
+    )
+
+def job_status(job: Dict) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        message=job["message"],
+        total=job["total"],
+        processed=len(job["files"]),
+        processed_files=job["files"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
+
+@app.post("/process-pdfs", response_model=ProcessResponse, status_code=202)
 async def process_pdfs(request: ProcessRequest):
     """
-    Process PDF files for a given candidate.
+    Queue PDF processing for a given candidate as a background job.
     
     Args:
         request: ProcessRequest containing phone number, candidate name, and folder path
         
     Returns:
-        ProcessResponse with processing status and results
+        ProcessResponse with the job ID; poll /jobs/{job_id} for progress
     """
+    if not request.phone_number or not request.candidate_name or not request.folder_path:
+        raise HTTPException(status_code=400, detail="Missing required fields")
+
     try:
-        # Validate inputs
-        if not request.phone_number or not request.candidate_name or not request.folder_path:
-            raise HTTPException(status_code=400, detail="Missing required fields")
-
-        # Process the PDFs
-        query = PDF_ID(ID=request.folder_path)
-        result = bucket_docs(query)
-
-        # Prepare response
-        if isinstance(result, list):
-            return ProcessResponse(
-                status="success",
-                message=f"Processed {len(result)} files for candidate {request.candidate_name}",
-                processed_files=result
-            )
-        else:
-            return ProcessResponse(
-                status=result.get("status", "error"),
-                message=result.get("message", "Unknown error occurred"),
-                processed_files=None
-            )
+        job = await asyncio.to_thread(
+            get_job_manager().submit,
+            folder_path=request.folder_path,
+            candidate_name=request.candidate_name,
+            phone_number=request.phone_number,
+        )
+        return ProcessResponse(
+            status="queued",
+            message=f"Processing queued for candidate {request.candidate_name}",
+            job_id=job["job_id"]
+        )
 
     except Exception as e:
         logger.error(f"API error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Return the status and per-file results of an ingestion job."""
+    job = await asyncio.to_thread(get_job_manager().store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_status(job)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream per-file progress as newline-delimited JSON until the job finishes."""
+    store = get_job_manager().store
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        sent = 0
+        while True:
+            job = await asyncio.to_thread(store.get, job_id)
+            for file_result in job["files"][sent:]:
+                yield json.dumps({"event": "file", **file_result}) + "\n"
+            sent = len(job["files"])
+            if job["status"] in TERMINAL_STATUSES:
+                yield json.dumps({"event": "status", "status": job["status"], "message": job["message"]}) + "\n"
+                return
+            await asyncio.sleep(job_events_poll_interval)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobStatusResponse)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running ingestion job."""
+    job = await asyncio.to_thread(get_job_manager().cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_status(job)
+
+@app.on_event("startup")
+def resume_jobs():
+    """Requeue jobs interrupted by a restart and start dependency health checks."""
+    health_monitor.start()
+    get_job_manager().resume_unfinished()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Stop the PDF conversion and ingestion workers."""
+    health_monitor.stop()
+    if _job_manager is not None:
+        _job_manager.shutdown()
+    shutdown_pool()
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    try:
-        if verify_bucket_access():
-            return {"status": "healthy", "message": "Service is running and can access GCS"}
-        else:
-            return {"status": "unhealthy", "message": "Cannot access GCS bucket"}
-    except Exception as e:
-        return {"status": "unhealthy", "message": str(e)}
+    """Health check endpoint, served from the cached dependency status."""
+    readiness = health_monitor.readiness()
+    gcs = readiness["dependencies"].get("gcs")
+    if gcs is None:
+        return {"status": "unhealthy", "message": "Health checks have not completed yet"}
+    if gcs["ok"]:
+        return {"status": "healthy", "message": "Service is running and can access GCS"}
+    return {"status": "unhealthy", "message": "Cannot access GCS bucket"}
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return health_monitor.liveness()
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: cached status of GCS, Trieve and OpenAI."""
+    result = health_monitor.readiness()
+    return JSONResponse(result, status_code=200 if result["status"] == "ready" else 503)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,53 @@
+import json
+import logging
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Optional
+
+
+# The Session the current task is serving. twilio_handler sets it before its
+# tasks are created so they all inherit it; the SIDs are read at log time, so
+# records emitted after Twilio's start event carry them.
+current_call: ContextVar[Optional[Any]] = ContextVar("current_call", default=None)
+
+
+class CallContextFilter(logging.Filter):
+    """Add the session id, call_sid and stream_sid of the current call to every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        session = current_call.get()
+        record.session_id = getattr(session, "id", None)
+        record.call_sid = getattr(session, "call_sid", None)
+        record.stream_sid = getattr(session, "stream_sid", None)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+
+    Records may carry ``event`` (a short machine-readable name) and ``data``
+    (a JSON-serialisable dict) via ``extra=``; both are copied to the output.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            # pid + session tie together records logged before Twilio's start event
+            "pid": record.process,
+            "session": getattr(record, "session_id", None),
+            "call_sid": getattr(record, "call_sid", None),
+            "stream_sid": getattr(record, "stream_sid", None),
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+        data = getattr(record, "data", None)
+        if data is not None:
+            entry["data"] = data
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
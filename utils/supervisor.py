@@ -0,0 +1,188 @@
+import os
+import time
+import signal
+import logging
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+
+
+logger = logging.getLogger("hr_server.supervisor")
+
+# Seconds without a heartbeat before a worker is considered hung and replaced
+worker_heartbeat_timeout = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "15"))
+# Seconds a draining worker gets to finish in-flight calls before it is killed
+drain_timeout = float(os.getenv("DRAIN_TIMEOUT", "600"))
+# A worker that exits sooner than this after starting is counted as crashing on startup
+worker_min_uptime = float(os.getenv("WORKER_MIN_UPTIME", "10"))
+# Consecutive startup crashes after which the supervisor gives up
+worker_crash_limit = int(os.getenv("WORKER_CRASH_LIMIT", "5"))
+worker_max_backoff = 30.0
+heartbeat_interval = 1.0
+
+
+class Worker:
+    def __init__(self, process: multiprocessing.Process, heartbeat):
+        self.process = process
+        self.heartbeat = heartbeat
+        self.started_at = time.time()
+        self.retiring_since: Optional[float] = None
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def heartbeat_age(self) -> float:
+        return time.time() - self.heartbeat.value
+
+    def uptime(self) -> float:
+        return time.time() - self.started_at
+
+
+def _worker_entry(target: Callable, heartbeat, args):
+    # Workers manage their own SIGTERM/SIGINT; SIGHUP is for the supervisor only
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    target(*args, heartbeat=heartbeat)
+
+
+class Supervisor:
+    """
+    Forks worker processes that share a listening port via SO_REUSEPORT.
+
+    ``target(*args, heartbeat=...)`` runs in each worker. It must bind with
+    ``reuse_port=True``, update ``heartbeat.value`` with ``time.time()`` about
+    once a second, and on SIGTERM stop accepting connections and return once
+    in-flight calls have finished.
+
+    Signals:
+        SIGTERM/SIGINT: drain every worker, then exit.
+        SIGHUP: rolling restart; each worker is replaced by a fresh one before
+            the old one drains.
+
+    Workers that exit or stop heartbeating are replaced. Workers that keep
+    exiting right after they start (a bind error, bad configuration) are
+    respawned with exponential backoff, and after ``WORKER_CRASH_LIMIT`` such
+    crashes in a row the supervisor drains the rest and raises RuntimeError.
+    For a zero-drop deploy, start the new supervisor on the same port and
+    SIGTERM the old one.
+    """
+
+    def __init__(self, target: Callable, workers: int, args=()):
+        self.target = target
+        self.worker_count = workers
+        self.args = args
+        self.workers: Dict[int, Worker] = {}
+        self.retiring: List[Worker] = []
+        self._ctx = multiprocessing.get_context("fork")
+        self._stopping = False
+        self._reload = False
+        self._crashes = 0
+        self._respawn_at = 0.0
+
+    def _spawn(self) -> Worker:
+        heartbeat = self._ctx.Value("d", time.time(), lock=False)
+        process = self._ctx.Process(target=_worker_entry, args=(self.target, heartbeat, self.args))
+        process.start()
+        worker = Worker(process, heartbeat)
+        self.workers[worker.pid] = worker
+        logger.info(f"Started worker {worker.pid}")
+        return worker
+
+    def _retire(self, worker: Worker):
+        """Ask a worker to drain; it exits once its calls finish."""
+        self.workers.pop(worker.pid, None)
+        worker.retiring_since = time.time()
+        self.retiring.append(worker)
+        if worker.process.is_alive():
+            os.kill(worker.pid, signal.SIGTERM)
+        logger.info(f"Draining worker {worker.pid}")
+
+    def _kill(self, worker: Worker):
+        if worker.process.is_alive():
+            os.kill(worker.pid, signal.SIGKILL)
+        worker.process.join(timeout=5)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload", True))
+
+        for _ in range(self.worker_count):
+            self._spawn()
+        logger.info(f"Supervisor {os.getpid()} running {self.worker_count} workers")
+
+        while True:
+            time.sleep(heartbeat_interval)
+            if self._stopping:
+                self._shutdown()
+                return
+            if self._reload:
+                self._reload = False
+                self._rolling_restart()
+            self._check_workers()
+            self._reap_retiring()
+            if self._crashes >= worker_crash_limit:
+                logger.error(f"Workers crashed on startup {self._crashes} times in a row, stopping")
+                self._shutdown()
+                raise RuntimeError(f"Workers crashed on startup {self._crashes} times in a row")
+
+    def _check_workers(self):
+        for worker in list(self.workers.values()):
+            if not worker.process.is_alive():
+                worker.process.join()
+                self.workers.pop(worker.pid, None)
+                uptime = worker.uptime()
+                if uptime < worker_min_uptime:
+                    self._crashes += 1
+                    delay = min(2 ** (self._crashes - 1), worker_max_backoff)
+                    self._respawn_at = time.time() + delay
+                    action = f"replacing it in {delay:.0f}s" if self._crashes < worker_crash_limit else "giving up"
+                    logger.error(
+                        f"Worker {worker.pid} exited with code {worker.process.exitcode} {uptime:.1f}s after "
+                        f"starting, {action}"
+                    )
+                else:
+                    logger.error(f"Worker {worker.pid} exited with code {worker.process.exitcode}, replacing it")
+            elif worker.heartbeat_age() > worker_heartbeat_timeout:
+                logger.error(
+                    f"Worker {worker.pid} missed heartbeats for {worker.heartbeat_age():.1f}s, replacing it"
+                )
+                self.workers.pop(worker.pid, None)
+                self._spawn()
+                # A hung event loop cannot drain, so kill it outright
+                self._kill(worker)
+        # Every slot filled by a worker that outlived startup ends the crash streak
+        if (
+            self._crashes
+            and len(self.workers) == self.worker_count
+            and all(w.uptime() >= worker_min_uptime for w in self.workers.values())
+        ):
+            self._crashes = 0
+        if self._crashes < worker_crash_limit and time.time() >= self._respawn_at:
+            for _ in range(self.worker_count - len(self.workers)):
+                self._spawn()
+
+    def _reap_retiring(self):
+        for worker in list(self.retiring):
+            if not worker.process.is_alive():
+                worker.process.join()
+                self.retiring.remove(worker)
+                logger.info(f"Worker {worker.pid} drained and exited")
+            elif time.time() - worker.retiring_since > drain_timeout + 30:
+                logger.error(f"Worker {worker.pid} did not exit after draining, killing it")
+                self._kill(worker)
+                self.retiring.remove(worker)
+
+    def _rolling_restart(self):
+        logger.info("Rolling restart of workers")
+        for worker in list(self.workers.values()):
+            self._spawn()
+            self._retire(worker)
+
+    def _shutdown(self):
+        logger.info("Supervisor stopping, draining workers")
+        for worker in list(self.workers.values()):
+            self._retire(worker)
+        while self.retiring:
+            time.sleep(heartbeat_interval)
+            self._reap_retiring()
+        logger.info("All workers exited")
@@ -0,0 +1,209 @@
+"""Compact, append-only store of call transcripts.
+
+Each finished call is one row in a SQLite database: metadata columns for
+lookup, and the turns plus the interview responses stored by
+``store_skills_experience`` as zlib-compressed JSON. An FTS5 index over the
+candidate name and the spoken text supports full-text search; it is
+contentless, so the text is not stored twice.
+
+Usage:
+    python -m utils.transcripts candidate "Benjamin Shah"
+    python -m utils.transcripts search "kubernetes AND terraform"
+    python -m utils.transcripts show CA0123456789
+"""
+import os
+import re
+import json
+import zlib
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger("hr_server.transcripts")
+
+transcripts_db_path = os.getenv("TRANSCRIPTS_DB_PATH", "transcripts.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    call_sid TEXT,
+    stream_sid TEXT,
+    candidate_name TEXT,
+    started_at TEXT,
+    ended_at TEXT,
+    turn_count INTEGER,
+    interview_doc_id INTEGER,
+    body BLOB
+);
+CREATE INDEX IF NOT EXISTS transcripts_candidate ON transcripts (candidate_name COLLATE NOCASE, started_at);
+CREATE INDEX IF NOT EXISTS transcripts_call_sid ON transcripts (call_sid);
+"""
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(candidate_name, text, content='')"
+COLUMNS = "id, call_sid, stream_sid, candidate_name, started_at, ended_at, turn_count, interview_doc_id"
+
+
+def encode_body(turns: List[Dict], interview: Optional[Dict]) -> bytes:
+    payload = {"turns": turns, "interview": interview}
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_body(body: bytes) -> Dict:
+    return json.loads(zlib.decompress(body).decode("utf-8"))
+
+
+class TranscriptStore:
+    """
+    SQLite transcript store shared by every worker process.
+
+    Rows are only ever inserted. WAL mode lets readers (the API, the CLI) run
+    while workers append. Without FTS5 in the local SQLite build, search falls
+    back to scanning the compressed rows.
+    """
+
+    def __init__(self, path: str = transcripts_db_path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.execute(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite has no FTS5 support, transcript search will scan rows")
+            self.has_fts = False
+        self._conn.commit()
+
+    def append(
+        self,
+        turns: List[Dict],
+        call_sid: Optional[str] = None,
+        stream_sid: Optional[str] = None,
+        candidate_name: Optional[str] = None,
+        started_at: Optional[str] = None,
+        ended_at: Optional[str] = None,
+        interview: Optional[Dict] = None,
+    ) -> int:
+        """Store one call's transcript and return its id."""
+        doc_id = (interview or {}).get("doc_id")
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO transcripts (call_sid, stream_sid, candidate_name, started_at, ended_at, turn_count,"
+                " interview_doc_id, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (call_sid, stream_sid, candidate_name, started_at, ended_at, len(turns), doc_id,
+                 encode_body(turns, interview)),
+            )
+            row_id = cursor.lastrowid
+            if self.has_fts:
+                text = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+                self._conn.execute(
+                    "INSERT INTO transcripts_fts (rowid, candidate_name, text) VALUES (?, ?, ?)",
+                    (row_id, candidate_name or "", text),
+                )
+        return row_id
+
+    def _describe(self, row: sqlite3.Row, with_body: bool = False) -> Dict:
+        record = {key: row[key] for key in row.keys() if key != "body"}
+        if with_body:
+            record.update(decode_body(row["body"]))
+        return record
+
+    def get(self, transcript_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {COLUMNS}, body FROM transcripts WHERE id = ?", (transcript_id,)).fetchone()
+        return self._describe(row, with_body=True) if row else None
+
+    def by_call_sid(self, call_sid: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS}, body FROM transcripts WHERE call_sid = ? ORDER BY id", (call_sid,)
+            ).fetchall()
+        return [self._describe(row, with_body=True) for row in rows]
+
+    def by_candidate(self, candidate_name: str, limit: int = 50) -> List[Dict]:
+        """Calls with this candidate, newest first, without the turns."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS} FROM transcripts WHERE candidate_name = ? COLLATE NOCASE"
+                " ORDER BY started_at DESC LIMIT ?",
+                (candidate_name, limit),
+            ).fetchall()
+        return [self._describe(row) for row in rows]
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Full-text search over candidate names and spoken text.
+
+        ``query`` uses FTS5 syntax (``kubernetes AND terraform``, ``"system design"``,
+        ``python*``). Each result lists the turns containing a query term.
+        """
+        with self._lock:
+            if self.has_fts:
+                rows = self._conn.execute(
+                    f"SELECT {COLUMNS}, body FROM transcripts WHERE id IN"
+                    " (SELECT rowid FROM transcripts_fts WHERE transcripts_fts MATCH ? ORDER BY rank LIMIT ?)"
+                    " ORDER BY started_at DESC",
+                    (query, limit),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(f"SELECT {COLUMNS}, body FROM transcripts ORDER BY id DESC").fetchall()
+
+        terms = [term.lower().rstrip("*") for term in re.findall(r"\w+\*?", query) if term not in ("AND", "OR", "NOT")]
+        results = []
+        for row in rows:
+            record = self._describe(row, with_body=True)
+            turns = record.pop("turns")
+            record["matches"] = [turn for turn in turns if any(term in turn["content"].lower() for term in terms)]
+            if self.has_fts or record["matches"] or any(term in (record["candidate_name"] or "").lower() for term in terms):
+                results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[TranscriptStore] = None
+
+
+def get_transcript_store() -> TranscriptStore:
+    global _store
+    if _store is None:
+        _store = TranscriptStore()
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=transcripts_db_path, help="Transcript database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    candidate = commands.add_parser("candidate", help="List calls with a candidate")
+    candidate.add_argument("name")
+    search = commands.add_parser("search", help="Full-text search of transcripts")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    show = commands.add_parser("show", help="Print the transcripts of a call SID")
+    show.add_argument("call_sid")
+    args = parser.parse_args()
+
+    store = TranscriptStore(args.db)
+    if args.command == "candidate":
+        result = store.by_candidate(args.name)
+    elif args.command == "search":
+        result = store.search(args.query, args.limit)
+    else:
+        result = store.by_call_sid(args.call_sid)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()